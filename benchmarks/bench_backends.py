@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_batching import synthetic_sentences
+from module.inference_backends import BACKENDS
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Scores one synthetic corpus with every inference backend, checks each one's
+# drift against the fp32 torch reference, and compares latency, throughput
+# and peak memory. Every backend runs in its own process so RSS is not shared.
+#
+#   python -m benchmarks.bench_backends --sentences 2000
+#   python -m benchmarks.bench_backends --backends torch onnx --max-drift onnx=0.001
+#
+# Needs torch, transformers and the model (plus onnxruntime for "onnx").
+# Exits non-zero when a backend's largest per-class score difference exceeds
+# its bound.
+DEFAULT_MAX_DRIFT = {"torch": 1e-6, "torch-int8": 0.1, "onnx": 0.001}
+
+
+def run_worker(backend_name, sentence_count, latency_samples, scores_path):
+    import numpy as np
+    from module.model_service import get_model_service
+    from module.sentiment_analysis import score_sentences
+
+    sentences = synthetic_sentences(sentence_count)
+    service = get_model_service()
+    tokenizer, _, _, load_seconds = service.acquire()
+    backend, build_seconds = service.backend(backend_name)
+    score_sentences(sentences[:16], tokenizer, backend)  # warm-up
+
+    latencies = []
+    for sentence in sentences[:latency_samples]:
+        started = time.perf_counter()
+        score_sentences([sentence], tokenizer, backend)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    scores = score_sentences(sentences, tokenizer, backend)
+    seconds = time.perf_counter() - started
+    np.save(scores_path, np.stack(scores))
+
+    peak_rss_mb = None
+    if resource is not None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+    print(json.dumps({
+        "backend": backend_name,
+        "model_load_seconds": load_seconds,
+        "backend_build_seconds": build_seconds,
+        "latency_ms_p50": statistics.median(latencies) * 1000,
+        "latency_ms_p95": sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000,
+        "sentences_per_second": len(sentences) / seconds,
+        "peak_rss_mb": peak_rss_mb,
+    }))
+
+
+def parse_drift(values):
+    bounds = dict(DEFAULT_MAX_DRIFT)
+    for value in values or []:
+        name, _, bound = value.partition("=")
+        bounds[name] = float(bound)
+    return bounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference backend parity check and benchmark")
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--latency-samples", type=int, default=100)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--max-drift", nargs="*", metavar="BACKEND=BOUND",
+                        help="override the allowed max |score - fp32 score| per backend")
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--scores-path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.sentences, args.latency_samples, args.scores_path)
+        return
+
+    import numpy as np
+
+    bounds = parse_drift(args.max_drift)
+    backends = ["torch"] + [name for name in args.backends if name != "torch"]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in backends:
+            scores_path = os.path.join(tmp, f"{name}.npy")
+            completed = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_backends", "--worker", name,
+                 "--sentences", str(args.sentences), "--latency-samples", str(args.latency_samples),
+                 "--scores-path", scores_path],
+                capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                print(f"❌ {name}: worker failed\n{completed.stderr.strip()[-2000:]}")
+                sys.exit(1)
+            results[name] = json.loads(completed.stdout.strip().splitlines()[-1])
+            results[name]["scores"] = np.load(scores_path)
+
+    reference = results["torch"]["scores"]
+    weights = np.arange(1, 6, dtype=np.float32)
+    failed = False
+    print(f"{args.sentences} sentences")
+    print(f"{'backend':<12} {'p50 ms':>8} {'p95 ms':>8} {'sent/s':>9} {'RSS MB':>8} {'max drift':>10} {'weighted':>9}")
+    for name in backends:
+        result = results[name]
+        drift = float(np.abs(result["scores"] - reference).max())
+        weighted = float(np.abs((result["scores"] - reference) @ weights).max())
+        rss = f"{result['peak_rss_mb']:.0f}" if result["peak_rss_mb"] is not None else "n/a"
+        print(
+            f"{name:<12} {result['latency_ms_p50']:>8.1f} {result['latency_ms_p95']:>8.1f} "
+            f"{result['sentences_per_second']:>9.1f} {rss:>8} {drift:>10.5f} {weighted:>9.4f}"
+        )
+        if drift > bounds.get(name, 0.0):
+            print(f"   ❌ {name} drifts {drift:.5f} from fp32, bound is {bounds[name]}")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+    print("✅ Every backend stays within its drift bound")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import math
+import random
+import time
+
+from benchmarks.bench_classifier import FILLER
+from module.batching import plan_batches, fixed_batches, padding_stats, TOKEN_BUDGET, MAX_BATCH_SENTENCES, MAX_LENGTH
+
+# Compares the old fixed 16-sentence batches in file order with length-bucketed,
+# token-budgeted batches on a synthetic corpus of review sentences.
+#
+#   python -m benchmarks.bench_batching --sentences 20000
+#   python -m benchmarks.bench_batching --sentences 2000 --inference   # needs torch + the model
+#
+# Without --inference only the padding is compared. Token counts come from the
+# model's tokenizer when transformers is installed, otherwise from a word-count
+# estimate.
+
+
+def synthetic_sentences(count, seed=11):
+    # Review sentences are mostly short with a long tail of run-on ones
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(count):
+        words = max(2, min(400, int(rng.lognormvariate(2.4, 0.8))))
+        sentences.append(" ".join(rng.choices(FILLER, k=words)))
+    return sentences
+
+
+def token_lengths(sentences, tokenizer=None):
+    if tokenizer is not None:
+        encoded = tokenizer(sentences, truncation=True, max_length=MAX_LENGTH)
+        return [len(ids) for ids in encoded["input_ids"]]
+    # [CLS] + [SEP] + roughly 1.3 word pieces per word
+    return [min(MAX_LENGTH, 2 + math.ceil(len(s.split()) * 1.3)) for s in sentences]
+
+
+def load_tokenizer():
+    try:
+        from transformers import AutoTokenizer
+        from module.model_service import MODEL_NAME, MODEL_REVISION
+        return AutoTokenizer.from_pretrained(MODEL_NAME, revision=MODEL_REVISION)
+    except Exception as e:
+        print(f"⚠️ Tokenizer unavailable ({e}); estimating token counts")
+        return None
+
+
+def run_inference(sentences, batches, tokenizer, model, device):
+    import torch
+
+    started = time.perf_counter()
+    for batch in batches:
+        inputs = tokenizer(
+            [sentences[i] for i in batch], return_tensors="pt", truncation=True,
+            max_length=MAX_LENGTH, padding=True,
+        )
+        inputs = {k: v.to(device) for k, v in inputs.items()}
+        with torch.no_grad():
+            model(**inputs)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed vs length-bucketed batching")
+    parser.add_argument("--sentences", type=int, default=20000)
+    parser.add_argument("--fixed-size", type=int, default=16)
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SENTENCES)
+    parser.add_argument("--inference", action="store_true", help="also time the model on both plans")
+    args = parser.parse_args()
+
+    sentences = synthetic_sentences(args.sentences)
+    tokenizer = load_tokenizer()
+    lengths = token_lengths(sentences, tokenizer)
+
+    plans = {
+        f"fixed {args.fixed_size}, file order": fixed_batches(len(sentences), args.fixed_size),
+        f"bucketed, {args.token_budget} token budget": plan_batches(lengths, args.token_budget, args.max_batch),
+    }
+
+    model = device = None
+    if args.inference:
+        from module.model_service import get_model_service
+        tokenizer, model, device, _ = get_model_service().acquire()
+
+    print(f"{len(sentences)} sentences, {sum(lengths)} tokens, longest {max(lengths)}")
+    for name, batches in plans.items():
+        stats = padding_stats(batches, lengths)
+        line = (
+            f"{name:<34} {stats['batches']:>6} batches  {stats['padded_tokens']:>10} padded tokens  "
+            f"{stats['padding_waste']:>5.0%} padding"
+        )
+        if model is not None:
+            seconds = run_inference(sentences, batches, tokenizer, model, device)
+            line += f"  {len(sentences) / seconds:>8.1f} sentences/s"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import statistics
+import time
+
+from playwright.sync_api import sync_playwright
+
+from benchmarks.fixture_site import FixtureSite
+from module.browser_profile import BROWSER_PROFILES, TRACKER_DOMAINS
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Loads the fixture hotel pages under each browser profile and compares load
+# time, transferred bytes, JS heap and (with psutil installed) browser RSS.
+#
+#   python -m benchmarks.bench_browser_profile --hotels 5 --rounds 3
+
+
+def browser_rss_mb():
+    if psutil is None:
+        return None
+    total = 0
+    for child in psutil.Process().children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            continue
+    return total / (1024 * 1024)
+
+
+def run_profile(site, profile, rounds):
+    load_times = []
+    transferred = 0
+    blocked = 0
+    heap = []
+    rss = []
+
+    with sync_playwright() as p:
+        browser = profile.launch(p)
+        context = profile.new_context(browser)
+
+        def on_response(response):
+            nonlocal transferred
+            transferred += int(response.headers.get("content-length") or 0)
+
+        def on_failed(request):
+            nonlocal blocked
+            blocked += 1
+
+        for _ in range(rounds):
+            for hotel_id in site.hotel_ids():
+                page = context.new_page()
+                page.on("response", on_response)
+                page.on("requestfailed", on_failed)
+                started = time.perf_counter()
+                page.goto(site.hotel_url(hotel_id), wait_until="load")
+                page.wait_for_selector("div.Review-comment")
+                load_times.append(time.perf_counter() - started)
+
+                cdp = context.new_cdp_session(page)
+                cdp.send("Performance.enable")
+                metrics = {m["name"]: m["value"] for m in cdp.send("Performance.getMetrics")["metrics"]}
+                heap.append(metrics.get("JSHeapUsedSize", 0) / (1024 * 1024))
+                rss_now = browser_rss_mb()
+                if rss_now is not None:
+                    rss.append(rss_now)
+                page.close()
+        browser.close()
+
+    pages = rounds * site.hotel_count
+    return {
+        "profile": profile.name,
+        "median_load_ms": statistics.median(load_times) * 1000,
+        "kb_per_page": transferred / 1024 / pages,
+        "blocked_per_page": blocked / pages,
+        "js_heap_mb": statistics.mean(heap),
+        "peak_rss_mb": max(rss) if rss else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare browser launch profiles offline")
+    parser.add_argument("--hotels", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--image-kb", type=int, default=150)
+    parser.add_argument("--headed", action="store_true", help="Keep the full profile's visible browser")
+    args = parser.parse_args()
+
+    full = BROWSER_PROFILES["full"]
+    if not args.headed:
+        full = full.with_overrides(headless=True)
+    # The fixture serves its "tracker" from localhost instead of a real ad host
+    lean = BROWSER_PROFILES["lean"].with_overrides(
+        block_domains=TRACKER_DOMAINS + ("localhost",)
+    )
+
+    site = FixtureSite(
+        hotel_count=args.hotels,
+        gallery_images=args.images,
+        image_kb=args.image_kb,
+    )
+    with site:
+        results = [run_profile(site, profile, args.rounds) for profile in (full, lean)]
+
+    print(f"\n{'profile':<8} {'load ms':>9} {'KB/page':>9} {'blocked':>8} {'heap MB':>8} {'RSS MB':>8}")
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "n/a"
+        print(
+            f"{r['profile']:<8} {r['median_load_ms']:>9.0f} {r['kb_per_page']:>9.0f} "
+            f"{r['blocked_per_page']:>8.1f} {r['js_heap_mb']:>8.1f} {rss:>8}"
+        )
+    if psutil is None:
+        print("ℹ️ Install psutil to include browser RSS.")
+
+
+if __name__ == "__main__":
+    main()
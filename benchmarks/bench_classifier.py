@@ -0,0 +1,91 @@
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.fixture_site import load_recorded_comments
+from benchmarks.legacy_classifier import classify_sentence as legacy_classify
+from module.rule_engine import RuleEngine
+
+# Checks the compiled rule engine against the original hand-written
+# classify_sentence on a synthetic corpus, then times both.
+#
+#   python -m benchmarks.bench_classifier --sentences 200000
+
+FILLER = (
+    "the a we was very really our and but it staff friendly breakfast good "
+    "bad nice clean dirty view beach city night great stay again would "
+    "recommend price value small big comfortable bed location"
+).split()
+PUNCTUATION = ("", "", "", ",", "!", "'s", ")", "-")
+
+
+def rule_terms(engine):
+    terms = set(engine.words)
+    for phrase in engine.phrase_prefixes:
+        terms.add(phrase)
+    return sorted(terms)
+
+
+def synthetic_sentences(engine, count, seed=7, hit_rate=0.3):
+    # Mostly filler words; a share of sentences get one or more rule terms,
+    # with random case and trailing punctuation to exercise the word/substring
+    # distinction the rules depend on.
+    rng = random.Random(seed)
+    terms = rule_terms(engine)
+    sentences = [c["reviewComments"] for c in load_recorded_comments()]
+    while len(sentences) < count:
+        words = rng.choices(FILLER, k=rng.randint(4, 18))
+        if rng.random() < hit_rate:
+            for _ in range(rng.randint(1, 3)):
+                term = rng.choice(terms) + rng.choice(PUNCTUATION)
+                if rng.random() < 0.2:
+                    term = term.upper()
+                words.insert(rng.randrange(len(words) + 1), term)
+        sentences.append(" ".join(words))
+    return sentences[:count]
+
+
+def time_it(fn, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule engine parity check and micro-benchmark")
+    parser.add_argument("--sentences", type=int, default=200000)
+    parser.add_argument("--hit-rate", type=float, default=0.3)
+    args = parser.parse_args()
+
+    engine = RuleEngine.from_file()
+    sentences = synthetic_sentences(engine, args.sentences, hit_rate=args.hit_rate)
+
+    legacy_seconds, legacy = time_it(lambda: [legacy_classify(s) for s in sentences])
+    engine_seconds, compiled = time_it(lambda: engine.classify_batch(sentences))
+
+    mismatches = [
+        (sentence, sorted(a), sorted(b))
+        for sentence, a, b in zip(sentences, legacy, compiled)
+        if set(a) != set(b)
+    ]
+    labelled = sum(1 for labels in compiled if labels)
+    print(f"{len(sentences)} sentences, {labelled} labelled, {len(engine.rules)} rules")
+    print(f"legacy classify_sentence: {len(sentences) / legacy_seconds:>12,.0f} sentences/s")
+    print(f"compiled rule engine:     {len(sentences) / engine_seconds:>12,.0f} sentences/s")
+    print(f"speedup: {legacy_seconds / engine_seconds:.1f}x")
+
+    if mismatches:
+        print(f"❌ {len(mismatches)} sentences classified differently, e.g.:")
+        for sentence, expected, got in mismatches[:5]:
+            print(f"   {sentence!r}: legacy={expected} engine={got}")
+        sys.exit(1)
+    print("✅ Labels match the legacy classifier on every sentence")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from playwright.sync_api import sync_playwright
+
+from benchmarks.fixture_site import FixtureSite
+from module.scraper import EXTRACTION_MODES, scrape_hotel
+
+# Runs every extraction mode against the offline fixture site and checks they
+# capture the same reviews.
+#
+#   python -m benchmarks.bench_review_extraction --hotels 3 --reviews 200
+
+
+def read_reviews(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["hotel_id"], row["review"], row["review_date"]) for row in csv.DictReader(f)]
+
+
+def run_mode(site, mode, workdir, start_date=None):
+    output_file = os.path.join(workdir, f"reviews_{mode}.csv")
+    calls_before = site.api_calls
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        context = browser.new_context()
+        started = time.perf_counter()
+        for index, hotel_id in enumerate(site.hotel_ids()):
+            scrape_hotel(
+                context, index, site.hotel_url(hotel_id), hotel_id, "Fixture City",
+                output_file, start_date=start_date, extraction_mode=mode
+            )
+        elapsed = time.perf_counter() - started
+        browser.close()
+    return {
+        "mode": mode,
+        "seconds": elapsed,
+        "per_hotel": elapsed / max(1, site.hotel_count),
+        "api_calls": site.api_calls - calls_before,
+        "reviews": read_reviews(output_file),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare review extraction modes offline")
+    parser.add_argument("--hotels", type=int, default=3)
+    parser.add_argument("--reviews", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--latency-ms", type=int, default=50)
+    parser.add_argument("--modes", nargs="+", default=list(EXTRACTION_MODES))
+    parser.add_argument("--since", help="Only keep reviews from this date on (DD-MM-YYYY)")
+    args = parser.parse_args()
+    start_date = datetime.strptime(args.since, "%d-%m-%Y") if args.since else None
+
+    site = FixtureSite(
+        hotel_count=args.hotels,
+        reviews_per_hotel=args.reviews,
+        page_size=args.page_size,
+        api_latency_ms=args.latency_ms,
+    )
+    with site, tempfile.TemporaryDirectory() as workdir:
+        results = [run_mode(site, mode, workdir, start_date) for mode in args.modes]
+
+    print(f"\n{'mode':<6} {'total s':>9} {'s/hotel':>9} {'api calls':>10} {'reviews':>8}")
+    for r in results:
+        print(f"{r['mode']:<6} {r['seconds']:>9.2f} {r['per_hotel']:>9.2f} {r['api_calls']:>10} {len(r['reviews']):>8}")
+
+    expected = sorted(results[0]["reviews"])
+    mismatched = [r["mode"] for r in results[1:] if sorted(r["reviews"]) != expected]
+    if mismatched:
+        print(f"❌ Review sets differ from '{results[0]['mode']}' mode: {', '.join(mismatched)}")
+        sys.exit(1)
+    print("✅ All modes captured the same reviews")
+
+
+if __name__ == "__main__":
+    main()
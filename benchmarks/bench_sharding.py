@@ -0,0 +1,93 @@
+import os
+
+# Every run has to score from scratch; must be set before the modules (and the
+# spawned workers, which inherit the environment) read it
+os.environ["SENTIMENT_CACHE"] = "0"
+
+import argparse
+import csv
+import random
+import tempfile
+import time
+
+from benchmarks.bench_classifier import synthetic_sentences
+from module.rule_engine import RuleEngine
+from module.sentiment_analysis import run_sentiment_analysis
+
+# Scaling benchmark for sharded analysis: scores one synthetic review CSV with
+# 1, 2, 4, ... up to all cores and reports reviews/s, speedup and efficiency.
+# Every output is compared with the single-process one.
+#
+#   python -m benchmarks.bench_sharding --reviews 2000
+#   python -m benchmarks.bench_sharding --workers 1 2 3
+#
+# Needs torch, transformers and the model.
+
+
+def write_reviews(path, count, seed=3):
+    rng = random.Random(seed)
+    sentences = synthetic_sentences(RuleEngine.from_file(), count * 4, hit_rate=0.5)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["hotel_name", "rating", "review"])
+        writer.writeheader()
+        for n in range(count):
+            picked = rng.sample(sentences, rng.randint(1, 6))
+            writer.writerow({
+                "hotel_name": f"Hotel {n % 50}",
+                "rating": rng.randint(1, 10),
+                "review": ". ".join(picked) + ".",
+            })
+
+
+def default_worker_counts():
+    cores = os.cpu_count() or 1
+    counts = []
+    n = 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+def compare_outputs(expected_path, actual_path):
+    with open(expected_path, encoding="utf-8") as a, open(actual_path, encoding="utf-8") as b:
+        expected = list(csv.reader(a))
+        actual = list(csv.reader(b))
+    if len(expected) != len(actual):
+        return f"{len(actual)} rows vs {len(expected)}"
+    differing = sum(1 for x, y in zip(expected, actual) if x != y)
+    return "identical" if not differing else f"{differing} rows differ"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded analysis scaling benchmark")
+    parser.add_argument("--reviews", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_worker_counts())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "reviews.csv")
+        write_reviews(input_path, args.reviews)
+
+        results = []
+        for workers in args.workers:
+            output_path = os.path.join(tmp, f"sentiment_{workers}.csv")
+            started = time.perf_counter()
+            run_sentiment_analysis(input_path, output_path, workers=workers)
+            results.append((workers, time.perf_counter() - started, output_path))
+
+        baseline_seconds = results[0][1]
+        baseline_workers = results[0][0]
+        print(f"\n{args.reviews} reviews, {os.cpu_count()} cores")
+        print(f"{'workers':>7} {'seconds':>8} {'reviews/s':>10} {'speedup':>8} {'efficiency':>10}  output")
+        for workers, seconds, output_path in results:
+            speedup = baseline_seconds / seconds
+            efficiency = speedup / (workers / baseline_workers)
+            print(
+                f"{workers:>7} {seconds:>8.1f} {args.reviews / seconds:>10.1f} {speedup:>7.2f}x "
+                f"{efficiency:>9.0%}  {compare_outputs(results[0][2], output_path)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
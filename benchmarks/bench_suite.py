@@ -0,0 +1,336 @@
+import os
+
+# Measure scoring, not the cache; must be set before the modules (and any
+# spawned workers) read it
+os.environ.setdefault("SENTIMENT_CACHE", "0")
+# Likewise the scraper's politeness limit, which the local fixture site doesn't need
+os.environ.setdefault("SCRAPER_REQUESTS_PER_SECOND", "0")
+
+import argparse
+import json
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from benchmarks.bench_classifier import time_it
+from benchmarks.corpus import ensure_corpus, parse_size
+from module.jobs import Job
+from module.rule_engine import get_rule_engine
+from module.sentiment_analysis import classify_sentence, classify_sentences, iter_review_rows
+
+# Offline benchmark suite. Every stage runs on local data only:
+#   classify  classify_sentence / classify_batch over the corpus sentences
+#   read      the analysis read stage: CSV parsing, sentence split, classify
+#   analysis  run_sentiment_analysis end to end, with per-stage throughput
+#             from the job's metrics (needs torch, transformers and the model)
+#   scrape    scrape_reviews_from_agoda against benchmarks/fixture_site.py,
+#             with per-stage time from the job's metrics (needs a Playwright
+#             browser)
+# Results are written as JSON and compared with the committed baseline,
+# benchmarks/baseline.json: a *_per_second metric that drops, or a *_seconds
+# metric that grows, by more than the stage's threshold is a regression, as
+# is a baseline metric the run no longer produces. Regressions exit with 1,
+# a missing baseline with 2. Timings depend on the machine, so re-save the
+# baseline (--save-baseline) on the machine that runs the comparison.
+#
+#   python -m benchmarks.bench_suite --size 10k --save-baseline
+#   python -m benchmarks.bench_suite --size 10k
+#   python -m benchmarks.bench_suite --size 1M --stages classify read analysis
+STAGES = ("classify", "read", "analysis", "scrape")
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+RESULTS_DIR = os.path.join("output", "bench_results")
+DEFAULT_THRESHOLD = 0.10
+# Browser runs are noisier than pure Python
+STAGE_THRESHOLDS = {"scrape": 0.25, "analysis": 0.15}
+
+
+def stage_seconds(profile, name):
+    # Total time of a metric across its label sets, from Registry.profile()
+    return sum(
+        timing["total_seconds"]
+        for series, timing in profile["timings"].items()
+        if series == name or series.startswith(name + "{")
+    )
+
+
+def rate(count, seconds):
+    return round(count / seconds, 2) if seconds else 0.0
+
+
+def corpus_sentences(corpus, limit):
+    sentences = []
+    for _, row in iter_review_rows(corpus):
+        sentences.extend(s.strip() for s in re.split(r'[.!?]', row["review"]) if s.strip())
+        if len(sentences) >= limit:
+            break
+    return sentences[:limit]
+
+
+def bench_classify(corpus, limit, repeat):
+    sentences = corpus_sentences(corpus, limit)
+    get_rule_engine()
+    single_seconds, _ = time_it(lambda: [classify_sentence(s) for s in sentences], repeat)
+    batch_seconds, labels = time_it(lambda: classify_sentences(sentences), repeat)
+    return {
+        "sentences": len(sentences),
+        "labelled": sum(1 for l in labels if l),
+        "classify_sentence_per_second": rate(len(sentences), single_seconds),
+        "classify_batch_per_second": rate(len(sentences), batch_seconds),
+    }
+
+
+def read_stage(corpus):
+    reviews = sentences = labelled = 0
+    for _, row in iter_review_rows(corpus):
+        split = [s.strip() for s in re.split(r'[.!?]', row["review"]) if s.strip()]
+        labelled += sum(1 for labels in classify_sentences(split) if labels)
+        sentences += len(split)
+        reviews += 1
+    return reviews, sentences, labelled
+
+
+def bench_read(corpus, repeat):
+    seconds, (reviews, sentences, labelled) = time_it(lambda: read_stage(corpus), repeat)
+    return {
+        "reviews": reviews,
+        "sentences": sentences,
+        "labelled": labelled,
+        "seconds": round(seconds, 3),
+        "reviews_per_second": rate(reviews, seconds),
+        "sentences_per_second": rate(sentences, seconds),
+    }
+
+
+def bench_analysis(corpus, workers, backend, output_format):
+    try:
+        import torch, transformers  # noqa: F401
+    except ImportError as e:
+        return {"skipped": f"{e.name} is not installed"}
+    from module.result_store import output_extension
+    from module.sentiment_analysis import run_sentiment_analysis
+
+    job = Job("analysis", {})
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, "sentiment" + output_extension(output_format))
+        started = time.perf_counter()
+        run_sentiment_analysis(corpus, output_file, job=job, backend=backend, workers=workers,
+                               output_format=output_format)
+        seconds = time.perf_counter() - started
+    progress = job.progress
+    profile = job.metrics.profile()
+    reviews = progress.get("reviews_processed", 0)
+    scored = progress.get("sentences_scored", 0)
+    result = {
+        "reviews": reviews,
+        "sentences_scored": scored,
+        "sentences_filtered": progress.get("sentences_filtered", 0),
+        "forward_passes": progress.get("forward_passes", 0),
+        "model_load": progress.get("model_load_seconds"),
+        "seconds": round(seconds, 3),
+        "reviews_per_second": rate(reviews, seconds),
+        "sentences_per_second": rate(scored, seconds),
+    }
+    # Throughput of each stage on its own: how fast it would go if it were
+    # the only one running
+    for stage in ("classify", "tokenize", "forward", "write"):
+        busy = stage_seconds(profile, f"analysis_{stage}_seconds")
+        count = reviews if stage == "classify" else scored
+        unit = "reviews" if stage == "classify" else "sentences"
+        result[f"{stage}_{unit}_per_second"] = rate(count, busy)
+    result["profile"] = profile
+    return result
+
+
+def bench_scrape(hotels, reviews_per_hotel, extraction_mode, concurrency, latency_ms):
+    from benchmarks.fixture_site import FixtureSite
+    from module import scraper
+    from module.review_index import index_path_for
+    from module.hotel_index import hotel_index_path
+
+    site = FixtureSite(hotel_count=hotels, reviews_per_hotel=reviews_per_hotel, api_latency_ms=latency_ms)
+    # A fresh city each time, so neither the seen-review index nor the hotel
+    # index skips anything
+    city = f"benchmark {uuid.uuid4().hex[:8]}"
+    output_file = scraper.reviews_csv_path(city)
+    job = Job("scraping", {})
+    try:
+        with site:
+            scraper.AGODA_BASE_URL = site.base_url
+            started = time.perf_counter()
+            scraper.scrape_reviews_from_agoda(
+                city, 0, max_hotels=0, concurrency=concurrency, extraction_mode=extraction_mode,
+                browser_profile="lean", job=job,
+            )
+            seconds = time.perf_counter() - started
+    except Exception as e:
+        return {"skipped": f"scraping failed: {str(e).splitlines()[0]}"}
+    finally:
+        for index_path in (index_path_for(output_file), hotel_index_path(city)):
+            for path in (index_path, index_path + "-wal", index_path + "-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+        if os.path.exists(output_file):
+            os.remove(output_file)
+
+    progress = job.progress
+    profile = job.metrics.profile()
+    hotels_done = progress.get("hotels_done", 0)
+    reviews = progress.get("reviews_saved", 0)
+    result = {
+        "hotels": hotels_done,
+        "reviews": reviews,
+        "listing_pages": progress.get("listing_pages", 0),
+        "seconds": round(seconds, 3),
+        "hotels_per_second": rate(hotels_done, seconds),
+        "reviews_per_second": rate(reviews, seconds),
+    }
+    for stage in ("goto", "wait", "review_page", "evaluate_all", "listing_extract", "csv_write"):
+        result[f"{stage}_seconds"] = round(stage_seconds(profile, f"scraper_{stage}_seconds"), 3)
+    result["profile"] = profile
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparable_metrics(results):
+    # stage.metric -> value for the metrics that have a direction
+    return {
+        f"{stage}.{key}": value
+        for stage, metrics in results.items()
+        if "skipped" not in metrics
+        for key, value in metrics.items()
+        if isinstance(value, (int, float)) and key.endswith(("_per_second", "_seconds"))
+    }
+
+
+def compare(current, baseline, threshold=None):
+    # [(metric, baseline, current, change, regressed)]; change is relative,
+    # positive when the metric got better. A baseline metric of a stage this
+    # run covered but could not measure (now skipped or failing) is a
+    # regression with current and change None.
+    rows = []
+    baseline_metrics = comparable_metrics(baseline["results"])
+    current_metrics = comparable_metrics(current["results"])
+    for key, base in sorted(baseline_metrics.items()):
+        if key not in current_metrics and key.split(".")[0] in current["results"]:
+            rows.append((key, base, None, None, True))
+    for key, value in sorted(current_metrics.items()):
+        base = baseline_metrics.get(key)
+        if not base:
+            continue
+        change = (value - base) / base
+        if key.endswith("_seconds"):
+            change = -change
+        limit = threshold if threshold is not None else STAGE_THRESHOLDS.get(key.split(".")[0], DEFAULT_THRESHOLD)
+        rows.append((key, base, value, change, change < -limit))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite with baseline comparison")
+    parser.add_argument("--size", default="10k", help="Corpus size: 10k, 100k, 1M or a review count")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--classify-limit", type=int, default=200_000, help="Sentences for the classify stage")
+    parser.add_argument("--repeat", type=int, default=5, help="Best of this many runs for classify and read")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--output-format", default="csv")
+    parser.add_argument("--hotels", type=int, default=10, help="Fixture hotels for the scrape stage")
+    parser.add_argument("--hotel-reviews", type=int, default=200)
+    parser.add_argument("--extraction-mode", default="api")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency-ms", type=int, default=20)
+    parser.add_argument("--output", help="Results JSON (default: output/bench_results/<time>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--threshold", type=float, help="Allowed relative regression for every stage")
+    args = parser.parse_args()
+
+    reviews = parse_size(args.size)
+    config = {
+        "size": reviews, "seed": args.seed, "classify_limit": args.classify_limit,
+        "workers": args.workers, "backend": args.backend, "output_format": args.output_format,
+        "hotels": args.hotels, "hotel_reviews": args.hotel_reviews, "extraction_mode": args.extraction_mode,
+        "concurrency": args.concurrency, "latency_ms": args.latency_ms,
+    }
+    corpus = ensure_corpus(reviews, args.seed) if set(args.stages) & {"classify", "read", "analysis"} else None
+
+    results = {}
+    for stage in args.stages:
+        print(f"⏱️ {stage} ...")
+        if stage == "classify":
+            results[stage] = bench_classify(corpus, args.classify_limit, args.repeat)
+        elif stage == "read":
+            results[stage] = bench_read(corpus, args.repeat)
+        elif stage == "analysis":
+            results[stage] = bench_analysis(corpus, args.workers, args.backend, args.output_format)
+        elif stage == "scrape":
+            results[stage] = bench_scrape(
+                args.hotels, args.hotel_reviews, args.extraction_mode, args.concurrency, args.latency_ms
+            )
+        if "skipped" in results[stage]:
+            print(f"   skipped: {results[stage]['skipped']}")
+
+    current = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": config,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    print(f"\n💾 Results: {output}")
+
+    print(f"\n{'metric':<48} {'value':>14}")
+    for key, value in sorted(comparable_metrics(results).items()):
+        print(f"{key:<48} {value:>14,.2f}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"📌 Saved as baseline: {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"❌ No baseline at {args.baseline}; run with --save-baseline to create one.")
+        sys.exit(2)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["meta"]["config"] != config:
+        print(f"⚠️ Baseline {args.baseline} was run with a different configuration; not comparing.")
+        return
+
+    rows = compare(current, baseline, args.threshold)
+    print(f"\n{'metric':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key, base, value, change, regressed in rows:
+        if value is None:
+            print(f"{key:<48} {base:>12,.2f} {'missing':>12} {'':>8}  ❌")
+            continue
+        print(f"{key:<48} {base:>12,.2f} {value:>12,.2f} {change:>+8.1%}{'  ❌' if regressed else ''}")
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f"❌ {len(regressions)} metrics regressed past their threshold")
+        sys.exit(1)
+    print("✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import csv
+import os
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks.bench_classifier import synthetic_sentences
+from module.rule_engine import RuleEngine
+
+# Synthetic review corpora in the scraper's CSV format, for benchmarking the
+# analysis without scraping first. Reviews are 1-8 sentences drawn from a
+# fixed pool of synthetic sentences (about half of them carry a label), so a
+# corpus of a given size and seed is always byte-identical. Generated files
+# are kept under output/bench_corpus/ and reused.
+#
+#   python -m benchmarks.corpus --sizes 10k 100k 1M
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+CORPUS_DIR = os.path.join("output", "bench_corpus")
+SENTENCE_POOL = 200_000
+REVIEWS_PER_HOTEL = 200
+FIELDNAMES = ["city", "hotel_name", "hotel_id", "rating", "review", "review_date"]
+
+
+def parse_size(size):
+    # "10k", "100k", "1M" or a plain review count
+    return SIZES[size] if size in SIZES else int(size)
+
+
+def corpus_path(reviews, seed=11, directory=CORPUS_DIR):
+    return os.path.join(directory, f"reviews_{reviews}_seed{seed}.csv")
+
+
+def write_corpus(path, reviews, seed=11, hit_rate=0.5):
+    rng = random.Random(seed)
+    pool = synthetic_sentences(RuleEngine.from_file(), min(SENTENCE_POOL, reviews * 4), seed=seed, hit_rate=hit_rate)
+    newest = date(2025, 1, 1)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for n in range(reviews):
+            hotel = n // REVIEWS_PER_HOTEL
+            writer.writerow({
+                "city": "Benchmark City",
+                "hotel_name": f"Benchmark Hotel {hotel}",
+                "hotel_id": str(200000 + hotel),
+                "rating": f"{rng.uniform(6, 9.8):.1f}",
+                "review": ". ".join(rng.choices(pool, k=rng.randint(1, 8))) + ".",
+                "review_date": (newest - timedelta(days=n % 1500)).strftime("%d-%m-%Y"),
+            })
+    os.replace(tmp_path, path)
+    return path
+
+
+def ensure_corpus(reviews, seed=11, directory=CORPUS_DIR):
+    path = corpus_path(reviews, seed, directory)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        started = time.perf_counter()
+        write_corpus(path, reviews, seed)
+        print(f"📝 Generated {reviews:,} reviews in {time.perf_counter() - started:.1f}s: {path}")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic review corpora")
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES))
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--dir", default=CORPUS_DIR)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        path = ensure_corpus(parse_size(size), args.seed, args.dir)
+        print(f"   {size:>5}: {path} ({os.path.getsize(path) / (1024 * 1024):.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
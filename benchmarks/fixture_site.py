@@ -0,0 +1,462 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Offline stand-in for the parts of agoda.com the scraper touches: the home
+# page search box, the search results (star filter, li[data-hotelid] cards,
+# a Next button), hotel pages and the review paginator. Review pages are
+# generated from a recorded ReviewComments response so the DOM and API
+# extraction modes can be exercised without network access. Point the
+# scraper at it with scraper.AGODA_BASE_URL.
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RECORDED_REVIEWS = os.path.join(FIXTURES_DIR, "review_comments.json")
+REVIEW_API_PATH = "/api/cronos/property/review/ReviewComments"
+
+
+def load_recorded_comments(path=RECORDED_REVIEWS):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["comments"]
+
+
+def format_display_date(date):
+    return f"{date:%B} {date.day}, {date.year}"
+
+
+class FixtureSite:
+    def __init__(
+        self, hotel_count=5, reviews_per_hotel=120, page_size=20,
+        api_latency_ms=0, ssr_first_page=False, recorded_path=RECORDED_REVIEWS,
+        gallery_images=8, image_kb=150, tracker_host="localhost", listing_page_size=10
+    ):
+        self.hotel_count = hotel_count
+        self.listing_page_size = listing_page_size
+        self.reviews_per_hotel = reviews_per_hotel
+        self.page_size = page_size
+        self.api_latency_ms = api_latency_ms
+        self.ssr_first_page = ssr_first_page
+        # Page weight the scraper doesn't need, for resource blocking benchmarks.
+        # Trackers load from a different host name than the site itself.
+        self.gallery_images = gallery_images
+        self.image_kb = image_kb
+        self.tracker_host = tracker_host
+        self.recorded = load_recorded_comments(recorded_path)
+        self.newest = datetime.fromisoformat(self.recorded[0]["reviewDate"][:19])
+        self.api_calls = 0
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # --- Data ---
+    def hotel_ids(self):
+        return [str(100000 + n) for n in range(self.hotel_count)]
+
+    def hotel_url(self, hotel_id):
+        return f"{self.base_url}/hotel/{hotel_id}.html"
+
+    def hotel_name(self, hotel_id):
+        return f"Fixture Hotel {hotel_id}"
+
+    def hotel_stars(self, hotel_id):
+        return 1 + int(hotel_id) % 5
+
+    def listings(self):
+        return [
+            {"id": hotel_id, "name": self.hotel_name(hotel_id), "stars": self.hotel_stars(hotel_id),
+             "url": self.hotel_url(hotel_id)}
+            for hotel_id in self.hotel_ids()
+        ]
+
+    def reviews(self, hotel_id, sorting="most_helpful"):
+        # Review k is the recorded comment k % len, k days older than the newest
+        reviews = []
+        for k in range(self.reviews_per_hotel):
+            recorded = self.recorded[k % len(self.recorded)]
+            reviews.append({
+                **recorded,
+                "hotelReviewId": int(hotel_id) * 100000 + k,
+                "reviewComments": f"{recorded['reviewComments']} (stay {k})",
+                "reviewDate": (self.newest - timedelta(days=k)).strftime("%Y-%m-%dT%H:%M:%S+07:00"),
+            })
+        if sorting != "most_recent":
+            # Stable, date-independent order standing in for "most helpful"
+            reviews.sort(key=lambda r: hashlib.md5(str(r["hotelReviewId"]).encode()).hexdigest())
+        return reviews
+
+    def review_page(self, hotel_id, page, page_size, sorting):
+        reviews = self.reviews(hotel_id, sorting)
+        start = (page - 1) * page_size
+        return {
+            "hotelId": int(hotel_id),
+            "page": page,
+            "pageSize": page_size,
+            "totalCount": len(reviews),
+            "comments": reviews[start:start + page_size],
+        }
+
+    # --- Markup ---
+    def home_page(self):
+        return HOME_TEMPLATE
+
+    def search_page(self, city):
+        return SEARCH_TEMPLATE.format(
+            city=html.escape(city),
+            stars="".join(
+                f'<label data-element-name="search-filter-starratingwithluxury" data-element-value="{n}">'
+                f'<input type="checkbox"> {n} star</label>'
+                for n in range(5, 0, -1)
+            ),
+            # Embedded like a server-rendered state blob; escaped for <script>
+            listings=json.dumps(self.listings()).replace("</", "<\\/"),
+            page_size=self.listing_page_size,
+        )
+
+    def render_comment(self, comment):
+        date = datetime.fromisoformat(comment["reviewDate"][:19])
+        return (
+            '<div class="Review-comment">'
+            f'<div class="Review-statusBar-left"><span>Reviewed {format_display_date(date)}</span></div>'
+            f'<p class="Review-comment-bodyText">{html.escape(comment["reviewComments"])}</p>'
+            "</div>"
+        )
+
+    def hotel_page(self, hotel_id):
+        first_page = ""
+        loaded_pages = 0
+        total = self.reviews_per_hotel
+        if self.ssr_first_page:
+            payload = self.review_page(hotel_id, 1, self.page_size, "most_helpful")
+            first_page = "".join(self.render_comment(c) for c in payload["comments"])
+            loaded_pages = 1
+        port = self._server.server_address[1]
+        gallery = "".join(
+            f'<img src="/static/photo-{hotel_id}-{n}.jpg" width="320" height="200">'
+            for n in range(self.gallery_images)
+        )
+        return HOTEL_TEMPLATE.format(
+            gallery=gallery,
+            tracker_url=f"http://{self.tracker_host}:{port}/tracker.js",
+            hotel_id=hotel_id,
+            hotel_name=html.escape(self.hotel_name(hotel_id)),
+            rating="8.6",
+            page_size=self.page_size,
+            loaded_pages=loaded_pages,
+            total=total,
+            first_page=first_page,
+            api_path=REVIEW_API_PATH,
+        )
+
+    # --- Server ---
+    def start(self, host="127.0.0.1", port=0):
+        site = self
+
+        class Handler(FixtureRequestHandler):
+            fixture = site
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    fixture = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_bytes(self, data, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path
+        if path == "/":
+            return self._send(200, self.fixture.home_page(), "text/html; charset=utf-8")
+        if path == "/search":
+            city = parse_qs(url.query).get("city", [""])[0]
+            return self._send(200, self.fixture.search_page(city), "text/html; charset=utf-8")
+        if path.startswith("/static/photo-"):
+            return self._send_bytes(os.urandom(self.fixture.image_kb * 1024), "image/jpeg")
+        if path == "/static/font.woff2":
+            return self._send_bytes(os.urandom(64 * 1024), "font/woff2")
+        if path == "/tracker.js":
+            return self._send(200, TRACKER_SCRIPT, "application/javascript")
+        if path == "/beacon":
+            return self._send(204, "", "text/plain")
+        match = re.fullmatch(r"/hotel/(\d+)\.html", path)
+        if match and match.group(1) in self.fixture.hotel_ids():
+            return self._send(200, self.fixture.hotel_page(match.group(1)), "text/html; charset=utf-8")
+        self._send(404, "not found", "text/plain")
+
+    def do_POST(self):
+        if self.path.split("?")[0] != REVIEW_API_PATH:
+            return self._send(404, "not found", "text/plain")
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send(400, '{"error": "bad json"}', "application/json")
+        hotel_id = str(body.get("hotelId", ""))
+        if hotel_id not in self.fixture.hotel_ids():
+            return self._send(404, '{"error": "unknown hotel"}', "application/json")
+
+        with self.fixture._lock:
+            self.fixture.api_calls += 1
+        if self.fixture.api_latency_ms:
+            time.sleep(self.fixture.api_latency_ms / 1000)
+        payload = self.fixture.review_page(
+            hotel_id,
+            int(body.get("page", 1)),
+            int(body.get("pageSize", self.fixture.page_size)),
+            body.get("sorting", "most_helpful"),
+        )
+        self._send(200, json.dumps(payload), "application/json")
+
+
+HOME_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><title>Fixture home</title></head>
+<body>
+  <div id="onetrust-banner">
+    <button id="onetrust-accept-btn-handler">Accept</button>
+  </div>
+  <form action="/search" method="GET">
+    <input name="city" placeholder="Enter a destination or property" autocomplete="off">
+    <button type="submit" data-selenium="searchButton">Search</button>
+  </form>
+  <script>
+    document.getElementById("onetrust-accept-btn-handler").addEventListener("click", () => {
+      document.cookie = "OptanonAlertBoxClosed=" + new Date().toISOString() + "; path=/";
+      document.getElementById("onetrust-banner").remove();
+    });
+  </script>
+</body>
+</html>
+"""
+
+SEARCH_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><title>Hotels in {city}</title></head>
+<body>
+  <h1>Hotels in {city}</h1>
+  <div class="filters">{stars}</div>
+  <ol id="hotel-list"></ol>
+  <div id="pager"></div>
+
+  <script>
+    const LISTINGS = {listings};
+    const PAGE_SIZE = {page_size};
+    const list = document.getElementById("hotel-list");
+    const pager = document.getElementById("pager");
+    let stars = null;
+    let page = 1;
+
+    function matching() {{
+      return stars === null ? LISTINGS : LISTINGS.filter(hotel => hotel.stars === stars);
+    }}
+
+    // Like the real results page: one page of cards at a time, replaced in
+    // place when Next is clicked
+    function render() {{
+      const hotels = matching();
+      list.innerHTML = "";
+      hotels.slice((page - 1) * PAGE_SIZE, page * PAGE_SIZE).forEach(hotel => {{
+        const item = document.createElement("li");
+        item.dataset.hotelid = hotel.id;
+        item.innerHTML = '<div data-selenium="hotel-item"><a><h3></h3></a><span class="stars"></span></div>';
+        item.querySelector("a").href = hotel.url;
+        item.querySelector("h3").textContent = hotel.name;
+        item.querySelector(".stars").textContent = `${{hotel.stars}} star`;
+        list.appendChild(item);
+      }});
+      pager.innerHTML = "";
+      if (page * PAGE_SIZE < hotels.length) {{
+        const next = document.createElement("button");
+        next.textContent = "Next";
+        next.addEventListener("click", () => {{
+          page += 1;
+          setTimeout(render, 50);
+        }});
+        pager.appendChild(next);
+      }}
+    }}
+
+    document.querySelectorAll("label[data-element-value]").forEach(label => {{
+      label.addEventListener("click", () => {{
+        stars = Number(label.dataset.elementValue);
+        page = 1;
+        render();
+      }});
+    }});
+    render();
+  </script>
+</body>
+</html>
+"""
+
+HOTEL_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+  <title>{hotel_name}</title>
+  <style>
+    @font-face {{ font-family: "Fixture Sans"; src: url("/static/font.woff2") format("woff2"); }}
+    body {{ font-family: "Fixture Sans", sans-serif; }}
+  </style>
+  <script src="{tracker_url}"></script>
+</head>
+<body>
+  <h1 data-selenium="hotel-header-name">{hotel_name}</h1>
+  <div class="gallery">{gallery}</div>
+  <span data-element-name="mosaic-hotel-rating-container">{rating}</span>
+  <a data-element-name="review-score-and-count" href="#reviews">Reviews ({total})</a>
+
+  <div id="reviews">
+    <button data-selenium="review-sort-dropdown-button">Sort by</button>
+    <ul id="sort-options" style="display: none;">
+      <li data-selenium="review-sort-dropdown-option-most_helpful">Most helpful</li>
+      <li data-selenium="review-sort-dropdown-option-most_recent">Most recent</li>
+    </ul>
+    <div id="review-list">{first_page}</div>
+    <button class="Review-paginator-button">Show More Reviews</button>
+  </div>
+
+  <script>
+    const HOTEL_ID = {hotel_id};
+    const PAGE_SIZE = {page_size};
+    const MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+                    "August", "September", "October", "November", "December"];
+    const list = document.getElementById("review-list");
+    const paginator = document.querySelector("button.Review-paginator-button");
+    let page = {loaded_pages};
+    let sorting = "most_helpful";
+
+    function render(comment) {{
+      const [y, m, d] = comment.reviewDate.slice(0, 10).split("-").map(Number);
+      const node = document.createElement("div");
+      node.className = "Review-comment";
+      node.innerHTML = '<div class="Review-statusBar-left"><span></span></div>' +
+                       '<p class="Review-comment-bodyText"></p>';
+      node.querySelector("span").textContent = `Reviewed ${{MONTHS[m - 1]}} ${{d}}, ${{y}}`;
+      node.querySelector("p").textContent = comment.reviewComments;
+      list.appendChild(node);
+    }}
+
+    async function loadPage(reset) {{
+      if (reset) {{
+        page = 0;
+        list.innerHTML = "";
+      }}
+      page += 1;
+      paginator.disabled = true;
+      const response = await fetch("{api_path}", {{
+        method: "POST",
+        headers: {{"Content-Type": "application/json"}},
+        body: JSON.stringify({{hotelId: HOTEL_ID, page, pageSize: PAGE_SIZE, sorting}})
+      }});
+      const data = await response.json();
+      data.comments.forEach(render);
+      paginator.disabled = page * PAGE_SIZE >= data.totalCount;
+    }}
+
+    paginator.addEventListener("click", () => loadPage(false));
+    document.querySelector("[data-selenium='review-sort-dropdown-button']")
+      .addEventListener("click", () => {{
+        document.getElementById("sort-options").style.display = "block";
+      }});
+    document.querySelectorAll("#sort-options li").forEach(option => {{
+      option.addEventListener("click", () => {{
+        sorting = option.dataset.selenium.replace("review-sort-dropdown-option-", "");
+        document.getElementById("sort-options").style.display = "none";
+        loadPage(true);
+      }});
+    }});
+    if (page === 0) {{
+      loadPage(false);
+    }}
+  </script>
+</body>
+</html>
+"""
+
+TRACKER_SCRIPT = """
+(function () {
+  // Stand-in for analytics tags: burn some CPU and phone home periodically
+  const beacon = new URL("/beacon", document.currentScript.src);
+  let x = 0;
+  for (let i = 0; i < 2e6; i++) { x += Math.sqrt(i); }
+  setInterval(() => fetch(`${beacon}?x=${x}`, {mode: "no-cors"}), 1000);
+})();
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the offline Agoda fixture site")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--hotels", type=int, default=5)
+    parser.add_argument("--reviews", type=int, default=120)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--ssr", action="store_true", help="Render the first review page in HTML")
+    parser.add_argument("--listing-page-size", type=int, default=10)
+    args = parser.parse_args()
+
+    site = FixtureSite(
+        hotel_count=args.hotels,
+        reviews_per_hotel=args.reviews,
+        page_size=args.page_size,
+        api_latency_ms=args.latency_ms,
+        ssr_first_page=args.ssr,
+        listing_page_size=args.listing_page_size,
+    )
+    site.start(port=args.port)
+    print(f"🧪 Fixture site running at {site.base_url} (search: {site.base_url}/search?city=Fixture)")
+    for hotel_id in site.hotel_ids():
+        print(f"   {site.hotel_url(hotel_id)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
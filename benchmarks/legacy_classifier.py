@@ -0,0 +1,94 @@
+# The hand-written classifier that module/rules/accessibility_labels.json
+# replaced, kept verbatim as the reference for the rule engine parity check.
+def classify_sentence(sentence):
+    sentence = sentence.lower()
+    words = sentence.split()
+    result = set()
+
+    def contains_all(word_list):
+        return all(word in sentence for word in word_list)
+
+    if any(word in words for word in ['stairs', 'steps', 'climbing']):
+        result.add("2a_1")
+    if any(word in words for word in ['ramp', 'incline']):
+        result.add("2b_1")
+    if ('dark' in words or 'poor lighting' in sentence) and ('room' in words or 'lobby' in words):
+        result.add("2d")
+    if 'shower' in words:
+        result.add("2e_1")
+    if 'bathtub' in words and ('safe' in words or 'climb-in shower' in sentence):
+        result.update(["2f_1", "2f_2"])
+    if 'toilet' in words and 'rails' in words:
+        result.add("2f_4")
+    if 'elevators' in words or 'elevator' in words:
+        result.add("2g_1")
+    if 'escalator' in words or 'escalators' in words:
+        result.add("2h_1")
+    if 'transport' in words and 'options' in words:
+        result.add("3a_1")
+    if 'buggy' in words or 'buggies' in words:
+        result.add("3b")
+    if 'shuttle' in words:
+        result.add("3c")
+    if 'conveniences' in words or 'convenience' in words:
+        result.add("3d_1")
+    if 'central' in words and 'location' in words:
+        result.add("3d_2")
+    if 'medical' in words:
+        result.add("3e_1")
+    if 'taxi' in words:
+        result.add("3f")
+    if 'doctor' in words:
+        result.add("3g")
+    if ('quiet' in words or 'noise' in words or 'noisy' in words) and 'room' in words:
+        result.add("4a")
+    if 'atm' in words:
+        result.add("4b")
+    if 'language' in words and 'spoken' in words:
+        result.add("4c_1")
+    if 'flexible' in words and ('check-in' in words or 'check-out' in words):
+        result.add("4d")
+    if 'pillow' in words:
+        result.add("4e")
+    if 'air conditioning' in sentence:
+        result.add("4f")
+    if 'power points' in sentence or 'power outlets' in sentence:
+        result.add("4g")
+    if 'valet parking' in sentence:
+        result.add("4h")
+    if any(phrase in sentence for phrase in ['concierge', 'luggage handling', 'luggage storage']):
+        result.add("4i")
+    if 'parking' in words and 'valet parking' not in sentence:
+        result.add("4j")
+    if 'vegetarian' in words:
+        result.add("5a_1")
+    if 'vegan' in words:
+        result.add("5a_2")
+    if 'halal' in words:
+        result.add("5a_3")
+    if 'low' in words and 'sodium' in words:
+        result.add("5a_4")
+    if 'diabetic' in words:
+        result.add("5a_5")
+    if 'low' in words and 'spice' in words:
+        result.add("5a_6")
+    if ('customize' in words or 'flexible' in words) and 'food' in words:
+        result.add("5a_7")
+    if 'coffee maker' in sentence or 'tea maker' in sentence:
+        result.add("5b")
+    if 'near' in words and any(word in words for word in ['restaurants', 'cafe', 'eateries']):
+        result.add("5c_1")
+    if ('anti-skid' in words or 'non-slip' in words) and 'floor' in words:
+        result.add("6a")
+    if 'spa' in words or 'wellness' in words:
+        result.add("6b_1")
+    if any(word in words for word in ['yoga', 'meditation', 'pilates']):
+        result.add("6c_1")
+    if 'gym' in words:
+        result.add("6d_1")
+    if 'adult friendly' in sentence or ('quiet' in words and ('pool' in words or 'hotel' in words)):
+        result.add("6e")
+    if any(word in words for word in ['elderly', 'senior', 'older']):
+        result.add("7a")
+
+    return list(result)
@@ -1,20 +1,57 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory
+import time
+_BOOT_STARTED = time.perf_counter()
+
+from flask import Flask, Response, render_template, request, url_for, send_file, send_from_directory, jsonify, stream_with_context
+from werkzeug.utils import safe_join
+import json
 import os
 from datetime import datetime
-from module.scraper import scrape_reviews_from_agoda
-from module.sentiment_analysis import run_sentiment_analysis
+from module.scraper import (
+    scrape_reviews_from_agoda, DEFAULT_MAX_HOTELS, DEFAULT_CONCURRENCY,
+    DEFAULT_EXTRACTION_MODE, EXTRACTION_MODES
+)
+from module.sentiment_analysis import run_sentiment_analysis, ANALYSIS_WORKERS
+from module.browser_profile import BROWSER_PROFILES, DEFAULT_BROWSER_PROFILE
+from module.browser_pool import get_browser_pool
+from module.model_service import get_model_service
+from module.inference_backends import BACKENDS, DEFAULT_BACKEND
+from module.result_store import ResultStore, is_result_database, OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, output_extension
+from module.fused_pipeline import run_fused_scrape_and_analysis
+from module.crawl_scheduler import CrawlTask, run_crawl_batch, crawl_batch_summary, batch_id_for, check_batch_id
+from module.rate_limit import get_rate_limiter
+from module.sentiment_aggregates import aggregates_path_for, read_aggregates, filter_aggregates
+from module.exports import Export
+from module import metrics
+from module.jobs import submit_job, get_job, list_jobs, cancel_job, iter_job_events, JobQueueFull, DONE
 
 app = Flask(__name__)
 OUTPUT_FOLDER = os.path.join(os.getcwd(), 'output')
+# Load the sentiment model in the background at boot instead of on the first analysis
+WARM_START_MODEL = os.environ.get('SENTIMENT_WARM_START', '0') == '1'
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    # Form defaults come from the same settings the endpoints fall back to
+    return render_template(
+        'index.html', max_hotels=DEFAULT_MAX_HOTELS, concurrency=DEFAULT_CONCURRENCY,
+        extraction_mode=DEFAULT_EXTRACTION_MODE, browser_profile=DEFAULT_BROWSER_PROFILE,
+    )
 
 @app.route('/start-scraping', methods=['POST'])
 def start_scraping():
     city = request.form['city']
     star_rating = int(request.form['star_rating'])
+    max_hotels = request.form.get('max_hotels', type=int, default=DEFAULT_MAX_HOTELS)
+    concurrency = request.form.get('concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    extraction_mode = request.form.get('extraction_mode') or DEFAULT_EXTRACTION_MODE
+    if extraction_mode not in EXTRACTION_MODES:
+        return jsonify({"error": f"Unknown extraction mode '{extraction_mode}'"}), 400
+    incremental = request.form.get('incremental') == 'on'
+    fused = request.form.get('fused') == 'on'
+    refresh_listings = request.form.get('refresh_listings') == 'on'
+    browser_profile = request.form.get('browser_profile') or DEFAULT_BROWSER_PROFILE
+    if browser_profile not in BROWSER_PROFILES:
+        return jsonify({"error": f"Unknown browser profile '{browser_profile}'"}), 400
     
     # Get date parameters from form (they might be empty)
     start_date = request.form.get('start_date', '')
@@ -40,35 +77,321 @@ def start_scraping():
         except ValueError:
             print("⚠️ Invalid end date format, ignoring date filter")
     
-    # Call the scraper with date parameters
-    scrape_reviews_from_agoda(
-        city=city,
-        star_rating=star_rating,
-        start_date=formatted_start_date,
-        end_date=formatted_end_date
+    sanitized_city = city.lower().replace(" ", "_")
+
+    # Hand the scraper to the job pool and return immediately. Fused jobs
+    # also score reviews while later hotels are still being scraped.
+    try:
+        job = submit_job(
+            "scraping",
+            run_fused_scrape_and_analysis if fused else scrape_reviews_from_agoda,
+            city=city,
+            star_rating=star_rating,
+            start_date=formatted_start_date,
+            end_date=formatted_end_date,
+            max_hotels=max(0, max_hotels),
+            concurrency=max(1, concurrency),
+            extraction_mode=extraction_mode,
+            incremental=incremental,
+            browser_profile=browser_profile,
+            refresh_listings=refresh_listings
+        )
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({
+        "job_id": job.id,
+        "status_url": url_for('job_status', job_id=job.id),
+        "analysis_url": url_for('analysis_page', city=sanitized_city, job=job.id)
+    }), 202
+
+@app.route('/start-crawl', methods=['POST'])
+def start_crawl():
+    # JSON body: {"tasks": [{"city", "star_rating", "start_date", "end_date"}, ...],
+    # plus optional batch_id, fresh and the scraping options of /start-scraping}.
+    # Posting the same tasks again resumes the batch from its checkpoint.
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict) or not isinstance(body.get('tasks') or [], list):
+        return jsonify({"error": "Expected a JSON object with a list of tasks"}), 400
+    try:
+        tasks = [CrawlTask.from_dict(task) for task in body.get('tasks') or []]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid task: {e}"}), 400
+    if not tasks:
+        return jsonify({"error": "No tasks given"}), 400
+    extraction_mode = body.get('extraction_mode') or DEFAULT_EXTRACTION_MODE
+    if extraction_mode not in EXTRACTION_MODES:
+        return jsonify({"error": f"Unknown extraction mode '{extraction_mode}'"}), 400
+    browser_profile = body.get('browser_profile') or DEFAULT_BROWSER_PROFILE
+    if browser_profile not in BROWSER_PROFILES:
+        return jsonify({"error": f"Unknown browser profile '{browser_profile}'"}), 400
+
+    try:
+        batch_id = check_batch_id(body.get('batch_id') or batch_id_for(tasks))
+        max_hotels = max(0, int(body.get('max_hotels', DEFAULT_MAX_HOTELS)))
+        concurrency = max(1, int(body.get('concurrency', DEFAULT_CONCURRENCY)))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    options = dict(
+        max_hotels=max_hotels,
+        concurrency=concurrency,
+        extraction_mode=extraction_mode,
+        incremental=bool(body.get('incremental')),
+        browser_profile=browser_profile,
     )
-    
-    return redirect(url_for('analysis_page', city=city.lower().replace(" ", "_")))
+    try:
+        job = submit_job(
+            "crawl", run_crawl_batch, tasks, batch_id=batch_id, fresh=bool(body.get('fresh')),
+            params={"tasks": [task.to_dict() for task in tasks], "batch_id": batch_id, **options},
+            **options
+        )
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({
+        "job_id": job.id,
+        "batch_id": batch_id,
+        "status_url": url_for('job_status', job_id=job.id),
+        "events_url": url_for('job_events', job_id=job.id),
+        "checkpoint_url": url_for('crawl_status', batch_id=batch_id),
+    }), 202
+
+@app.route('/crawls/<batch_id>')
+def crawl_status(batch_id):
+    # Per-task status and hotel counts from the batch's checkpoint
+    try:
+        summary = crawl_batch_summary(check_batch_id(batch_id))
+    except ValueError:
+        summary = None
+    if summary is None:
+        return jsonify({"error": "Unknown crawl batch"}), 404
+    return jsonify(summary)
 
 @app.route('/analysis/<city>')
 def analysis_page(city):
-    return render_template('analysis.html', city=city)
+    scrape_job_id = request.args.get('job', '')
+    return render_template(
+        'analysis.html', city=city, scrape_job_id=scrape_job_id,
+        backends=BACKENDS, default_backend=DEFAULT_BACKEND,
+        workers=ANALYSIS_WORKERS, max_workers=os.cpu_count() or 1,
+        output_formats=OUTPUT_FORMATS, default_output_format=DEFAULT_OUTPUT_FORMAT,
+    )
 
 @app.route('/start-analysis/<city>', methods=['POST'])
 def start_analysis(city):
     input_path = f"output/agoda_{city}_hotel_reviews.csv"
-    output_filename = f"sentiment_{city}.csv"
+    if not os.path.exists(input_path):
+        return jsonify({"error": f"No scraped reviews found for '{city}'"}), 404
+    output_format = request.form.get('output_format') or DEFAULT_OUTPUT_FORMAT
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({"error": f"Unknown output format '{output_format}'"}), 400
+    output_filename = f"sentiment_{city}{output_extension(output_format)}"
     output_path = os.path.join(OUTPUT_FOLDER, output_filename)
-    run_sentiment_analysis(input_path, output_path)
-    return render_template('download.html', filename=output_filename)
+    backend = request.form.get('backend') or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        return jsonify({"error": f"Unknown inference backend '{backend}'"}), 400
+    workers = request.form.get('workers', type=int) or ANALYSIS_WORKERS
+    if not 1 <= workers <= (os.cpu_count() or 1):
+        return jsonify({"error": f"Workers must be between 1 and {os.cpu_count() or 1}"}), 400
+    # An interrupted analysis of the same file continues unless told otherwise
+    resume = request.form.get('restart') != 'on'
+
+    try:
+        job = submit_job(
+            "analysis", _run_analysis_job, input_path, output_path, backend=backend, workers=workers,
+            output_format=output_format, resume=resume,
+            params={"city": city, "backend": backend, "workers": workers, "output_format": output_format, "resume": resume},
+        )
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({
+        "job_id": job.id,
+        "status_url": url_for('job_status', job_id=job.id)
+    }), 202
+
+def _run_analysis_job(input_path, output_path, backend=None, workers=None, output_format=None, resume=True, job=None):
+    run_sentiment_analysis(
+        input_path, output_path, job=job, backend=backend, workers=workers, output_format=output_format,
+        resume=resume,
+    )
+    return {"filename": os.path.basename(output_path)}
+
+@app.route('/jobs')
+def jobs_index():
+    kind = request.args.get('kind')
+    return jsonify([_job_payload(job) for job in list_jobs(kind)])
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(_job_payload(job))
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    # Server-Sent Events: structured progress (hotels, review pages, scored
+    # windows, status) plus a periodic snapshot with rates and ETA. Browsers
+    # reconnect with Last-Event-ID and only get what they missed.
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    last_event_id = request.headers.get('Last-Event-ID', type=int) or request.args.get('after', type=int) or 0
+
+    def stream():
+        for event in iter_job_events(job, last_event_id):
+            lines = [f"event: {event['event']}"]
+            if "id" in event:
+                lines.append(f"id: {event['id']}")
+            lines.append(f"data: {json.dumps({'time': event['time'], **event['data']})}")
+            yield "\n".join(lines) + "\n\n"
+        yield "event: end\ndata: {}\n\n"
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route('/jobs/<job_id>/profile')
+def job_profile(job_id):
+    # Where this job's time went: per-stage timing summaries and counters
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify({"id": job.id, "kind": job.kind, "status": job.status, **job.metrics.profile()})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def job_cancel(job_id):
+    job = cancel_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(_job_payload(job))
+
+@app.route('/model-service')
+def model_service_status():
+    stats = get_model_service().stats()
+    stats["app_startup_seconds"] = app.config.get('STARTUP_SECONDS')
+    return jsonify(stats)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text exposition of the scraper / analysis timings and counters
+    jobs = {}
+    for job in list_jobs():
+        key = (("kind", job.kind), ("status", job.status))
+        jobs[key] = jobs.get(key, 0) + 1
+    body = metrics.REGISTRY.render_prometheus() + metrics.render_gauge("jobs", jobs)
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/browser-pool')
+def browser_pool_status():
+    return jsonify({**get_browser_pool().stats(), "rate_limit": get_rate_limiter().stats()})
+
+def _job_payload(job):
+    payload = job.to_dict()
+    # Point finished jobs at the file they produced
+    filename = None
+    if isinstance(job.result, dict):
+        filename = job.result.get("filename")
+    elif isinstance(job.result, str):
+        filename = os.path.basename(job.result)
+    if filename and job.status == DONE:
+        payload["download_url"] = url_for('download_file', filename=filename)
+        if filename.endswith(".sqlite"):
+            payload["csv_export_url"] = url_for('export_csv', filename=filename)
+        if filename.startswith("sentiment_"):
+            city = os.path.splitext(filename)[0][len("sentiment_"):]
+            payload["aggregates_url"] = url_for('sentiment_aggregates', city=city)
+    return payload
+
+@app.route('/aggregates/<city>')
+def sentiment_aggregates(city):
+    # Per-hotel, per-label sentiment summaries the analysis keeps as it
+    # writes rows; ?hotel= and ?label= (repeatable) and ?min_count= narrow
+    # the answer. "complete" is false while the analysis is still running.
+    path = aggregates_path_for(os.path.join(OUTPUT_FOLDER, f"sentiment_{os.path.basename(city)}.csv"))
+    data = read_aggregates(path)
+    if data is None:
+        return jsonify({"error": f"No sentiment aggregates for '{city}'"}), 404
+    return jsonify(filter_aggregates(
+        data,
+        hotels=request.args.getlist('hotel'),
+        labels=request.args.getlist('label'),
+        min_count=request.args.get('min_count', type=int, default=0),
+    ))
 
 @app.route('/download/<filename>')
 def download_file(filename):
-    return send_from_directory(OUTPUT_FOLDER, filename, as_attachment=True)
+    # As-is by default (Range requests work). ?compress=gzip|zstd, ?columns=a,b
+    # and ?label= / ?hotel= (repeatable) ask for an export instead: streamed
+    # the first time, then served from its cached copy with Range support.
+    compression = request.args.get('compress') or None
+    columns = [column for column in request.args.get('columns', '').split(',') if column]
+    labels = request.args.getlist('label')
+    hotels = request.args.getlist('hotel')
+    if not (compression or columns or labels or hotels):
+        return send_from_directory(OUTPUT_FOLDER, filename, as_attachment=True)
+
+    source = safe_join(OUTPUT_FOLDER, filename)
+    if source is None or not os.path.isfile(source):
+        return jsonify({"error": f"No file '{filename}'"}), 404
+    name = os.path.basename(source)
+    try:
+        if source.endswith(".sqlite"):
+            source = _flat_csv(source)
+            name = os.path.splitext(name)[0] + ".csv"
+        export = Export(source, compression, columns, labels, hotels, name=name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    path = export.cached()
+    if path is None and request.range is not None:
+        # Resuming a download whose export was never finished
+        path = export.build()
+    if path is not None:
+        return send_file(path, mimetype=export.mimetype, as_attachment=True, download_name=export.filename)
+    return Response(
+        stream_with_context(export.iter_chunks()),
+        mimetype=export.mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{export.filename}"'},
+    )
+
+def _flat_csv(db_path):
+    # Flat CSV derived from a normalized .sqlite result, rebuilt when stale.
+    # It gets its own name: <root>.csv may be a CSV-mode result of the same city.
+    if not is_result_database(db_path):
+        raise ValueError(f"'{os.path.basename(db_path)}' is not an analysis database")
+    csv_path = os.path.splitext(db_path)[0] + ".export.csv"
+    if not os.path.exists(csv_path) or os.path.getmtime(csv_path) < os.path.getmtime(db_path):
+        store = ResultStore(db_path)
+        try:
+            store.export_csv(csv_path)
+        finally:
+            store.close()
+    return csv_path
+
+@app.route('/export-csv/<filename>')
+def export_csv(filename):
+    db_path = os.path.join(OUTPUT_FOLDER, os.path.basename(filename))
+    if not filename.endswith(".sqlite") or not os.path.exists(db_path):
+        return jsonify({"error": f"No analysis database '{filename}'"}), 404
+    try:
+        csv_path = _flat_csv(db_path)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return send_from_directory(
+        OUTPUT_FOLDER, os.path.basename(csv_path), as_attachment=True,
+        download_name=os.path.splitext(os.path.basename(db_path))[0] + ".csv",
+    )
 
 if __name__ == '__main__':
     try:
-        print("Starting Flask server...")
+        app.config['STARTUP_SECONDS'] = time.perf_counter() - _BOOT_STARTED
+        print(f"Starting Flask server... (app ready in {app.config['STARTUP_SECONDS']:.2f}s)")
+        if WARM_START_MODEL:
+            get_model_service().warm_up_in_background()
         app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
     except Exception as e:
         print(f"Error starting server: {e}")
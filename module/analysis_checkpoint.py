@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import time
+
+# Sidecar next to an analysis output recording how far it got: how many input
+# reviews are fully written, how many windows were committed, and (for CSV
+# output) the byte length of the output at that point. A restarted analysis
+# cuts the output back to that length and continues from that review, so
+# rows from a window that was being written during a crash are not repeated.
+#
+# The checkpoint also records what it was taken against (the input, backend,
+# output format, shard range), so a restart with different settings or a
+# rewritten input starts over instead of splicing two runs together.
+
+# Hash this much of the input's head to recognise it again
+INPUT_HEAD_BYTES = 64 * 1024
+
+
+def checkpoint_path_for(output_file):
+    return f"{output_file}.checkpoint.json"
+
+
+def partial_path_for(output_file):
+    # Where a resumable analysis writes until it completes
+    return f"{output_file}.partial"
+
+
+def input_signature(input_file):
+    size = os.path.getsize(input_file)
+    with open(input_file, "rb") as f:
+        head = f.read(min(size, INPUT_HEAD_BYTES))
+    return {"size": size, "head_bytes": len(head), "head_sha1": hashlib.sha1(head).hexdigest()}
+
+
+def same_input(signature, input_file):
+    # Reviews appended since (an incremental re-crawl) keep the row numbers
+    # of a checkpoint valid; a shorter or rewritten file does not
+    if not signature or not os.path.exists(input_file):
+        return False
+    if os.path.getsize(input_file) < signature["size"]:
+        return False
+    with open(input_file, "rb") as f:
+        head = f.read(signature["head_bytes"])
+    return hashlib.sha1(head).hexdigest() == signature["head_sha1"]
+
+
+class AnalysisCheckpoint:
+    def __init__(self, output_file, input_rows=0, windows=0, output_bytes=None, meta=None):
+        self.output_file = output_file
+        self.path = checkpoint_path_for(output_file)
+        self.input_rows = input_rows
+        self.windows = windows
+        self.output_bytes = output_bytes
+        self.meta = meta or {}
+
+    @classmethod
+    def resume(cls, output_file, input_file, resume=True, **settings):
+        # The checkpoint to continue output_file from if it matches this
+        # input and these settings (JSON-able values), else a cleared one
+        checkpoint = cls.load(output_file)
+        if checkpoint.resuming and not (resume and checkpoint.matches(input_file, settings)):
+            if resume:
+                print(f"⚠️ Checkpoint '{checkpoint.path}' was taken with other settings or input, starting over")
+            checkpoint.clear()
+        checkpoint.meta = {"input": input_signature(input_file), "settings": settings}
+        return checkpoint
+
+    def matches(self, input_file, settings):
+        return self.meta.get("settings") == settings and same_input(self.meta.get("input"), input_file)
+
+    @classmethod
+    def load(cls, output_file):
+        # A checkpoint without its output (or an unreadable one) means start over
+        path = checkpoint_path_for(output_file)
+        if os.path.exists(path) and os.path.exists(output_file):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    state = json.load(f)
+                return cls(
+                    output_file,
+                    input_rows=state["input_rows"],
+                    windows=state.get("windows", 0),
+                    output_bytes=state.get("output_bytes"),
+                    meta=state.get("meta"),
+                )
+            except (ValueError, KeyError, OSError) as e:
+                print(f"⚠️ Ignoring unreadable checkpoint '{path}': {e}")
+        return cls(output_file)
+
+    @property
+    def resuming(self):
+        return self.input_rows > 0
+
+    def save(self, input_rows, output_bytes=None):
+        self.input_rows = input_rows
+        self.windows += 1
+        self.output_bytes = output_bytes
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "input_rows": self.input_rows,
+                "windows": self.windows,
+                "output_bytes": self.output_bytes,
+                "meta": self.meta,
+                "saved_at": time.time(),
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.input_rows = 0
+        self.windows = 0
+        self.output_bytes = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,46 @@
+import os
+
+# Sentences are buffered into a window, tokenized once without padding and
+# grouped by token length, so each forward pass pads to the longest sentence
+# of similar-length neighbours instead of the longest one in file order.
+# Batches are capped by padded tokens (rows x longest row) rather than by a
+# sentence count: short sentences go through in large batches, long ones in
+# small batches, and peak memory per pass stays roughly constant.
+WINDOW_SIZE = int(os.environ.get("SENTIMENT_BATCH_WINDOW", "1024"))
+TOKEN_BUDGET = int(os.environ.get("SENTIMENT_TOKEN_BUDGET", "8192"))
+MAX_BATCH_SENTENCES = int(os.environ.get("SENTIMENT_MAX_BATCH", "256"))
+MAX_LENGTH = 512
+
+
+def plan_batches(lengths, token_budget=TOKEN_BUDGET, max_sentences=MAX_BATCH_SENTENCES):
+    # Returns lists of indices into `lengths`. Indices are visited shortest
+    # first, so the sentence being added is always the batch's longest.
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches = []
+    batch = []
+    for index in order:
+        padded = (len(batch) + 1) * lengths[index]
+        if batch and (padded > token_budget or len(batch) >= max_sentences):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def fixed_batches(count, batch_size):
+    # The previous behaviour: consecutive runs of batch_size in file order
+    return [list(range(start, min(start + batch_size, count))) for start in range(0, count, batch_size)]
+
+
+def padding_stats(batches, lengths):
+    # Real tokens vs tokens actually pushed through the model
+    real = sum(lengths)
+    padded = sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+    return {
+        "batches": len(batches),
+        "real_tokens": real,
+        "padded_tokens": padded,
+        "padding_waste": (padded - real) / padded if padded else 0.0,
+    }
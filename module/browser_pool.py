@@ -0,0 +1,225 @@
+import atexit
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from playwright.sync_api import sync_playwright
+
+from module.browser_profile import get_browser_profile
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Warm browsers shared by every scraping job in the process. Sync Playwright
+# objects only work on the thread that created them, so each slot is a
+# long-lived thread owning one browser and one reusable context; callers hand
+# it a function to run against that context instead of launching their own.
+POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "2"))
+RECYCLE_AFTER_PAGES = int(os.environ.get("BROWSER_RECYCLE_PAGES", "200"))
+RECYCLE_ABOVE_MB = int(os.environ.get("BROWSER_RECYCLE_MB", "1500"))
+STATE_DIR = os.path.join("output", "browser_state")
+
+
+def storage_state_path(profile):
+    return os.path.join(STATE_DIR, f"{profile.name}.json")
+
+
+class BrowserSlot:
+    def __init__(self, slot_id):
+        self.slot_id = slot_id
+        self.profile = None
+        self.pages_opened = 0
+        self.launches = 0
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._tasks = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._loop, name=f"browser-slot-{slot_id}", daemon=True
+        )
+        self._thread.start()
+
+    # --- Public, callable from any thread ---
+    def submit(self, fn, profile):
+        future = Future()
+        self._tasks.put((fn, profile, future))
+        return future
+
+    def stop(self):
+        self._tasks.put(None)
+        self._thread.join(timeout=30)
+
+    # --- Slot thread only ---
+    def _loop(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                self._close_browser()
+                if self._playwright:
+                    self._playwright.stop()
+                return
+            fn, profile, future = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                context = self._lease_context(profile)
+                result = fn(context)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                self._release_context()
+
+    def _lease_context(self, profile):
+        if self._browser is not None and (
+            self.profile is not profile or not self._browser.is_connected()
+        ):
+            print(f"♻️ Browser slot {self.slot_id}: relaunching ({'profile change' if self.profile is not profile else 'disconnected'})")
+            self._close_browser()
+
+        if self._browser is None:
+            if self._playwright is None:
+                self._playwright = sync_playwright().start()
+            self.profile = profile
+            self._browser = profile.launch(self._playwright)
+            self.pages_opened = 0
+            self.launches += 1
+            print(f"🚀 Browser slot {self.slot_id}: launched '{profile.name}' browser")
+
+        if self._context is None:
+            state_path = storage_state_path(profile)
+            options = {"storage_state": state_path} if os.path.exists(state_path) else {}
+            self._context = profile.new_context(self._browser, **options)
+            self._context.on("page", self._count_page)
+        return self._context
+
+    def _count_page(self, page):
+        self.pages_opened += 1
+
+    def _release_context(self):
+        if self._context is None:
+            return
+        try:
+            # Keep cookies/consent for the next lease and for fresh browsers.
+            # Slots share the profile's file, so it is replaced whole: another
+            # slot opening a context never reads a half-written one.
+            os.makedirs(STATE_DIR, exist_ok=True)
+            state_path = storage_state_path(self.profile)
+            tmp_path = f"{state_path}.slot{self.slot_id}.tmp"
+            self._context.storage_state(path=tmp_path)
+            os.replace(tmp_path, state_path)
+            for page in list(self._context.pages):
+                page.close()
+        except Exception as e:
+            print(f"⚠️ Browser slot {self.slot_id}: context cleanup failed ({e}), recycling")
+            self._close_browser()
+            return
+
+        reason = self._recycle_reason()
+        if reason:
+            print(f"♻️ Browser slot {self.slot_id}: recycling after {reason}")
+            self._close_browser()
+
+    def _recycle_reason(self):
+        if RECYCLE_AFTER_PAGES and self.pages_opened >= RECYCLE_AFTER_PAGES:
+            return f"{self.pages_opened} pages"
+        rss = self.browser_rss_mb()
+        if rss is not None and RECYCLE_ABOVE_MB and rss > RECYCLE_ABOVE_MB:
+            return f"{rss:.0f} MB RSS"
+        return None
+
+    def browser_rss_mb(self):
+        if psutil is None or self._browser is None:
+            return None
+        try:
+            cdp = self._browser.new_browser_cdp_session()
+            processes = cdp.send("SystemInfo.getProcessInfo")["processInfo"]
+            cdp.detach()
+        except Exception:
+            return None
+        total = 0
+        for info in processes:
+            try:
+                total += psutil.Process(info["id"]).memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    def _close_browser(self):
+        try:
+            if self._context is not None:
+                self._context.close()
+            if self._browser is not None:
+                self._browser.close()
+        except Exception:
+            pass
+        self._context = None
+        self._browser = None
+
+
+class BrowserPool:
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self._slots = [BrowserSlot(n) for n in range(size)]
+        self._idle = queue.Queue()
+        for slot in self._slots:
+            self._idle.put(slot)
+        self._closed = False
+
+    def run(self, fn, profile=None, job=None):
+        # Runs fn(context) on a free warm browser and returns its result. The
+        # context's pages are closed afterwards; cookies are kept.
+        profile = get_browser_profile(profile)
+        slot = self._acquire(job)
+        try:
+            return slot.submit(fn, profile).result()
+        finally:
+            self._idle.put(slot)
+
+    def _acquire(self, job=None):
+        while True:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+            if job:
+                job.check_cancelled()
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "slots": [
+                {
+                    "slot": slot.slot_id,
+                    "profile": slot.profile.name if slot.profile else None,
+                    "launches": slot.launches,
+                    "pages_since_launch": slot.pages_opened,
+                }
+                for slot in self._slots
+            ],
+        }
+
+    def close(self):
+        self._closed = True
+        for slot in self._slots:
+            slot.stop()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+        return _pool
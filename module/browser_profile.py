@@ -0,0 +1,129 @@
+import os
+from urllib.parse import urlparse
+
+# Resource types the scraper never reads: reviews, hotel names and listing
+# links all come from HTML, scripts and XHR/fetch responses.
+BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+
+# Third-party analytics/ads hosts loaded by agoda.com pages
+TRACKER_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "facebook.net",
+    "facebook.com",
+    "hotjar.com",
+    "criteo.com",
+    "criteo.net",
+    "adnxs.com",
+    "taboola.com",
+    "outbrain.com",
+    "bing.com",
+    "clarity.ms",
+    "newrelic.com",
+    "nr-data.net",
+    "quantserve.com",
+    "scorecardresearch.com",
+    "tiktok.com",
+    "branch.io",
+    "appsflyer.com",
+)
+
+
+def _matches_domain(host, domains):
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+class BrowserProfile:
+    def __init__(
+        self,
+        name,
+        headless=False,
+        block_resource_types=(),
+        block_domains=(),
+        viewport=None,
+        java_script_enabled=True,
+        block_service_workers=False,
+        reduced_motion=False,
+        extra_args=(),
+    ):
+        self.name = name
+        self.headless = headless
+        self.block_resource_types = frozenset(block_resource_types)
+        self.block_domains = tuple(block_domains)
+        self.viewport = viewport
+        self.java_script_enabled = java_script_enabled
+        self.block_service_workers = block_service_workers
+        self.reduced_motion = reduced_motion
+        self.extra_args = list(extra_args)
+
+    @property
+    def blocks_requests(self):
+        return bool(self.block_resource_types or self.block_domains)
+
+    def launch(self, playwright):
+        return playwright.chromium.launch(headless=self.headless, args=self.extra_args)
+
+    def context_options(self):
+        options = {"java_script_enabled": self.java_script_enabled}
+        if self.viewport:
+            options["viewport"] = self.viewport
+        if self.block_service_workers:
+            options["service_workers"] = "block"
+        if self.reduced_motion:
+            options["reduced_motion"] = "reduce"
+        return options
+
+    def should_block(self, request):
+        if request.resource_type in self.block_resource_types:
+            return True
+        if self.block_domains:
+            host = urlparse(request.url).hostname or ""
+            return _matches_domain(host, self.block_domains)
+        return False
+
+    def _route(self, route):
+        if self.should_block(route.request):
+            route.abort()
+        else:
+            route.continue_()
+
+    def new_context(self, browser, **kwargs):
+        context = browser.new_context(**{**self.context_options(), **kwargs})
+        if self.blocks_requests:
+            context.route("**/*", self._route)
+        return context
+
+    def with_overrides(self, **overrides):
+        settings = dict(vars(self))
+        settings.update(overrides)
+        return BrowserProfile(**settings)
+
+
+BROWSER_PROFILES = {
+    # What the scraper always did: a visible browser loading everything
+    "full": BrowserProfile("full"),
+    # For headless Linux workers: skip pixels, fonts and trackers
+    "lean": BrowserProfile(
+        "lean",
+        headless=True,
+        block_resource_types=BLOCKED_RESOURCE_TYPES,
+        block_domains=TRACKER_DOMAINS,
+        viewport={"width": 1280, "height": 800},
+        block_service_workers=True,
+        reduced_motion=True,
+        extra_args=["--disable-gpu", "--disable-dev-shm-usage", "--mute-audio"],
+    ),
+}
+DEFAULT_BROWSER_PROFILE = os.environ.get("SCRAPER_BROWSER_PROFILE", "full")
+
+
+def get_browser_profile(profile=None):
+    if isinstance(profile, BrowserProfile):
+        return profile
+    name = profile or DEFAULT_BROWSER_PROFILE
+    if name not in BROWSER_PROFILES:
+        raise ValueError(f"Unknown browser profile: {name}")
+    return BROWSER_PROFILES[name]
@@ -0,0 +1,349 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from module.jobs import JobCancelled
+from module.rate_limit import get_rate_limiter
+from module.scraper import (
+    scrape_reviews_from_agoda, DEFAULT_MAX_HOTELS, DEFAULT_CONCURRENCY,
+    DEFAULT_EXTRACTION_MODE, EXTRACTION_MODES, HOTEL_RETRIES,
+)
+from module.browser_profile import DEFAULT_BROWSER_PROFILE, BROWSER_PROFILES
+
+# Batch crawls: a list of (city, star rating, date range) tasks scraped one
+# after another, all under the scraper's per-domain rate limit and hotel
+# retries. Progress is checkpointed per hotel in output/crawls/<batch>.sqlite,
+# so running the same batch again (after a crash, a kill or a cancel) skips
+# finished tasks and hotels. A batch's id defaults to a hash of its tasks.
+#
+#   python -m module.crawl_scheduler tasks.json --concurrency 2
+#
+# tasks.json is a list of {"city", "star_rating", "start_date", "end_date"}
+# objects (dates optional, YYYY-MM-DD or DD-MM-YYYY); a CSV with those
+# columns works too.
+CRAWL_DIR = os.path.join("output", "crawls")
+# Batch ids name the checkpoint file, so they can't contain path separators
+BATCH_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+INCOMPLETE = "incomplete"  # finished, but some hotels failed every retry
+FAILED = "failed"
+
+
+def parse_task_date(value):
+    # The scraper's DD-MM-YYYY, from either that or an ISO date
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(value, fmt).strftime("%d-%m-%Y")
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD or DD-MM-YYYY")
+
+
+class CrawlTask:
+    def __init__(self, city, star_rating, start_date=None, end_date=None):
+        if city is None:
+            raise ValueError("A crawl task needs a city")
+        if not isinstance(city, str):
+            raise ValueError(f"A crawl task's city must be a string, not {type(city).__name__}")
+        self.city = city.strip()
+        self.star_rating = int(star_rating)
+        self.start_date = parse_task_date(start_date)
+        self.end_date = parse_task_date(end_date)
+        if not self.city:
+            raise ValueError("A crawl task needs a city")
+        if not 0 <= self.star_rating <= 5:
+            raise ValueError(f"Invalid star rating {self.star_rating} for {self.city}")
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise ValueError(f"A crawl task must be an object, not {type(data).__name__}")
+        return cls(data.get("city"), data.get("star_rating", 0), data.get("start_date"), data.get("end_date"))
+
+    @property
+    def key(self):
+        return f"{self.city.lower()}|{self.star_rating}|{self.start_date or ''}|{self.end_date or ''}"
+
+    def to_dict(self):
+        return {
+            "city": self.city,
+            "star_rating": self.star_rating,
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+        }
+
+
+def load_tasks(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = json.load(f)
+    return [CrawlTask.from_dict(row) for row in rows]
+
+
+def batch_id_for(tasks):
+    keys = "\n".join(sorted(task.key for task in tasks))
+    return hashlib.sha1(keys.encode("utf-8")).hexdigest()[:12]
+
+
+def check_batch_id(batch_id):
+    if not isinstance(batch_id, str) or not BATCH_ID_PATTERN.match(batch_id):
+        raise ValueError(f"Invalid batch id {batch_id!r} (use letters, digits, '-' and '_')")
+    return batch_id
+
+
+def checkpoint_path(batch_id):
+    check_batch_id(batch_id)
+    return os.path.join(CRAWL_DIR, f"{batch_id}.sqlite")
+
+
+class CrawlCheckpoint:
+    # Task and hotel outcomes of one batch. Hotel rows are written as each
+    # hotel finishes, from the scraper's worker threads.
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_key TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                city TEXT NOT NULL,
+                star_rating INTEGER NOT NULL,
+                start_date TEXT,
+                end_date TEXT,
+                status TEXT NOT NULL,
+                error TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS hotels (
+                task_key TEXT NOT NULL,
+                link TEXT NOT NULL,
+                hotel_id TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (task_key, link)
+            ) WITHOUT ROWID;
+            """
+        )
+        self._conn.commit()
+
+    @classmethod
+    def for_batch(cls, batch_id, fresh=False):
+        os.makedirs(CRAWL_DIR, exist_ok=True)
+        path = checkpoint_path(batch_id)
+        if fresh:
+            for stale in (path, path + "-wal", path + "-shm"):
+                if os.path.exists(stale):
+                    os.remove(stale)
+        return cls(path)
+
+    def add_tasks(self, tasks):
+        with self._lock:
+            offset = self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tasks (task_key, position, city, star_rating, start_date, end_date, status, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (task.key, offset + n, task.city, task.star_rating, task.start_date, task.end_date, PENDING, time.time())
+                    for n, task in enumerate(tasks)
+                ),
+            )
+            self._conn.commit()
+
+    def task_status(self, task_key):
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM tasks WHERE task_key = ?", (task_key,)).fetchone()
+        return row[0] if row else None
+
+    def set_task_status(self, task_key, status, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, error = ?, updated_at = ? WHERE task_key = ?",
+                (status, error, time.time(), task_key),
+            )
+            self._conn.commit()
+
+    def done_hotels(self, task_key):
+        with self._lock:
+            return {
+                link for (link,) in self._conn.execute(
+                    "SELECT link FROM hotels WHERE task_key = ? AND status = ?", (task_key, DONE)
+                )
+            }
+
+    def mark_hotel(self, task_key, link, hotel_id, status, attempts, error=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hotels (task_key, link, hotel_id, status, attempts, error, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (task_key, link, hotel_id, status, attempts, error, time.time()),
+            )
+            self._conn.commit()
+
+    def hotel_counts(self, task_key):
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM hotels WHERE task_key = ? GROUP BY status", (task_key,)
+            ).fetchall())
+
+    def for_task(self, task_key):
+        return TaskCheckpoint(self, task_key)
+
+    def summary(self):
+        with self._lock:
+            tasks = self._conn.execute(
+                "SELECT task_key, city, star_rating, start_date, end_date, status, error, updated_at"
+                " FROM tasks ORDER BY position"
+            ).fetchall()
+        summary = []
+        for task_key, city, star_rating, start_date, end_date, status, error, updated_at in tasks:
+            counts = self.hotel_counts(task_key)
+            summary.append({
+                "city": city,
+                "star_rating": star_rating,
+                "start_date": start_date,
+                "end_date": end_date,
+                "status": status,
+                "error": error,
+                "hotels_done": counts.get(DONE, 0),
+                "hotels_failed": counts.get(FAILED, 0),
+                "updated_at": updated_at,
+            })
+        return summary
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TaskCheckpoint:
+    # The per-task view scrape_reviews_from_agoda(checkpoint=...) works with
+    def __init__(self, checkpoint, task_key):
+        self.checkpoint = checkpoint
+        self.task_key = task_key
+        self._done = checkpoint.done_hotels(task_key)
+        self.failed = 0
+
+    def is_done(self, link):
+        return link in self._done
+
+    def mark(self, link, hotel_id, outcome, attempts, error=None):
+        status = DONE if outcome == "done" else FAILED
+        self.checkpoint.mark_hotel(self.task_key, link, hotel_id, status, attempts, error)
+        if status == DONE:
+            self._done.add(link)
+        else:
+            self.failed += 1
+
+
+def run_crawl_batch(tasks, batch_id=None, fresh=False, job=None, **scrape_options):
+    # scrape_options are passed through to scrape_reviews_from_agoda()
+    batch_id = batch_id or batch_id_for(tasks)
+    checkpoint = CrawlCheckpoint.for_batch(batch_id, fresh=fresh)
+    try:
+        checkpoint.add_tasks(tasks)
+        pending = [task for task in tasks if checkpoint.task_status(task.key) != DONE]
+        print(f"🗓️ Crawl batch {batch_id}: {len(tasks)} tasks, {len(tasks) - len(pending)} already done")
+        if job:
+            job.update(batch_id=batch_id, tasks_total=len(tasks), tasks_done=len(tasks) - len(pending), tasks_failed=0)
+
+        for task in pending:
+            if job:
+                job.check_cancelled()
+                job.update(current_task=task.to_dict())
+                job.emit("task_started", **task.to_dict())
+            print(f"\n🏙️ Task: {task.city}, {task.star_rating}★ ({task.start_date or 'any'} → {task.end_date or 'any'})")
+            checkpoint.set_task_status(task.key, RUNNING)
+            task_checkpoint = checkpoint.for_task(task.key)
+            try:
+                scrape_reviews_from_agoda(
+                    task.city, task.star_rating, start_date=task.start_date, end_date=task.end_date,
+                    checkpoint=task_checkpoint, job=job, **scrape_options
+                )
+            except (JobCancelled, KeyboardInterrupt):
+                checkpoint.set_task_status(task.key, PENDING)
+                raise
+            except Exception as e:
+                print(f"❌ Task {task.city} ({task.star_rating}★) failed: {e}")
+                checkpoint.set_task_status(task.key, FAILED, str(e))
+                if job:
+                    job.incr("tasks_failed")
+                    job.emit("task_failed", error=str(e), **task.to_dict())
+                continue
+
+            # A rerun retries just the hotels that failed
+            status = INCOMPLETE if task_checkpoint.failed else DONE
+            checkpoint.set_task_status(task.key, status)
+            if job:
+                job.incr("tasks_done")
+                job.emit("task_done", status=status, hotels_failed=task_checkpoint.failed, **task.to_dict())
+
+        summary = checkpoint.summary()
+    finally:
+        checkpoint.close()
+
+    finished = sum(1 for task in summary if task["status"] == DONE)
+    print(f"\n🏁 Crawl batch {batch_id}: {finished} of {len(summary)} tasks complete")
+    return {"batch_id": batch_id, "tasks": summary}
+
+
+def crawl_batch_summary(batch_id):
+    # None for an unknown batch
+    if not os.path.exists(checkpoint_path(batch_id)):
+        return None
+    checkpoint = CrawlCheckpoint(checkpoint_path(batch_id))
+    try:
+        return {"batch_id": batch_id, "tasks": checkpoint.summary()}
+    finally:
+        checkpoint.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape a batch of cities and star ratings, resumably")
+    parser.add_argument("tasks", help="JSON or CSV file of city, star_rating, start_date, end_date")
+    parser.add_argument("--batch-id", help="checkpoint name (default: a hash of the tasks)")
+    parser.add_argument("--fresh", action="store_true", help="discard the batch's checkpoint and start over")
+    parser.add_argument("--max-hotels", type=int, default=DEFAULT_MAX_HOTELS, help="hotels per task, 0 = all")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--extraction-mode", choices=EXTRACTION_MODES, default=DEFAULT_EXTRACTION_MODE)
+    parser.add_argument("--browser-profile", choices=sorted(BROWSER_PROFILES), default=DEFAULT_BROWSER_PROFILE)
+    parser.add_argument("--incremental", action="store_true", help="only scrape reviews newer than earlier runs")
+    parser.add_argument("--retries", type=int, default=HOTEL_RETRIES, help="retries per failed hotel")
+    parser.add_argument("--rate", type=float, help="requests per second per domain, 0 = unlimited")
+    args = parser.parse_args()
+
+    if args.rate is not None:
+        get_rate_limiter().configure(args.rate)
+    run_crawl_batch(
+        load_tasks(args.tasks),
+        batch_id=args.batch_id,
+        fresh=args.fresh,
+        max_hotels=max(0, args.max_hotels),
+        concurrency=max(1, args.concurrency),
+        extraction_mode=args.extraction_mode,
+        browser_profile=args.browser_profile,
+        incremental=args.incremental,
+        retries=max(0, args.retries),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import csv
+import gzip
+import hashlib
+import io
+import os
+import uuid
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compressed and/or filtered copies of the result and review CSVs for
+# download. The first request for an export streams it while it is being
+# encoded and tees the same bytes into output/exports/; once complete, that
+# copy is served as a plain file, with Range requests, so an interrupted
+# download can resume. A Range request for an export that isn't cached yet
+# builds it first. Rows are filtered and re-encoded one CSV row at a time,
+# so memory use does not grow with the file. Exports are keyed by the
+# source's size and mtime, so a re-run analysis never serves a stale copy.
+# The least recently used ones are removed above EXPORT_CACHE_MB. The path is
+# absolute because send_file resolves relative ones against the app's root,
+# not the working directory.
+EXPORT_DIR = os.path.abspath(os.path.join("output", "exports"))
+EXPORT_CACHE_MB = int(os.environ.get("EXPORT_CACHE_MB", "2048"))
+GZIP_LEVEL = int(os.environ.get("EXPORT_GZIP_LEVEL", "6"))
+ZSTD_LEVEL = int(os.environ.get("EXPORT_ZSTD_LEVEL", "3"))
+CHUNK_BYTES = 256 * 1024
+# compression -> (file suffix, mimetype)
+COMPRESSIONS = {"gzip": (".gz", "application/gzip"), "zstd": (".zst", "application/zstd")}
+# Sentiment results and scraped reviews name the hotel column differently
+HOTEL_COLUMNS = ("Hotel Name", "hotel_name")
+LABEL_COLUMN = "classification_label"
+
+
+class _Sink(io.RawIOBase):
+    # Collects what the encoder writes until the next chunk is handed out
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        self.size = 0
+        return data
+
+
+class Export:
+    def __init__(self, source, compression=None, columns=(), labels=(), hotels=(), name=None):
+        # name: what the download is called before suffixes (default: the
+        # source's file name)
+        if compression and compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}' (choose from {', '.join(COMPRESSIONS)})")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd exports need the zstandard package")
+        self.source = source
+        self.name = name or os.path.basename(source)
+        self.compression = compression
+        self.columns = list(columns)
+        self.labels = set(labels)
+        self.hotels = set(hotels)
+
+        with open(source, newline="", encoding="utf-8") as f:
+            self.header = next(csv.reader(f), [])
+        unknown = [column for column in self.columns if column not in self.header]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        if self.labels and LABEL_COLUMN not in self.header:
+            raise ValueError(f"'{os.path.basename(source)}' has no labels to filter on")
+        self.hotel_column = next((column for column in HOTEL_COLUMNS if column in self.header), None)
+        if self.hotels and self.hotel_column is None:
+            raise ValueError(f"'{os.path.basename(source)}' has no hotel column to filter on")
+
+    @property
+    def filtered(self):
+        return bool(self.columns or self.labels or self.hotels)
+
+    @property
+    def filename(self):
+        # Download name
+        root, ext = os.path.splitext(self.name)
+        suffix = COMPRESSIONS[self.compression][0] if self.compression else ""
+        return f"{root}{'-filtered' if self.filtered else ''}{ext}{suffix}"
+
+    @property
+    def mimetype(self):
+        return COMPRESSIONS[self.compression][1] if self.compression else "text/csv"
+
+    @property
+    def cache_path(self):
+        stat = os.stat(self.source)
+        key = "|".join([
+            os.path.basename(self.source), str(stat.st_size), str(stat.st_mtime_ns),
+            self.compression or "", str(GZIP_LEVEL if self.compression == "gzip" else ZSTD_LEVEL),
+            ",".join(self.columns), ",".join(sorted(self.labels)), ",".join(sorted(self.hotels)),
+        ])
+        root, _ = os.path.splitext(self.filename)
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(EXPORT_DIR, f"{root}.{digest}{os.path.splitext(self.filename)[1]}")
+
+    def cached(self):
+        # The finished export, or None; a hit counts as a use for eviction
+        path = self.cache_path
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        return path
+
+    def build(self):
+        for _ in self.iter_chunks():
+            pass
+        return self.cache_path
+
+    def iter_chunks(self):
+        # Encoded bytes, also written to the cache; a download that stops
+        # early leaves nothing behind
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        path = self.cache_path
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        completed = False
+        try:
+            with open(tmp_path, "wb") as cache:
+                for chunk in self._encode():
+                    cache.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, path)
+            completed = True
+        finally:
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        prune_cache(keep=path)
+
+    def _compressor(self, sink):
+        # gzip without a name or timestamp, so rebuilding an export gives the
+        # same bytes and a resumed download still lines up
+        if self.compression == "gzip":
+            return gzip.GzipFile(filename="", mode="wb", fileobj=sink, compresslevel=GZIP_LEVEL, mtime=0)
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(sink, closefd=False)
+        return sink
+
+    def _encode(self):
+        sink = _Sink()
+        stream = self._compressor(sink)
+        if self.filtered:
+            text = io.TextIOWrapper(stream, encoding="utf-8", newline="", write_through=True)
+            with open(self.source, newline="", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                header = next(reader, [])
+                keep = [header.index(column) for column in self.columns or header]
+                hotel = header.index(self.hotel_column) if self.hotels else None
+                label = header.index(LABEL_COLUMN) if self.labels else None
+                writer = csv.writer(text)
+                writer.writerow([header[i] for i in keep])
+                for row in reader:
+                    if hotel is not None and row[hotel] not in self.hotels:
+                        continue
+                    if label is not None and row[label] not in self.labels:
+                        continue
+                    writer.writerow([row[i] for i in keep])
+                    if sink.size >= CHUNK_BYTES:
+                        yield sink.drain()
+            text.flush()
+            text.detach()
+        else:
+            with open(self.source, "rb") as f:
+                while True:
+                    data = f.read(CHUNK_BYTES)
+                    if not data:
+                        break
+                    stream.write(data)
+                    if sink.size >= CHUNK_BYTES:
+                        yield sink.drain()
+        if stream is not sink:
+            stream.close()
+        if sink.size:
+            yield sink.drain()
+
+
+def prune_cache(keep=None, limit_mb=EXPORT_CACHE_MB):
+    # Removes the least recently used exports above limit_mb
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    entries = []
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        if name.endswith(".tmp") or not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= limit_mb * 1024 * 1024:
+            break
+        if path == keep:
+            continue
+        os.remove(path)
+        total -= size
@@ -0,0 +1,124 @@
+import os
+import queue
+import threading
+
+from module.analysis_checkpoint import AnalysisCheckpoint
+from module.jobs import JobCancelled
+from module.result_store import get_output_format, output_extension
+from module.scraper import scrape_reviews_from_agoda, reviews_csv_path
+from module.sentiment_analysis import run_sentiment_analysis, iter_review_rows, FLUSH
+from module.sharded_analysis import count_reviews
+from module.sentiment_aggregates import SentimentAggregates
+
+# Fused scrape + analysis: every hotel's rows are handed to the analysis as
+# soon as they are appended to the city CSV, so scoring overlaps scraping and
+# the job takes about as long as the slower of the two instead of their sum.
+#
+# Both halves checkpoint to disk. The scraper's checkpoint is the append-only
+# CSV plus its seen-review index; the analysis keeps a sidecar checkpoint of
+# how many CSV rows it has fully written. A restarted fused job first catches
+# up on CSV rows the analysis has not seen, then follows the scraper again.
+#
+# Rows are numbered by their position in the CSV, which assumes one scraping
+# job per city at a time.
+IDLE_FLUSH_SECONDS = 1.0
+
+
+class ReviewStream:
+    def __init__(self, input_file, start_row, backlog_rows, job=None):
+        self.input_file = input_file
+        self.start_row = start_row
+        self.backlog_rows = backlog_rows
+        self.job = job
+        self._queue = queue.Queue()
+
+    # --- Scraper side ---
+    def put(self, rows):
+        self._queue.put(list(rows))
+
+    def close(self):
+        self._queue.put(None)
+
+    # --- Analysis side: (review_id, row) pairs, as run_sentiment_analysis expects ---
+    def __iter__(self):
+        next_id = self.start_row
+        if self.start_row < self.backlog_rows:
+            yield from iter_review_rows(self.input_file, (self.start_row, self.backlog_rows))
+            next_id = self.backlog_rows
+
+        idle = False
+        while True:
+            try:
+                rows = self._queue.get(timeout=IDLE_FLUSH_SECONDS)
+            except queue.Empty:
+                if self.job:
+                    self.job.check_cancelled()
+                # Score what we have instead of waiting for a full window
+                if not idle:
+                    idle = True
+                    yield FLUSH
+                continue
+            if rows is None:
+                return
+            idle = False
+            for row in rows:
+                yield next_id, row
+                next_id += 1
+
+
+def fused_output_path(city, output_format):
+    sanitized_city = city.lower().replace(" ", "_")
+    return os.path.join("output", f"sentiment_{sanitized_city}{output_extension(output_format)}")
+
+
+def run_fused_scrape_and_analysis(city, star_rating, backend=None, output_format=None, job=None, **scrape_options):
+    output_format = get_output_format(output_format)
+    input_file = reviews_csv_path(city)
+    output_file = fused_output_path(city, output_format)
+    os.makedirs("output", exist_ok=True)
+
+    checkpoint = AnalysisCheckpoint.load(output_file)
+    backlog_rows = count_reviews(input_file) if os.path.exists(input_file) else 0
+    if checkpoint.input_rows > backlog_rows:
+        print(f"⚠️ Checkpoint is ahead of '{input_file}', re-analysing from the start")
+        checkpoint.clear()
+    elif SentimentAggregates.for_checkpoint(output_file, checkpoint) is None:
+        print("⚠️ Checkpoint has no saved aggregates, re-analysing from the start")
+        checkpoint.clear()
+    pending = backlog_rows - checkpoint.input_rows
+    print(f"🔀 Fused scrape + analysis: {pending} scraped reviews waiting for analysis")
+    if job:
+        job.update(analysis_backlog=pending)
+
+    stream = ReviewStream(input_file, checkpoint.input_rows, backlog_rows, job)
+    errors = []
+
+    def analyze():
+        try:
+            run_sentiment_analysis(
+                input_file, output_file, job=job, backend=backend, output_format=output_format,
+                source=stream, checkpoint=checkpoint,
+            )
+        except BaseException as e:
+            errors.append(e)
+            # Nothing scraped from here on would be analysed: stop the
+            # scraper through the job instead of letting it run to the end
+            if job and not isinstance(e, JobCancelled):
+                print(f"❌ Analysis failed ({e}), stopping the scrape")
+                job.cancel()
+
+    analysis = threading.Thread(target=analyze, name="fused-analysis", daemon=True)
+    analysis.start()
+    try:
+        scrape_reviews_from_agoda(city, star_rating, job=job, on_rows=stream.put, **scrape_options)
+    except JobCancelled:
+        # Cancelled because the analysis failed: report that error instead
+        if not errors:
+            raise
+    finally:
+        # Let the analysis finish what was already scraped, even on failure
+        stream.close()
+        analysis.join()
+    if errors:
+        raise errors[0]
+    return {"filename": os.path.basename(output_file), "reviews_file": input_file}
@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Search results per city and star rating, kept next to the city's review
+# CSV. A crawl within HOTEL_INDEX_TTL_HOURS of the last complete listing
+# reuses it instead of paging through the search results again
+# (0 = always re-list).
+HOTEL_INDEX_TTL_HOURS = float(os.environ.get("HOTEL_INDEX_TTL_HOURS", "24"))
+
+
+def hotel_index_path(city):
+    sanitized_city = city.lower().replace(" ", "_")
+    return f"output/agoda_{sanitized_city}_hotels.sqlite"
+
+
+class HotelIndex:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS listings (
+                star_rating INTEGER PRIMARY KEY,
+                collected_at REAL NOT NULL,
+                hotel_count INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS hotels (
+                star_rating INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                hotel_id TEXT,
+                link TEXT NOT NULL,
+                PRIMARY KEY (star_rating, position)
+            ) WITHOUT ROWID;
+            """
+        )
+        self._conn.commit()
+
+    @classmethod
+    def for_city(cls, city):
+        os.makedirs(os.path.dirname(hotel_index_path(city)), exist_ok=True)
+        return cls(hotel_index_path(city))
+
+    def hotels(self, star_rating):
+        # [(link, hotel_id)] in search result order
+        with self._lock:
+            return [
+                (link, hotel_id)
+                for link, hotel_id in self._conn.execute(
+                    "SELECT link, hotel_id FROM hotels WHERE star_rating = ? ORDER BY position",
+                    (star_rating,),
+                )
+            ]
+
+    def age_seconds(self, star_rating):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT collected_at FROM listings WHERE star_rating = ?", (star_rating,)
+            ).fetchone()
+        return time.time() - row[0] if row else None
+
+    def fresh(self, star_rating, ttl_hours=HOTEL_INDEX_TTL_HOURS):
+        # The cached listing if it is recent enough, else None
+        age = self.age_seconds(star_rating)
+        if age is None or age > ttl_hours * 3600:
+            return None
+        return self.hotels(star_rating)
+
+    def replace(self, star_rating, hotels):
+        # Stores one complete listing, replacing the previous one
+        with self._lock:
+            self._conn.execute("DELETE FROM hotels WHERE star_rating = ?", (star_rating,))
+            self._conn.executemany(
+                "INSERT INTO hotels (star_rating, position, hotel_id, link) VALUES (?, ?, ?, ?)",
+                ((star_rating, position, hotel_id, link) for position, (link, hotel_id) in enumerate(hotels)),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO listings (star_rating, collected_at, hotel_count) VALUES (?, ?, ?)",
+                (star_rating, time.time(), len(hotels)),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,145 @@
+import copy
+import os
+import re
+import threading
+
+# Interchangeable ways to run the sentiment model on a tokenized batch. All
+# of them start from the fp32 model held by the model service:
+#   torch       eager fp32 PyTorch (the reference)
+#   torch-int8  Linear layers dynamically quantized to int8 (CPU)
+#   onnx        the model exported to ONNX and run with onnxruntime (CPU)
+# Quantized models and ONNX graphs are built once and kept on disk under
+# SENTIMENT_ARTIFACT_DIR, one directory per model and resolved commit (or
+# weights digest), so an upstream update never reuses a stale build.
+BACKENDS = ("torch", "torch-int8", "onnx")
+DEFAULT_BACKEND = os.environ.get("SENTIMENT_BACKEND", "torch")
+ARTIFACT_DIR = os.environ.get("SENTIMENT_ARTIFACT_DIR", os.path.join("output", "model_artifacts"))
+ONNX_OPSET = 14
+ONNX_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def artifact_dir(model_name, model_version):
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{model_name}@{model_version}")
+    path = os.path.join(ARTIFACT_DIR, safe)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    def predict(self, inputs):
+        # Softmax scores as a float32 numpy array, one row per sentence
+        import torch
+
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+        return torch.softmax(logits, dim=1).cpu().numpy()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    name = "torch-int8"
+
+    @classmethod
+    def build(cls, model, model_name, model_version):
+        import torch
+
+        path = os.path.join(artifact_dir(model_name, model_version), "model-int8.pt")
+        if os.path.exists(path):
+            quantized = torch.load(path, weights_only=False)
+            print(f"📦 Loaded int8 model from {path}")
+        else:
+            # Dynamic quantization only runs on CPU; quantize a CPU copy so the
+            # service's model stays where it is
+            source = copy.deepcopy(model).to("cpu")
+            quantized = torch.quantization.quantize_dynamic(source, {torch.nn.Linear}, dtype=torch.qint8)
+            tmp_path = path + ".tmp"
+            torch.save(quantized, tmp_path)
+            os.replace(tmp_path, path)
+            print(f"📦 Quantized {model_name} to int8, saved to {path}")
+        quantized.eval()
+        return cls(quantized, torch.device("cpu"))
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, session):
+        self.session = session
+        self.input_names = {i.name for i in session.get_inputs()}
+
+    @classmethod
+    def build(cls, model, model_name, model_version):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise RuntimeError("The 'onnx' backend needs onnxruntime (pip install onnxruntime)")
+
+        path = os.path.join(artifact_dir(model_name, model_version), "model.onnx")
+        if not os.path.exists(path):
+            cls.export(model, path)
+            print(f"📦 Exported {model_name} to {path}")
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        return cls(session)
+
+    @staticmethod
+    def export(model, path):
+        import torch
+
+        source = copy.deepcopy(model).to("cpu").eval()
+        dummy = torch.ones((2, 8), dtype=torch.long)
+        tmp_path = path + ".tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                source,
+                (dummy, torch.ones_like(dummy), torch.zeros_like(dummy)),
+                tmp_path,
+                input_names=list(ONNX_INPUTS),
+                output_names=["logits"],
+                dynamic_axes={
+                    **{name: {0: "batch", 1: "sequence"} for name in ONNX_INPUTS},
+                    "logits": {0: "batch"},
+                },
+                opset_version=ONNX_OPSET,
+            )
+        os.replace(tmp_path, path)
+
+    def predict(self, inputs):
+        import numpy as np
+
+        feed = {
+            name: value.cpu().numpy().astype(np.int64)
+            for name, value in inputs.items()
+            if name in self.input_names
+        }
+        logits = self.session.run(["logits"], feed)[0].astype(np.float32)
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+def get_backend_name(backend=None):
+    name = backend or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return name
+
+
+_build_lock = threading.Lock()
+
+
+def build_backend(name, model, device, model_name, model_version):
+    name = get_backend_name(name)
+    if name == "torch":
+        return TorchBackend(model, device)
+    with _build_lock:
+        if name == "torch-int8":
+            return QuantizedTorchBackend.build(model, model_name, model_version)
+        return OnnxBackend.build(model, model_name, model_version)
@@ -0,0 +1,280 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from module import metrics
+
+# Long-running scraping / analysis work is executed here instead of inside the
+# Flask request thread. The pool is bounded so a handful of users can't start
+# an unlimited number of browsers or model instances.
+MAX_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+MAX_PENDING_JOBS = int(os.environ.get("JOB_MAX_PENDING", "20"))
+MAX_FINISHED_JOBS = 200
+# Structured progress events kept per job for /jobs/<id>/events; a client that
+# reconnects with Last-Event-ID gets whatever is still buffered
+EVENT_BUFFER = int(os.environ.get("JOB_EVENT_BUFFER", "1000"))
+# How often a progress snapshot (counters, rates, ETA) goes out, and the window
+# the rates are measured over
+PROGRESS_EVENT_INTERVAL = float(os.environ.get("JOB_PROGRESS_INTERVAL", "1.0"))
+RATE_WINDOW_SECONDS = 15.0
+# Counters reported as per-second rates, and (done, total) pairs an ETA is
+# estimated from
+RATE_COUNTERS = ("reviews_saved", "reviews_processed", "sentences_scored", "hotels_done")
+ETA_COUNTERS = (("hotels_done", "hotels_total"), ("reviews_processed", "reviews_total"))
+# A resumed analysis starts reviews_processed at what the earlier run
+# finished; rates only count this run's work
+RESUMED_COUNTERS = {"reviews_processed": "reviews_resumed"}
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, params):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.events = deque(maxlen=EVENT_BUFFER)
+        self.last_event_at = self.created_at
+        # This job's share of the timings and counters (see module/metrics.py)
+        self.metrics = metrics.Registry()
+        self._event_seq = 0
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._events_changed = threading.Condition(self._lock)
+
+    # --- Called from inside the worker ---
+    def update(self, **counters):
+        with self._lock:
+            self.progress.update(counters)
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            self.progress[key] = self.progress.get(key, 0) + amount
+
+    def emit(self, event, **data):
+        # One structured event (hotel started, review page loaded, ...) for
+        # anyone following the job's event stream
+        with self._lock:
+            self._event_seq += 1
+            self.last_event_at = time.time()
+            self.events.append({"id": self._event_seq, "event": event, "time": self.last_event_at, "data": data})
+            self._events_changed.notify_all()
+
+    def set_status(self, status, error=None):
+        self.status = status
+        self.error = error if error is not None else self.error
+        if status in FINISHED_STATES:
+            self.finished_at = time.time()
+        elif status == RUNNING:
+            self.started_at = time.time()
+        self.emit("status", status=status, error=self.error)
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def sleep(self, seconds):
+        # Like time.sleep, but raises JobCancelled as soon as the job is cancelled
+        if self._cancel_event.wait(seconds):
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    # --- Called from the web layer ---
+    def cancel(self):
+        self._cancel_event.set()
+
+    def events_after(self, event_id, timeout=None):
+        # Buffered events newer than event_id, waiting up to timeout for one
+        with self._lock:
+            if self._event_seq <= event_id and self.status not in FINISHED_STATES:
+                self._events_changed.wait(timeout)
+            return [e for e in self.events if e["id"] > event_id]
+
+    def to_dict(self):
+        with self._lock:
+            progress = dict(self.progress)
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="job")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _run(job, fn, args, kwargs):
+    if job.cancelled:
+        job.set_status(CANCELLED)
+        return
+    job.set_status(RUNNING)
+    status, error = FAILED, None
+    try:
+        job.result = fn(*args, job=job, **kwargs)
+        status = CANCELLED if job.cancelled else DONE
+    except JobCancelled:
+        status = CANCELLED
+    except Exception as e:
+        error = str(e)
+        print(f"❌ Job {job.id} ({job.kind}) failed: {e}")
+        traceback.print_exc()
+    finally:
+        job.set_status(status, error)
+        metrics.observe("job_seconds", job.finished_at - job.started_at, kind=job.kind, status=status)
+        try:
+            metrics.dump_profile(job)
+        except OSError as e:
+            print(f"⚠️ Could not write the profile of job {job.id}: {e}")
+
+
+def _prune_finished():
+    finished = [j for j in _jobs.values() if j.status in FINISHED_STATES]
+    if len(finished) <= MAX_FINISHED_JOBS:
+        return
+    finished.sort(key=lambda j: j.finished_at or 0)
+    for old in finished[: len(finished) - MAX_FINISHED_JOBS]:
+        del _jobs[old.id]
+
+
+def submit_job(kind, fn, *args, params=None, **kwargs):
+    # `fn` is called as fn(*args, job=job, **kwargs) on a pool thread and may
+    # report progress through job.update()/job.incr() and honour job.cancelled.
+    with _jobs_lock:
+        _prune_finished()
+        pending = sum(1 for j in _jobs.values() if j.status in (QUEUED, RUNNING))
+        if pending >= MAX_PENDING_JOBS:
+            raise JobQueueFull(f"Too many pending jobs ({pending}), try again later")
+        job = Job(kind, params if params is not None else kwargs)
+        _jobs[job.id] = job
+    job.future = _executor.submit(_run, job, fn, args, kwargs)
+    print(f"📥 Queued {kind} job {job.id}")
+    return job
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def list_jobs(kind=None):
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+    if kind:
+        jobs = [j for j in jobs if j.kind == kind]
+    return sorted(jobs, key=lambda j: j.created_at, reverse=True)
+
+
+def cancel_job(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return None
+    job.cancel()
+    # A job that hasn't been picked up by a worker yet can be dropped outright.
+    if job.status == QUEUED and job.future is not None and job.future.cancel():
+        job.set_status(CANCELLED)
+    return job
+
+
+class RateTracker:
+    # Per-second rates of the RATE_COUNTERS over the last RATE_WINDOW_SECONDS,
+    # from progress snapshots taken by one event stream
+    def __init__(self, window=RATE_WINDOW_SECONDS):
+        self.window = window
+        self.samples = deque()
+
+    def sample(self, progress, now):
+        self.samples.append((now, {
+            key: progress.get(key, 0) - progress.get(RESUMED_COUNTERS.get(key, ""), 0) for key in RATE_COUNTERS
+        }))
+        while len(self.samples) > 2 and now - self.samples[1][0] >= self.window:
+            self.samples.popleft()
+        (then, old), (_, new) = self.samples[0], self.samples[-1]
+        elapsed = now - then
+        if elapsed <= 0:
+            return {}
+        return {key: round((new[key] - old[key]) / elapsed, 2) for key in RATE_COUNTERS if key in progress}
+
+
+def progress_event(job, rates):
+    # Snapshot of the job's counters with rates and, where a total is known,
+    # an ETA from the current rate
+    now = time.time()
+    with job._lock:
+        progress = dict(job.progress)
+        idle_seconds = now - job.last_event_at
+    per_second = rates.sample(progress, now)
+    etas = [
+        (progress[total] - progress.get(done, 0)) / per_second[done]
+        for done, total in ETA_COUNTERS
+        if progress.get(total) and per_second.get(done)
+    ]
+    elapsed = now - job.started_at if job.started_at else 0.0
+    return {
+        "event": "progress",
+        "time": now,
+        "data": {
+            "status": job.status,
+            "progress": progress,
+            "rates": per_second,
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": round(max(etas), 1) if etas and job.status == RUNNING else None,
+            # Seconds since the last structured event; a stalled page or hotel
+            # shows up here first
+            "idle_seconds": round(idle_seconds, 1),
+        },
+    }
+
+
+def iter_job_events(job, last_event_id=0, interval=PROGRESS_EVENT_INTERVAL):
+    # Replays buffered events after last_event_id, then follows the job,
+    # interleaving a progress snapshot every `interval` seconds. Ends once the
+    # job has finished and everything was sent.
+    rates = RateTracker()
+    next_progress = 0.0
+    while True:
+        finished = job.status in FINISHED_STATES
+        for event in job.events_after(last_event_id, timeout=interval):
+            last_event_id = event["id"]
+            yield event
+        if finished or time.monotonic() >= next_progress:
+            yield progress_event(job, rates)
+            next_progress = time.monotonic() + interval
+        if finished:
+            return
@@ -0,0 +1,225 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# Timing histograms and counters for the scraper and analysis hot spots.
+# Every observation goes to the process-wide REGISTRY (served as Prometheus
+# text on /metrics) and, when the caller passes its job, to that job's own
+# registry (GET /jobs/<id>/profile, or a JSON file per job under
+# JOB_PROFILE_DIR). An observation is a bisect and two additions under a
+# lock, and the wrapped calls are per page, per batch or per review, so it
+# stays on in production. METRICS=0 turns timing off.
+METRICS_ENABLED = os.environ.get("METRICS", "1") != "0"
+PROFILE_DIR = os.environ.get("JOB_PROFILE_DIR", "")
+# Bucket upper bounds in seconds: from a sub-millisecond classify up to a
+# slow page load
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, round(self.max, 6))
+        return round(self.max, 6)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, value, labels=()):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram()
+            histogram.observe(value)
+
+    def incr(self, name, amount=1, labels=()):
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + amount
+
+    def snapshot(self):
+        # Plain data; picklable for worker processes and mergeable with merge()
+        with self._lock:
+            return {
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "counts": list(h.counts),
+                     "sum": h.sum, "count": h.count, "max": h.max}
+                    for (name, labels), h in self._histograms.items()
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self._counters.items()
+                ],
+            }
+
+    def merge(self, snapshot):
+        with self._lock:
+            for entry in snapshot["histograms"]:
+                key = (entry["name"], tuple(sorted(entry["labels"].items())))
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram()
+                histogram.counts = [a + b for a, b in zip(histogram.counts, entry["counts"])]
+                histogram.sum += entry["sum"]
+                histogram.count += entry["count"]
+                histogram.max = max(histogram.max, entry["max"])
+            for entry in snapshot["counters"]:
+                key = (entry["name"], tuple(sorted(entry["labels"].items())))
+                self._counters[key] = self._counters.get(key, 0) + entry["value"]
+
+    def profile(self):
+        # Per-series summary for a job profile: where the time went
+        with self._lock:
+            timings = {
+                _series(name, labels): {
+                    "count": h.count,
+                    "total_seconds": round(h.sum, 6),
+                    "mean_seconds": round(h.sum / h.count, 6) if h.count else 0.0,
+                    "p50_seconds": h.quantile(0.5),
+                    "p95_seconds": h.quantile(0.95),
+                    "max_seconds": round(h.max, 6),
+                }
+                for (name, labels), h in sorted(self._histograms.items())
+            }
+            counters = {_series(name, labels): value for (name, labels), value in sorted(self._counters.items())}
+        return {"timings": timings, "counters": counters}
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        typed = set()
+        for (name, labels), h in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(BUCKETS, h.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels, le=repr(bound))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {h.count}")
+            lines.append(f"{name}_sum{_labels(labels)} {h.sum}")
+            lines.append(f"{name}_count{_labels(labels)} {h.count}")
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def render_gauge(name, values):
+    # Prometheus text for a gauge computed at scrape time; values maps label
+    # dicts (as sorted item tuples) to numbers
+    lines = [f"# TYPE {name} gauge"]
+    lines.extend(f"{name}{_labels(labels)} {value}" for labels, value in sorted(values.items()))
+    return "\n".join(lines) + "\n"
+
+
+def _series(name, labels):
+    return name + _labels(labels)
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + sorted(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+
+
+def _registries(job):
+    # Jobs (and the shard stand-ins of sharded analysis) carry a `metrics` registry
+    profile = getattr(job, "metrics", None)
+    return (REGISTRY, profile) if profile is not None else (REGISTRY,)
+
+
+def observe(name, seconds, job=None, **labels):
+    if not METRICS_ENABLED:
+        return
+    labels = tuple(sorted(labels.items()))
+    for registry in _registries(job):
+        registry.observe(name, seconds, labels)
+
+
+def incr(name, amount=1, job=None, **labels):
+    if not METRICS_ENABLED:
+        return
+    labels = tuple(sorted(labels.items()))
+    for registry in _registries(job):
+        registry.incr(name, amount, labels)
+
+
+def merge(snapshot, job=None):
+    # Folds in a Registry.snapshot() taken in another process (analysis shards)
+    for registry in _registries(job):
+        registry.merge(snapshot)
+
+
+class timed:
+    # with metrics.timed("scraper_goto_seconds", job, page="hotel"): ...
+    __slots__ = ("name", "job", "labels", "started")
+
+    def __init__(self, name, job=None, **labels):
+        self.name = name
+        self.job = job
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.started, self.job, **self.labels)
+        return False
+
+
+def dump_profile(job):
+    # <JOB_PROFILE_DIR>/<kind>-<job id>.json once a job finishes, if enabled
+    if not PROFILE_DIR or not METRICS_ENABLED:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{job.kind}-{job.id}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "params": job.params,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            **job.metrics.profile(),
+        }, f, indent=2, default=str)
+    return path
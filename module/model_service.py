@@ -0,0 +1,140 @@
+import copy
+import hashlib
+import os
+import threading
+import time
+
+from module.inference_backends import build_backend, get_backend_name
+
+# The BERT model is loaded once per process and shared by every analysis.
+# torch and transformers are only imported when the model is first needed,
+# so importing this module (and starting the web UI) stays cheap.
+MODEL_NAME = os.environ.get(
+    "SENTIMENT_MODEL", "nlptown/bert-base-multilingual-uncased-sentiment"
+)
+MODEL_REVISION = os.environ.get("SENTIMENT_MODEL_REVISION", "main")
+
+
+def weights_digest(model):
+    # Identifies a model loaded from a local directory, which has no hub commit
+    import torch
+
+    digest = hashlib.sha1()
+    for name, tensor in sorted(model.state_dict().items()):
+        digest.update(name.encode("utf-8"))
+        digest.update(tensor.detach().cpu().contiguous().view(-1).view(torch.uint8).numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+class SentimentModelService:
+    def __init__(self, model_name=MODEL_NAME, revision=MODEL_REVISION):
+        self.model_name = model_name
+        self.revision = revision
+        # The commit `revision` resolved to (a branch like "main" moves when
+        # the model is updated upstream), set on load
+        self.model_version = None
+        self.tokenizer = None
+        self.model = None
+        self.device = None
+        self.import_seconds = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.requests_served = 0
+        self.backends = {}
+        self.backend_seconds = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def load(self):
+        # Returns the seconds this call spent loading (0.0 when already warm)
+        with self._lock:
+            if self.model is not None:
+                return 0.0
+            started = time.perf_counter()
+            import torch
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
+            imported = time.perf_counter()
+
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, revision=self.revision)
+            model = AutoModelForSequenceClassification.from_pretrained(
+                self.model_name, revision=self.revision
+            ).to(self.device)
+            model.eval()
+            self.model = model
+            self.model_version = getattr(model.config, "_commit_hash", None) or weights_digest(model)
+
+            self.import_seconds = imported - started
+            self.load_seconds = time.perf_counter() - started
+            self.loaded_at = time.time()
+            print(
+                f"🧠 Loaded {self.model_name} on {self.device} in {self.load_seconds:.1f}s "
+                f"(imports {self.import_seconds:.1f}s)"
+            )
+            return self.load_seconds
+
+    def thread_tokenizer(self):
+        # Fast tokenizers aren't safe to call from several threads at once
+        # (truncation/padding state is mutated per call), so every worker
+        # thread gets its own copy while the model weights are shared.
+        tokenizer = getattr(self._local, "tokenizer", None)
+        if tokenizer is None:
+            tokenizer = copy.deepcopy(self.tokenizer)
+            self._local.tokenizer = tokenizer
+        return tokenizer
+
+    def acquire(self):
+        # Loads on first use; returns (tokenizer, model, device, load_seconds)
+        load_seconds = self.load()
+        with self._lock:
+            self.requests_served += 1
+        return self.thread_tokenizer(), self.model, self.device, load_seconds
+
+    def backend(self, name=None):
+        # Quantized / exported variants are derived from the fp32 model once
+        # and then kept alongside it; returns (backend, seconds spent building)
+        name = get_backend_name(name)
+        self.load()
+        with self._lock:
+            if name in self.backends:
+                return self.backends[name], 0.0
+            started = time.perf_counter()
+            backend = build_backend(name, self.model, self.device, self.model_name, self.model_version)
+            self.backends[name] = backend
+            self.backend_seconds[name] = time.perf_counter() - started
+            return backend, self.backend_seconds[name]
+
+    def warm_up_in_background(self):
+        thread = threading.Thread(target=self.load, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "revision": self.revision,
+            "model_version": self.model_version,
+            "loaded": self.loaded,
+            "device": str(self.device) if self.device is not None else None,
+            "import_seconds": self.import_seconds,
+            "load_seconds": self.load_seconds,
+            "loaded_at": self.loaded_at,
+            "requests_served": self.requests_served,
+            "backends": {name: round(seconds, 2) for name, seconds in self.backend_seconds.items()},
+        }
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_model_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = SentimentModelService()
+        return _service
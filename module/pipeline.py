@@ -0,0 +1,143 @@
+import os
+import queue
+import threading
+import time
+
+# A linear chain of stages, each on its own thread, joined by bounded queues.
+# The first stage is a generator producing items; every later stage maps one
+# item to the next stage's item (or returns None to emit nothing). While a
+# slow stage works on item n, the stages before it are already preparing
+# n+1 ... n+QUEUE_SIZE. Items keep their order since every stage is FIFO.
+QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "2"))
+_END = object()
+
+
+class Stage:
+    def __init__(self, name, fn):
+        self.name = name
+        self.fn = fn
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.depth_max = 0
+
+    def sample_depth(self, q):
+        depth = q.qsize()
+        self.depth_samples += 1
+        self.depth_total += depth
+        self.depth_max = max(self.depth_max, depth)
+
+    def stats(self, wall_seconds):
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            # Share of the pipeline's wall time this stage spent working
+            # rather than waiting on its neighbours
+            "utilization": round(self.busy_seconds / wall_seconds, 3) if wall_seconds else 0.0,
+            # Depth of the queue feeding this stage, sampled before each get
+            "queue_avg": round(self.depth_total / self.depth_samples, 2) if self.depth_samples else 0.0,
+            "queue_max": self.depth_max,
+        }
+
+
+class Pipeline:
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.stages = []
+        self.wall_seconds = 0.0
+        self._abort = threading.Event()
+        self._error = None
+        self._error_lock = threading.Lock()
+
+    def add(self, name, fn):
+        self.stages.append(Stage(name, fn))
+        return self
+
+    def run(self):
+        # Blocks until every item went through every stage; re-raises the
+        # first error from any stage after stopping the others
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages[1:]]
+        threads = []
+        for index, stage in enumerate(self.stages):
+            inbox = queues[index - 1] if index > 0 else None
+            outbox = queues[index] if index < len(queues) else None
+            target = self._run_source if index == 0 else self._run_stage
+            threads.append(threading.Thread(
+                target=self._guard, args=(target, stage, inbox, outbox),
+                name=f"pipeline-{stage.name}", daemon=True,
+            ))
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.wall_seconds = time.perf_counter() - started
+        if self._error is not None:
+            raise self._error
+        return self.stats()
+
+    def stats(self):
+        return {stage.name: stage.stats(self.wall_seconds) for stage in self.stages}
+
+    def _guard(self, target, stage, inbox, outbox):
+        try:
+            target(stage, inbox, outbox)
+        except BaseException as e:
+            with self._error_lock:
+                if self._error is None:
+                    self._error = e
+            self._abort.set()
+
+    def _run_source(self, stage, inbox, outbox):
+        items = iter(stage.fn())
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                stage.busy_seconds += time.perf_counter() - started
+                stage.items += 1
+                if outbox is not None and not self._put(outbox, item):
+                    return
+        finally:
+            close = getattr(items, "close", None)
+            if close:
+                close()
+        if outbox is not None:
+            self._put(outbox, _END)
+
+    def _run_stage(self, stage, inbox, outbox):
+        while True:
+            stage.sample_depth(inbox)
+            item = self._get(inbox)
+            if item is _END:
+                break
+            started = time.perf_counter()
+            result = stage.fn(item)
+            stage.busy_seconds += time.perf_counter() - started
+            stage.items += 1
+            if outbox is not None and result is not None and not self._put(outbox, result):
+                return
+        if outbox is not None:
+            self._put(outbox, _END)
+
+    def _put(self, q, item):
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+from module import metrics
+
+# Requests the scraper sends to one site (page loads, result pages, review
+# pages), shared by every job and worker in the process. Each domain gets a
+# token bucket refilled at SCRAPER_REQUESTS_PER_SECOND that holds up to
+# SCRAPER_REQUEST_BURST requests; 0 turns the limit off. Separate processes
+# (the crawl CLI next to the web app) each have their own buckets.
+REQUESTS_PER_SECOND = float(os.environ.get("SCRAPER_REQUESTS_PER_SECOND", "2"))
+REQUEST_BURST = int(os.environ.get("SCRAPER_REQUEST_BURST", "4"))
+
+
+class DomainRateLimiter:
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=REQUEST_BURST):
+        self._lock = threading.Lock()
+        self._buckets = {}  # domain -> [tokens, monotonic time of last refill]
+        self.configure(rate, burst)
+
+    def configure(self, rate, burst=None):
+        with self._lock:
+            self.rate = rate
+            self.burst = max(1, burst if burst is not None else self.burst)
+            self._buckets.clear()
+
+    def reserve(self, domain):
+        # Takes the next token for domain and returns how long to wait for
+        # it; tokens can go negative, which queues callers in arrival order
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            bucket = self._buckets.get(domain)
+            if bucket is None:
+                bucket = self._buckets[domain] = [float(self.burst), now]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate) - 1
+            bucket[1] = now
+            return max(0.0, -bucket[0] / self.rate)
+
+    def acquire(self, url, job=None):
+        # Blocks until a request to url's domain is allowed
+        domain = urlparse(url).netloc or url
+        delay = self.reserve(domain)
+        if delay > 0:
+            with metrics.timed("scraper_rate_limit_wait_seconds", job, domain=domain):
+                if job:
+                    job.sleep(delay)
+                else:
+                    time.sleep(delay)
+        return delay
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "requests_per_second": self.rate,
+                "burst": self.burst,
+                "domains": {
+                    domain: round(min(self.burst, tokens + (now - updated) * self.rate), 2)
+                    for domain, (tokens, updated) in self._buckets.items()
+                },
+            }
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = DomainRateLimiter()
+        return _limiter
@@ -0,0 +1,193 @@
+import csv
+import os
+import sqlite3
+import threading
+
+# Normalized analysis output. The flat CSV repeats the hotel, rating and full
+# review text on every (sentence, label) row; here each is stored once:
+#   reviews          one row per input review, keyed by its row number
+#   sentences        labelled sentences, keyed by (review_id, position in the
+#                    review), with one REAL column per class score, so SQL
+#                    can filter, sort and aggregate by score
+#   labels           label names, keyed by their order in the rule table
+#   sentence_labels  which labels each sentence got
+# The flat CSV is still available through export_csv().
+OUTPUT_FORMATS = ("csv", "sqlite")
+DEFAULT_OUTPUT_FORMAT = os.environ.get("SENTIMENT_OUTPUT_FORMAT", "csv")
+SCORE_COLUMNS = ("score_1", "score_2", "score_3", "score_4", "score_5")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id INTEGER PRIMARY KEY,
+    hotel_name TEXT,
+    rating TEXT,
+    review TEXT
+);
+CREATE TABLE IF NOT EXISTS sentences (
+    review_id INTEGER NOT NULL REFERENCES reviews (review_id),
+    position INTEGER NOT NULL,
+    sentence TEXT NOT NULL,
+    score_1 REAL NOT NULL,
+    score_2 REAL NOT NULL,
+    score_3 REAL NOT NULL,
+    score_4 REAL NOT NULL,
+    score_5 REAL NOT NULL,
+    PRIMARY KEY (review_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS labels (
+    label_id INTEGER PRIMARY KEY,
+    label TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS sentence_labels (
+    review_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    label_id INTEGER NOT NULL REFERENCES labels (label_id),
+    ordinal INTEGER NOT NULL,
+    PRIMARY KEY (review_id, position, label_id)
+) WITHOUT ROWID;
+"""
+
+
+def is_result_database(path):
+    # Whether path holds analysis results in the current layout; other
+    # .sqlite files under output/ (hotel index, seen reviews, checkpoints)
+    # must not get the schema added
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sentences)")}
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return {"reviews", "sentences", "labels", "sentence_labels"} <= tables and set(SCORE_COLUMNS) <= columns
+
+
+def output_extension(output_format):
+    return ".sqlite" if output_format == "sqlite" else ".csv"
+
+
+def get_output_format(output_format=None):
+    output_format = output_format or DEFAULT_OUTPUT_FORMAT
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}' (choose from {', '.join(OUTPUT_FORMATS)})")
+    return output_format
+
+
+class ResultStore:
+    def __init__(self, path, label_names=()):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._label_ids = {}
+        # Fixed ids from the rule table keep separately written stores (e.g.
+        # analysis shards) compatible
+        for label_id, label in enumerate(label_names):
+            self._label_id(label, label_id)
+        self._conn.commit()
+
+    @classmethod
+    def create(cls, path, label_names=()):
+        # Analysis output is rewritten from scratch, like the CSV
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return cls(path, label_names)
+
+    def _label_id(self, label, label_id=None):
+        if label not in self._label_ids:
+            row = self._conn.execute("SELECT label_id FROM labels WHERE label = ?", (label,)).fetchone()
+            if row is None:
+                cursor = self._conn.execute(
+                    "INSERT INTO labels (label_id, label) VALUES (?, ?)", (label_id, label)
+                )
+                row = (cursor.lastrowid,)
+            self._label_ids[label] = row[0]
+        return self._label_ids[label]
+
+    def add_window(self, sentences, review_data, labels, scores, positions):
+        # Same inputs as write_scored_rows; review_data must carry review_id
+        reviews = {}
+        sentence_rows = []
+        label_rows = []
+        with self._lock:
+            for sentence, data, sentence_labels, score, position in zip(
+                sentences, review_data, labels, scores, positions
+            ):
+                review_id = data["review_id"]
+                reviews[review_id] = (review_id, data["Hotel Name"], data["Rating"], data["Review"])
+                sentence_rows.append((review_id, position, sentence.strip(), *map(float, score)))
+                label_rows.extend(
+                    (review_id, position, self._label_id(label), ordinal)
+                    for ordinal, label in enumerate(sentence_labels)
+                )
+            # A review's sentences can span two windows
+            self._conn.executemany("INSERT OR IGNORE INTO reviews VALUES (?, ?, ?, ?)", reviews.values())
+            self._conn.executemany("INSERT INTO sentences VALUES (?, ?, ?, ?, ?, ?, ?, ?)", sentence_rows)
+            self._conn.executemany("INSERT INTO sentence_labels VALUES (?, ?, ?, ?)", label_rows)
+            self._conn.commit()
+
+    def delete_from(self, review_id):
+        # Drops reviews >= review_id, e.g. written after the last checkpoint
+        with self._lock:
+            for table in ("sentence_labels", "sentences", "reviews"):
+                self._conn.execute(f"DELETE FROM {table} WHERE review_id >= ?", (review_id,))
+            self._conn.commit()
+
+    def merge(self, other_paths):
+        # Appends other stores written with the same label ids
+        with self._lock:
+            for n, other in enumerate(other_paths):
+                alias = f"shard{n}"
+                self._conn.execute(f"ATTACH DATABASE ? AS {alias}", (other,))
+                for table in ("reviews", "sentences", "sentence_labels"):
+                    self._conn.execute(f"INSERT OR IGNORE INTO {table} SELECT * FROM {alias}.{table}")
+                self._conn.execute(f"INSERT OR IGNORE INTO labels SELECT * FROM {alias}.labels")
+                self._conn.commit()
+                self._conn.execute(f"DETACH DATABASE {alias}")
+
+    def iter_rows(self):
+        # (hotel, rating, review, sentence, score_1, ..., score_5, label) in
+        # input order, labels in the order they were assigned
+        return self._conn.execute(
+            f"""
+            SELECT r.hotel_name, r.rating, r.review, s.sentence, {", ".join("s." + c for c in SCORE_COLUMNS)}, l.label
+            FROM sentences s
+            JOIN reviews r ON r.review_id = s.review_id
+            JOIN sentence_labels sl ON sl.review_id = s.review_id AND sl.position = s.position
+            JOIN labels l ON l.label_id = sl.label_id
+            ORDER BY s.review_id, s.position, sl.ordinal
+            """
+        )
+
+    def export_csv(self, csv_path):
+        # The flat file run_sentiment_analysis writes in "csv" mode. Scores
+        # come back as the float32 values the model produced, so they round
+        # exactly as they do there.
+        import numpy as np
+        from module.sentiment_analysis import OUTPUT_FIELDNAMES, write_scored_rows
+
+        tmp_path = csv_path + ".tmp"
+        with self._lock, open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDNAMES)
+            writer.writeheader()
+            for hotel, rating, review, sentence, *scores, label in self.iter_rows():
+                review_data = {"Hotel Name": hotel, "Rating": rating, "Review": review}
+                write_scored_rows(writer, [sentence], [review_data], [[label]], [np.asarray(scores, dtype=np.float32)])
+        os.replace(tmp_path, csv_path)
+        return csv_path
+
+    def counts(self):
+        with self._lock:
+            return {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("reviews", "sentences", "sentence_labels")
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,91 @@
+import os
+import re
+from datetime import datetime
+
+# Agoda's review widget pages through this endpoint: every "Show More" click
+# on the paginator issues one request and renders the JSON it gets back.
+REVIEW_API_PATTERN = re.compile(
+    os.environ.get(
+        "AGODA_REVIEW_API_PATTERN", r"/api/cronos/property/review/ReviewComments"
+    ),
+    re.IGNORECASE,
+)
+
+
+def is_review_response(response):
+    return response.ok and REVIEW_API_PATTERN.search(response.url) is not None
+
+
+def format_review_date(raw):
+    # "2023-11-08T15:26:00+07:00" -> "November 8, 2023", the same text the
+    # review status bar shows, so both extraction modes share one date parser.
+    if not raw:
+        return ""
+    try:
+        date = datetime.fromisoformat(str(raw)[:19])
+    except ValueError:
+        return str(raw)
+    return f"{date:%B} {date.day}, {date.year}"
+
+
+def parse_review_payload(payload):
+    if not isinstance(payload, dict):
+        return []
+    comments = payload.get("comments")
+    if comments is None:
+        comments = payload.get("reviewComments") or []
+
+    reviews = []
+    for comment in comments:
+        if not isinstance(comment, dict):
+            continue
+        reviews.append({
+            "review_id": str(comment.get("hotelReviewId") or comment.get("reviewId") or ""),
+            "review": comment.get("reviewComments") or comment.get("comment") or "",
+            "date_raw": format_review_date(comment.get("reviewDate")),
+        })
+    return reviews
+
+
+class ReviewResponseCollector:
+    # Records review API responses for one page. Bodies are read later from
+    # drain(), outside the event callback.
+    def __init__(self, page):
+        self.page = page
+        self.pages_captured = 0
+        self._pending = []
+        self._seen_ids = set()
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        if is_review_response(response):
+            self._pending.append(response)
+
+    def drain(self):
+        pending, self._pending = self._pending, []
+        reviews = []
+        for response in pending:
+            try:
+                payload = response.json()
+            except Exception as e:
+                print(f"⚠️ Could not decode review response {response.url}: {e}")
+                continue
+            self.pages_captured += 1
+            for review in parse_review_payload(payload):
+                # The widget refetches page 1 after re-sorting; keep one copy
+                if review["review_id"]:
+                    if review["review_id"] in self._seen_ids:
+                        continue
+                    self._seen_ids.add(review["review_id"])
+                reviews.append(review)
+        return reviews
+
+    def reset(self):
+        # Also forgets the count, so a refetch that never arrives reads as
+        # "nothing captured" and the caller falls back to the rendered page
+        self.pages_captured = 0
+        self._pending = []
+        self._seen_ids = set()
+
+    def close(self):
+        self.page.remove_listener("response", self._on_response)
@@ -0,0 +1,112 @@
+import csv
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+
+def review_fingerprint(review_text, review_date=""):
+    # Case and whitespace differences between DOM and API text don't matter
+    normalized = re.sub(r"\s+", " ", review_text).strip().lower()
+    return hashlib.sha1(f"{normalized}|{review_date}".encode("utf-8")).hexdigest()
+
+
+def index_path_for(output_file):
+    root, _ = os.path.splitext(output_file)
+    return f"{root}.seen.sqlite"
+
+
+class SeenReviewIndex:
+    # Remembers which (hotel_id, review fingerprint) pairs were already
+    # written to one output CSV, so re-crawls only append new reviews.
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS seen_reviews (
+                hotel_id TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                review_date TEXT,
+                first_seen_at TEXT NOT NULL,
+                PRIMARY KEY (hotel_id, fingerprint)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+
+    @classmethod
+    def for_output(cls, output_file):
+        # The index only makes sense alongside the CSV it describes: start
+        # over if the CSV is gone, and adopt rows written before it existed.
+        index = cls(index_path_for(output_file))
+        if not os.path.exists(output_file):
+            index.clear()
+        elif index.count() == 0:
+            seeded = index.seed_from_csv(output_file)
+            if seeded:
+                print(f"📚 Indexed {seeded} existing reviews from '{output_file}'")
+        return index
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM seen_reviews").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM seen_reviews")
+            self._conn.commit()
+
+    def is_seen(self, hotel_id, fingerprint):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM seen_reviews WHERE hotel_id = ? AND fingerprint = ?",
+                (str(hotel_id), fingerprint),
+            ).fetchone()
+        return row is not None
+
+    def filter_new(self, hotel_id, reviews):
+        # Drops reviews already indexed as well as repeats within `reviews`
+        new_reviews = []
+        batch = set()
+        for review in reviews:
+            fingerprint = review_fingerprint(review["review"], review["review_date"])
+            if fingerprint in batch or self.is_seen(hotel_id, fingerprint):
+                continue
+            batch.add(fingerprint)
+            new_reviews.append(review)
+        return new_reviews
+
+    def add(self, hotel_id, reviews):
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen_reviews VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        str(hotel_id),
+                        review_fingerprint(review["review"], review["review_date"]),
+                        review["review_date"],
+                        now,
+                    )
+                    for review in reviews
+                ],
+            )
+            self._conn.commit()
+
+    def seed_from_csv(self, csv_path):
+        by_hotel = {}
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                by_hotel.setdefault(row["hotel_id"], []).append(row)
+        for hotel_id, rows in by_hotel.items():
+            self.add(hotel_id, rows)
+        return sum(len(rows) for rows in by_hotel.values())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
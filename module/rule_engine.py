@@ -0,0 +1,143 @@
+import json
+import os
+import re
+import threading
+
+# Accessibility labels are defined as data (see rules/accessibility_labels.json)
+# and compiled once into:
+#   - a word -> term lookup, hit with one set intersection per sentence
+#   - one multi-phrase regex for the substring terms
+#   - an index from each term to the rule clauses it can trigger
+# A sentence with no matching term costs a split, an intersection and one
+# regex search; only the clauses its terms trigger are evaluated.
+DEFAULT_RULES_PATH = os.environ.get(
+    "CLASSIFICATION_RULES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules", "accessibility_labels.json"),
+)
+PHRASE_PREFIX = "~"
+
+
+def load_rules(path=DEFAULT_RULES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["rules"]
+
+
+class _Clause:
+    __slots__ = ("rule_index", "groups", "excluded")
+
+    def __init__(self, rule_index, groups, excluded):
+        self.rule_index = rule_index
+        self.groups = groups
+        self.excluded = excluded
+
+    def matches(self, hits):
+        for group in self.groups:
+            if group.isdisjoint(hits):
+                return False
+        return self.excluded.isdisjoint(hits)
+
+
+class RuleEngine:
+    def __init__(self, rules):
+        self.rules = rules
+        self.rule_labels = []
+        self.words = set()
+        phrases = set()
+        clauses = []
+
+        for rule_index, rule in enumerate(rules):
+            labels = rule.get("labels")
+            if not labels:
+                raise ValueError(f"Rule #{rule_index} has no labels")
+            self.rule_labels.append(tuple(labels))
+            alternatives = rule["any"] if "any" in rule else [rule]
+            for alternative in alternatives:
+                groups = [frozenset(group) for group in alternative.get("all", [])]
+                if not groups or not all(groups):
+                    raise ValueError(f"Rule {labels} needs at least one non-empty 'all' group")
+                excluded = frozenset(alternative.get("none", []))
+                clauses.append(_Clause(rule_index, groups, excluded))
+                for term in set().union(*groups, excluded):
+                    if not term.lstrip(PHRASE_PREFIX).strip():
+                        raise ValueError(f"Rule {labels} has an empty term")
+                    if term.startswith(PHRASE_PREFIX):
+                        phrases.add(term[len(PHRASE_PREFIX):])
+                    else:
+                        self.words.add(term)
+
+        # A clause can only fire when one of its first group's terms is hit
+        self.triggers = {}
+        for clause in clauses:
+            for term in clause.groups[0]:
+                self.triggers.setdefault(term, []).append(clause)
+
+        self.phrase_pattern = None
+        self.phrase_prefixes = {}
+        if phrases:
+            # One alternation scans for every phrase at once. Longest-first
+            # ordering makes each match the longest phrase starting there; the
+            # shorter phrases that are its prefixes matched too and come from
+            # phrase_prefixes. Resuming one character after each match start
+            # also catches overlapping phrases.
+            ordered = sorted(phrases, key=len, reverse=True)
+            self.phrase_pattern = re.compile("|".join(re.escape(p) for p in ordered))
+            for phrase in ordered:
+                self.phrase_prefixes[phrase] = frozenset(
+                    PHRASE_PREFIX + other for other in ordered if phrase.startswith(other)
+                )
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_RULES_PATH):
+        return cls(load_rules(path))
+
+    def term_hits(self, sentence):
+        # `sentence` must already be lowercased
+        hits = self.words.intersection(sentence.split())
+        if self.phrase_pattern is not None:
+            search = self.phrase_pattern.search
+            match = search(sentence)
+            while match is not None:
+                hits.update(self.phrase_prefixes[match.group()])
+                match = search(sentence, match.start() + 1)
+        return hits
+
+    def classify(self, sentence):
+        hits = self.term_hits(sentence.lower())
+        if not hits:
+            return []
+
+        fired = set()
+        for term in hits:
+            for clause in self.triggers.get(term, ()):
+                if clause.rule_index not in fired and clause.matches(hits):
+                    fired.add(clause.rule_index)
+
+        labels = []
+        for rule_index in sorted(fired):
+            for label in self.rule_labels[rule_index]:
+                if label not in labels:
+                    labels.append(label)
+        return labels
+
+    def classify_batch(self, sentences):
+        classify = self.classify
+        return [classify(sentence) for sentence in sentences]
+
+    @property
+    def labels(self):
+        seen = []
+        for labels in self.rule_labels:
+            seen.extend(label for label in labels if label not in seen)
+        return seen
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_rule_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RuleEngine.from_file()
+        return _engine
@@ -1,11 +1,49 @@
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 from datetime import datetime
-import csv, os, re, time
-
-
-def wait(ms):
-    time.sleep(ms / 1000)
+from functools import partial
+import csv, os, queue, re, threading, time
+from module.review_api import ReviewResponseCollector, is_review_response
+from module.review_index import SeenReviewIndex, review_fingerprint
+from module.hotel_index import HotelIndex
+from module.browser_profile import get_browser_profile
+from module.browser_pool import get_browser_pool
+from module.jobs import JobCancelled
+from module.rate_limit import get_rate_limiter
+from module import metrics
+
+# How many hotels to visit per search (0 = all) and how many to scrape at once
+DEFAULT_MAX_HOTELS = int(os.environ.get("SCRAPER_MAX_HOTELS", "5"))
+DEFAULT_CONCURRENCY = int(os.environ.get("SCRAPER_CONCURRENCY", "1"))
+# "dom" reads the rendered review list, "api" captures the review JSON responses
+EXTRACTION_MODES = ("dom", "api")
+DEFAULT_EXTRACTION_MODE = os.environ.get("SCRAPER_EXTRACTION_MODE", "dom")
+# Site root the search starts from; benchmarks point it at benchmarks/fixture_site.py
+AGODA_BASE_URL = os.environ.get("AGODA_BASE_URL", "https://www.agoda.com")
+# Search results: how long to wait for more lazily rendered cards after a
+# scroll, and for the list to change after Next / a filter click
+LISTING_SELECTOR = "li[data-hotelid]"
+LISTING_SETTLE_MS = int(os.environ.get("SCRAPER_LISTING_SETTLE_MS", "750"))
+LISTING_CHANGE_TIMEOUT_MS = int(os.environ.get("SCRAPER_LISTING_CHANGE_TIMEOUT_MS", "15000"))
+
+# A hotel that fails is retried this many times, after RETRY_BACKOFF_SECONDS,
+# then twice that, and so on up to RETRY_BACKOFF_MAX_SECONDS
+HOTEL_RETRIES = int(os.environ.get("SCRAPER_HOTEL_RETRIES", "2"))
+RETRY_BACKOFF_SECONDS = float(os.environ.get("SCRAPER_RETRY_BACKOFF_SECONDS", "5"))
+RETRY_BACKOFF_MAX_SECONDS = float(os.environ.get("SCRAPER_RETRY_BACKOFF_MAX_SECONDS", "120"))
+
+CSV_FIELDNAMES = ["city", "hotel_name", "hotel_id", "rating", "review", "review_date"]
+_csv_lock = threading.Lock()
+
+
+def wait(ms, reason="wait", job=None):
+    # Fixed sleeps show up in /metrics as scraper_wait_seconds{reason=...}
+    with metrics.timed("scraper_wait_seconds", job, reason=reason):
+        time.sleep(ms / 1000)
+
+
+def throttle(url, job=None):
+    # Every request to the site goes through the process-wide rate limit
+    get_rate_limiter().acquire(url, job)
 
 
 def parse_review_date(date_str):
@@ -25,41 +63,121 @@ def is_date_in_range(date, start, end):
     return True
 
 
-def click_show_more_until_2500(page, target_count=2500):
-    last_count = 0
+REVIEW_DATE_PATTERN = re.compile(
+    r"(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},\s+\d{4}"
+)
+
+
+def extract_review_date(review_date_raw):
+    if review_date_raw:
+        match = REVIEW_DATE_PATTERN.search(review_date_raw)
+        if match:
+            return match.group(0), parse_review_date(match.group(0))
+    return "", None
+
+
+def reached_start_date(batch, start_date):
+    # Reviews are sorted newest first, so once a page holds a review older
+    # than start_date every later page would be filtered out anyway.
+    if not start_date:
+        return False
+    dates = [extract_review_date(data["date_raw"])[1] for data in batch]
+    dates = [date for date in dates if date is not None]
+    return bool(dates) and min(dates) < start_date
+
+
+def reached_seen_review(batch, seen):
+    # Incremental crawls page newest first and stop at the first review the
+    # index already holds; everything after it was captured by an earlier run.
+    return seen is not None and any(seen(data) for data in batch)
+
+
+def apply_most_recent_sort(page, timeout=10000):
+    try:
+        sort_by_dropdown = page.locator("button[data-selenium='review-sort-dropdown-button']").first
+        if sort_by_dropdown.count() == 0:
+            print("⚠️ Review sort dropdown not found, keeping default order.")
+            return False
+        sort_by_dropdown.click()
+        most_recent_option = page.locator("li[data-selenium='review-sort-dropdown-option-most_recent']").first
+        most_recent_option.wait_for(state="visible", timeout=5000)
+        try:
+            # The widget refetches page 1 in the new order
+            with page.expect_response(is_review_response, timeout=timeout):
+                most_recent_option.click()
+        except PlaywrightTimeoutError:
+            print("⚠️ No review response after sorting, waiting for the list instead.")
+        page.wait_for_selector("div.Review-comment", timeout=timeout)
+        print("🔽 Applied 'Most recent' review sorting")
+        return True
+    except Exception as e:
+        print(f"❌ Failed to apply 'Most recent' sort: {e}")
+        return False
+
+
+def click_show_more_until_2500(
+    page, target_count=2500, job=None, start_date=None, seen=None, timeout=10000, on_page=None
+):
+    # Reads the reviews page by page as they render and returns the raw
+    # review data; only the nodes added by each click are extracted.
+    # on_page(page_number, loaded) is called after every page.
+    all_reviews_data = extract_rendered_reviews(page, job=job)
+    batch = all_reviews_data
     attempts = 0
     max_attempts = 50
 
     while attempts < max_attempts:
-        current_count = page.locator("p.Review-comment-bodyText").count()
+        if job and job.cancelled:
+            print("🛑 Job cancelled, stopping pagination.")
+            break
 
+        current_count = len(all_reviews_data)
         if current_count >= target_count:
             print(f"🎯 Reached target of {target_count} reviews.")
             break
 
-        if current_count == last_count:
-            print(f"⚠️ No new reviews loaded. Possibly end reached at {current_count}.")
+        if reached_start_date(batch, start_date):
+            print(f"⏹️ Reached reviews older than {start_date:%d-%m-%Y} after {current_count} reviews.")
             break
 
-        last_count = current_count
+        if reached_seen_review(batch, seen):
+            print(f"⏹️ Reached an already captured review after {current_count} reviews.")
+            break
 
         show_more_button = page.locator(
             "button.Review-paginator-button:not([disabled])"
         )
-        if show_more_button.count() > 0:
-            show_more_button.first.click()
-            print(
-                f"🔁 Clicked 'Show More Reviews' ({attempts + 1}) — Loaded: {current_count}"
-            )
-            wait(1000)
-        else:
+        if show_more_button.count() == 0:
             print("🚫 'Show More Reviews' button not found or disabled.")
             break
 
+        throttle(page.url, job)
+        page_started = time.perf_counter()
+        show_more_button.first.click()
+        print(
+            f"🔁 Clicked 'Show More Reviews' ({attempts + 1}) — Loaded: {current_count}"
+        )
+        try:
+            page.wait_for_function(
+                "([selector, count]) => document.querySelectorAll(selector).length > count",
+                arg=["div.Review-comment", current_count],
+                timeout=timeout,
+            )
+        except PlaywrightTimeoutError:
+            print(f"⚠️ No new reviews loaded. Possibly end reached at {current_count}.")
+            break
+
+        batch = extract_rendered_reviews(page, start=current_count, job=job)
+        all_reviews_data.extend(batch)
         attempts += 1
+        metrics.observe("scraper_review_page_seconds", time.perf_counter() - page_started, job, mode="dom")
+        if on_page:
+            on_page(attempts + 1, len(all_reviews_data))
 
+    return all_reviews_data[:target_count]
 
-def scrape_all_reviews(page, start_date=None, end_date=None):
+
+def open_reviews_section(page):
     # First navigate to reviews section if not already there
     try:
         reviews_tab = page.locator(
@@ -73,59 +191,31 @@ def scrape_all_reviews(page, start_date=None, end_date=None):
     except Exception:
         print("⚠️ Couldn't find reviews tab or it's already selected, proceeding anyway.")
 
-    # Load all reviews by clicking "Show More"
-    click_show_more_until_2500(page)
-    wait(1000)  # A brief pause to ensure the last reviews are settled in the DOM
-
-    # Apply sorting if date range is specified
-    if start_date or end_date:
-        try:
-            sort_by_dropdown = page.locator("button[data-selenium='review-sort-dropdown-button']").first
-            if sort_by_dropdown.count() > 0:
-                sort_by_dropdown.click()
-                wait(500)  # Shorter wait is fine here
-                most_recent_option = page.locator("li[data-selenium='review-sort-dropdown-option-most_recent']").first
-                if most_recent_option.count() > 0:
-                    most_recent_option.click()
-                    print("🔽 Applied 'Most recent' review sorting")
-                    page.wait_for_timeout(3000)  # Wait for content to re-sort
-        except Exception as e:
-            print(f"❌ Failed to apply 'Most recent' sort: {e}")
 
-    # --- OPTIMIZED EXTRACTION LOGIC ---
-    print("⚡️ Extracting all reviews in a single, fast batch...")
-    
+def extract_rendered_reviews(page, start=0, job=None):
     # This JavaScript function runs inside the browser to grab all data at once.
     # It's much faster than making individual calls from Python for each review.
-    all_reviews_data = page.locator("div.Review-comment").evaluate_all("""
-        (comments) => comments.map(comment => {
-            const reviewText = comment.querySelector('p.Review-comment-bodyText')?.textContent || '';
-            const reviewDateRaw = comment.querySelector('div.Review-statusBar-left span')?.textContent || '';
-            return {
-                review: reviewText,
-                date_raw: reviewDateRaw
-            };
-        })
-    """)
-
-    print(f"✅ Fetched {len(all_reviews_data)} review data blocks instantly.")
-    
+    with metrics.timed("scraper_evaluate_all_seconds", job):
+        reviews = page.locator("div.Review-comment").evaluate_all("""
+            (comments, start) => comments.slice(start).map(comment => {
+                const reviewText = comment.querySelector('p.Review-comment-bodyText')?.textContent || '';
+                const reviewDateRaw = comment.querySelector('div.Review-statusBar-left span')?.textContent || '';
+                return {
+                    review: reviewText,
+                    date_raw: reviewDateRaw
+                };
+            })
+        """, start)
+    metrics.incr("scraper_reviews_extracted_total", len(reviews), job, source="dom")
+    return reviews
+
+
+def build_review_rows(all_reviews_data, start_date=None, end_date=None):
     reviews = []
     # Now we loop through the data in Python, which is very fast as all data is already collected.
     for data in all_reviews_data:
         review_text = data['review'].strip()
-        review_date_raw = data['date_raw']
-        review_date = None
-        review_date_str = ""
-
-        if review_date_raw:
-            match = re.search(
-                r"(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},\s+\d{4}",
-                review_date_raw,
-            )
-            if match:
-                review_date_str = match.group(0)
-                review_date = parse_review_date(review_date_str)
+        review_date_str, review_date = extract_review_date(data['date_raw'])
 
         # Skip if date filtering is enabled and review is out of range
         if (start_date or end_date) and not is_date_in_range(review_date, start_date, end_date):
@@ -141,6 +231,108 @@ def scrape_all_reviews(page, start_date=None, end_date=None):
     return reviews
 
 
+def scrape_all_reviews(
+    page, start_date=None, end_date=None, job=None, target_count=2500, seen=None, on_page=None
+):
+    open_reviews_section(page)
+
+    # Sort before paging so a date window (or an incremental crawl) only
+    # costs the pages it covers. In the default order an old or already seen
+    # review can come before newer ones, so without the sort neither can stop
+    # paging; build_review_rows still filters by date and the review index
+    # drops duplicates.
+    newest_first = False
+    if start_date or end_date or seen is not None:
+        newest_first = apply_most_recent_sort(page)
+
+    # Load reviews by clicking "Show More", extracting each page as it lands
+    all_reviews_data = click_show_more_until_2500(
+        page, target_count, job=job, start_date=start_date if newest_first else None,
+        seen=seen if newest_first else None, on_page=on_page,
+    )
+    print(f"✅ Fetched {len(all_reviews_data)} review data blocks.")
+
+    return build_review_rows(all_reviews_data, start_date, end_date)
+
+
+def scrape_reviews_via_api(
+    page, collector, start_date=None, end_date=None, job=None,
+    target_count=2500, response_timeout=15000, seen=None, on_page=None
+):
+    # Reads reviews straight from the paginator's JSON responses. Each click
+    # waits for its response instead of sleeping, and the DOM is never
+    # re-counted or bulk-extracted.
+    open_reviews_section(page)
+
+    all_reviews_data = collector.drain()
+    # As in scrape_all_reviews, the date and seen reviews only stop paging in
+    # newest-first order
+    newest_first = False
+    if start_date or end_date or seen is not None:
+        # Page 1 is refetched in the new order; forget the default-sorted copy
+        collector.reset()
+        newest_first = apply_most_recent_sort(page)
+        if newest_first:
+            all_reviews_data = collector.drain()
+    stop_date = start_date if newest_first else None
+    stop_seen = seen if newest_first else None
+    if collector.pages_captured == 0:
+        # First page came server-rendered rather than through the API
+        all_reviews_data = extract_rendered_reviews(page, job=job)
+        print(f"📄 First page rendered in HTML: {len(all_reviews_data)} reviews")
+
+    batch = all_reviews_data
+    clicks = 0
+    while len(all_reviews_data) < target_count:
+        if job and job.cancelled:
+            print("🛑 Job cancelled, stopping pagination.")
+            break
+
+        if reached_start_date(batch, stop_date):
+            print(f"⏹️ Reached reviews older than {stop_date:%d-%m-%Y} after {len(all_reviews_data)} reviews.")
+            break
+
+        if reached_seen_review(batch, stop_seen):
+            print(f"⏹️ Reached an already captured review after {len(all_reviews_data)} reviews.")
+            break
+
+        show_more_button = page.locator(
+            "button.Review-paginator-button:not([disabled])"
+        )
+        if show_more_button.count() == 0:
+            print("🚫 'Show More Reviews' button not found or disabled.")
+            break
+
+        throttle(page.url, job)
+        page_started = time.perf_counter()
+        try:
+            with page.expect_response(is_review_response, timeout=response_timeout):
+                show_more_button.first.click()
+        except PlaywrightTimeoutError:
+            print("⚠️ No review response after clicking 'Show More', stopping.")
+            break
+
+        clicks += 1
+        batch = collector.drain()
+        if not batch:
+            print(f"⚠️ Empty review page. Possibly end reached at {len(all_reviews_data)}.")
+            break
+        all_reviews_data.extend(batch)
+        metrics.observe("scraper_review_page_seconds", time.perf_counter() - page_started, job, mode="api")
+        metrics.incr("scraper_reviews_extracted_total", len(batch), job, source="api")
+        print(
+            f"🔁 Review page {clicks + 1} captured — Loaded: {len(all_reviews_data)}"
+        )
+        if on_page:
+            on_page(clicks + 1, len(all_reviews_data))
+
+    all_reviews_data = all_reviews_data[:target_count]
+    print(
+        f"✅ Captured {len(all_reviews_data)} reviews from {collector.pages_captured} API responses."
+    )
+    return build_review_rows(all_reviews_data, start_date, end_date)
+
+
 def apply_star_rating_filter(page, star_rating):
     if star_rating == 0:
         return True
@@ -154,8 +346,10 @@ def apply_star_rating_filter(page, star_rating):
     for selector in filter_selectors:
         if page.locator(selector).count() > 0:
             try:
+                before = listing_signature(page)
                 page.locator(selector).first.click()
-                time.sleep(3)
+                # The list may not change if every hotel already matches
+                wait_for_listing_change(page, before, timeout=3000, reason="star_filter")
                 print(f"⭐ Applied {star_rating}-star filter")
                 return True
             except Exception as e:
@@ -211,177 +405,497 @@ def get_hotel_results_page(context, city, timeout=15000):
     return context.pages[0]
 
 
-def scrape_reviews_from_agoda(
-    city: str, star_rating: int, start_date=None, end_date=None
-):
+def reviews_csv_path(city):
     sanitized_city = city.lower().replace(" ", "_")
-    output_file = f"output/agoda_{sanitized_city}_hotel_reviews.csv"
-    os.makedirs("output", exist_ok=True)
-
-    parsed_start_date = (
-        datetime.strptime(start_date, "%d-%m-%Y") if start_date else None
-    )
-    parsed_end_date = datetime.strptime(end_date, "%d-%m-%Y") if end_date else None
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        context = browser.new_context()
-        page = context.new_page()
+    return f"output/agoda_{sanitized_city}_hotel_reviews.csv"
+
+
+def save_reviews_to_csv(output_file, rows, on_rows=None, job=None):
+    # Each hotel's rows go out in one locked write so concurrent workers
+    # never interleave lines or race on the header. on_rows sees the rows in
+    # the same order they land in the file.
+    with _csv_lock, metrics.timed("scraper_csv_write_seconds", job):
+        file_exists = os.path.exists(output_file)
+        with open(output_file, "a", newline="", encoding="utf-8") as f:
+            start = f.tell()
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDNAMES)
+            if not file_exists:
+                writer.writeheader()
+            writer.writerows(rows)
+            metrics.incr("scraper_csv_bytes_total", f.tell() - start, job)
+        metrics.incr("scraper_csv_rows_total", len(rows), job)
+        if on_rows:
+            on_rows(rows)
+
+
+def scrape_hotel(
+    context, index, link, hotel_id, city, output_file,
+    start_date=None, end_date=None, job=None,
+    extraction_mode=DEFAULT_EXTRACTION_MODE, review_index=None, incremental=False, on_rows=None
+):
+    started = time.perf_counter()
+    on_page = None
+    if job:
+        job.update(current_hotel=link)
+        job.emit("hotel_started", index=index, hotel_id=hotel_id, link=link)
+
+        def on_page(page_number, loaded):
+            job.emit("review_page", hotel_id=hotel_id, page=page_number, loaded=loaded)
+    seen = None
+    if incremental and review_index is not None:
+        def seen(data):
+            review_date_str, _ = extract_review_date(data["date_raw"])
+            return review_index.is_seen(
+                hotel_id, review_fingerprint(data["review"].strip(), review_date_str)
+            )
 
-        print(f"🌍 Searching hotels in: {city}")
-        page.goto("https://www.agoda.com", timeout=20000)
+    print(f"\n🔍 Hotel #{index+1} — {link}")
+    hotel_page = context.new_page()
+    # Must be listening before goto: the widget may fetch page 1 on load
+    collector = ReviewResponseCollector(hotel_page) if extraction_mode == "api" else None
+    try:
+        throttle(link, job)
+        with metrics.timed("scraper_goto_seconds", job, page="hotel"):
+            hotel_page.goto(link, timeout=20000)
+        wait(3000, "hotel_settle", job)
+
+        if collector is not None:
+            reviews = scrape_reviews_via_api(
+                hotel_page, collector, start_date, end_date, job=job, seen=seen, on_page=on_page
+            )
+        else:
+            reviews = scrape_all_reviews(
+                hotel_page, start_date, end_date, job=job, seen=seen, on_page=on_page
+            )
 
-        try:
-            page.locator("button#onetrust-accept-btn-handler").click(timeout=5000)
-        except:
-            pass
+        if review_index is not None:
+            found = len(reviews)
+            reviews = review_index.filter_new(hotel_id, reviews)
+            if found > len(reviews):
+                print(f"♻️ Skipped {found - len(reviews)} reviews captured by earlier runs")
+        # Get hotel info
+        name_element = hotel_page.locator(
+            "h1[data-selenium='hotel-header-name']"
+        ).first
+        hotel_name = (
+            name_element.text_content().strip()
+            if name_element.count() > 0
+            else f"Hotel #{index+1}"
+        )
 
-        # Input city and search - more reliable method
-        search_input = page.locator(
-            "input[placeholder*='destination'], input[placeholder*='property']"
+        rating_element = hotel_page.locator(
+            "span[data-element-name='mosaic-hotel-rating-container']"
+        ).first
+        hotel_rating = (
+            rating_element.text_content().strip()
+            if rating_element.count() > 0
+            else "N/A"
         )
-        search_input.fill(city)
-        wait(2000)
-        page.keyboard.press("ArrowDown")
-        page.keyboard.press("Enter")
-        wait(2000)
 
+        print(f"🏨 Hotel: {hotel_name}, Rating: {hotel_rating}")
+
+        # Save to CSV
+        if reviews:
+            save_reviews_to_csv(
+                output_file,
+                [
+                    {
+                        "city": city,
+                        "hotel_name": hotel_name,
+                        "hotel_id": hotel_id,
+                        "rating": hotel_rating,
+                        "review": review["review"].strip(),
+                        "review_date": review["review_date"],
+                    }
+                    for review in reviews
+                ],
+                on_rows=on_rows,
+                job=job,
+            )
+            if review_index is not None:
+                review_index.add(hotel_id, reviews)
+            print(
+                f"✅ Saved {len(reviews)} reviews for '{hotel_name}' to '{output_file}'"
+            )
+            if job:
+                job.incr("reviews_saved", len(reviews))
+        else:
+            print(f"❌ No reviews found for '{hotel_name}'")
+        metrics.observe("scraper_hotel_seconds", time.perf_counter() - started, job, outcome="done")
+        if job:
+            job.emit(
+                "hotel_done", hotel_id=hotel_id, name=hotel_name, reviews=len(reviews),
+                seconds=round(time.perf_counter() - started, 1),
+            )
+
+    except JobCancelled:
+        raise
+    except Exception as e:
+        # run_hotel() decides whether to retry
+        print(f"❌ Failed to process hotel #{index + 1}: {str(e)}")
         try:
-            search_button = page.locator("button[data-selenium='searchButton']").first
-            if search_button.count() > 0:
-                search_button.click()
-        except:
+            hotel_page.screenshot(path=f"error_hotel_{index+1}.png")
+        except Exception:
             pass
+        metrics.observe("scraper_hotel_seconds", time.perf_counter() - started, job, outcome="failed")
+        raise
+    finally:
+        hotel_page.close()
 
-        hotel_page = get_hotel_results_page(context, city)
-
-        if not apply_star_rating_filter(hotel_page, star_rating):
-            print("⚠️ Continuing without star rating filter")
-
-        hotel_links = []
-        hotel_ids = []
-        page_num = 1
-
-        while True:
-            for _ in range(3):
-                hotel_page.mouse.wheel(0, 1000)
-                time.sleep(1)
-
-            html = hotel_page.content()
-            soup = BeautifulSoup(html, "html.parser")
-            new_links = []
-            new_ids = []
-
-            # Find all hotel list items
-            hotel_items = soup.select("li[data-hotelid]")
-            for item in hotel_items:
-                hotel_id = item.get("data-hotelid")
-                card = item.select_one("a[href*='/hotel/']")
-                if card:
-                    href = card.get("href")
-                    if href:
-                        if not href.startswith("http"):
-                            href = "https://www.agoda.com" + href
-                        if href not in hotel_links:
-                            hotel_links.append(href)
-                            new_links.append(href)
-                            hotel_ids.append(hotel_id)
-                            new_ids.append(hotel_id)
-
-            print(
-                f"🔗 Page {page_num}: Found {len(new_links)} new hotels. Total: {len(hotel_links)}"
-            )
 
-            next_button = hotel_page.locator(
-                "button:has-text('Next'), span:has-text('Next')"
+def run_hotel(
+    pool, profile, index, link, hotel_id, city, output_file,
+    job=None, checkpoint=None, retries=HOTEL_RETRIES, **hotel_options
+):
+    # Scrapes one hotel on a pooled browser, retrying failures with
+    # exponential backoff. The browser goes back to the pool while waiting.
+    # checkpoint (see module/crawl_scheduler.py) records the final outcome.
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            pool.run(
+                partial(
+                    scrape_hotel, index=index, link=link, hotel_id=hotel_id,
+                    city=city, output_file=output_file, job=job, **hotel_options
+                ),
+                profile=profile,
+                job=job,
             )
-            if next_button.count() > 0:
-                try:
-                    next_button.first.click()
-                    hotel_page.wait_for_timeout(3000)
-                    page_num += 1
-                except:
-                    break
-            else:
+            outcome, error = "done", None
+            break
+        except JobCancelled:
+            raise
+        except Exception as e:
+            if attempt > retries:
+                outcome, error = "failed", str(e)
                 break
+            delay = min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            print(f"🔁 Retrying hotel #{index + 1} in {delay:.0f}s (attempt {attempt + 1} of {retries + 1})")
+            metrics.incr("scraper_hotel_retries_total", 1, job)
+            if job:
+                job.emit("hotel_retry", hotel_id=hotel_id, attempt=attempt, delay_seconds=delay, error=str(e))
+                job.sleep(delay)
+            else:
+                time.sleep(delay)
+
+    if checkpoint is not None:
+        checkpoint.mark(link, hotel_id, outcome, attempt, error)
+    if job:
+        if outcome == "failed":
+            job.incr("hotels_failed")
+            job.emit(
+                "hotel_failed", hotel_id=hotel_id, error=error, attempts=attempt,
+                seconds=round(time.perf_counter() - started, 1),
+            )
+        job.incr("hotels_done")
+    return outcome == "done"
 
-        print(f"🏨 Total hotel links: {len(hotel_links)}")
 
-        for i, link in enumerate(hotel_links[:5]):
-            print(f"\n🔍 Hotel #{i+1} — {link}")
-            hotel_page = context.new_page()
+def _hotel_worker(worker_id, hotel_queue, city, output_file, pool, profile, job, errors, hotel_options):
+    # Each worker keeps one hotel in flight; the shared browser pool decides
+    # how many actually run at once across all jobs.
+    try:
+        while not (job and job.cancelled):
             try:
-                hotel_page.goto(link, timeout=20000)
-                time.sleep(3)
+                index, link, hotel_id = hotel_queue.get_nowait()
+            except queue.Empty:
+                break
+            run_hotel(pool, profile, index, link, hotel_id, city, output_file, job=job, **hotel_options)
+    except JobCancelled:
+        pass
+    except Exception as e:
+        print(f"❌ Scraper worker {worker_id} crashed: {e}")
+        errors.append(e)
+
+
+def scrape_hotels_concurrently(
+    hotels, city, output_file, concurrency=DEFAULT_CONCURRENCY,
+    job=None, profile=None, **hotel_options
+):
+    # hotel_options are passed through to run_hotel() and scrape_hotel()
+    profile = get_browser_profile(profile)
+    pool = get_browser_pool()
+    hotel_queue = queue.Queue()
+    for index, (link, hotel_id) in enumerate(hotels):
+        hotel_queue.put((index, link, hotel_id))
+
+    worker_count = max(1, min(concurrency, len(hotels)))
+    print(
+        f"🧵 Scraping {len(hotels)} hotels with {worker_count} concurrent workers "
+        f"(browser pool size {pool.size})"
+    )
+    errors = []
+    workers = [
+        threading.Thread(
+            target=_hotel_worker,
+            args=(
+                n, hotel_queue, city, output_file, pool, profile, job, errors,
+                hotel_options
+            ),
+            name=f"hotel-worker-{n}",
+            daemon=True,
+        )
+        for n in range(worker_count)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    if job:
+        job.check_cancelled()
+    if errors and len(errors) == worker_count:
+        raise errors[0]
+
+
+def accept_cookie_banner(page):
+    # A context restored from the pool's saved storage_state has already
+    # consented, so don't sit out the banner timeout on every search.
+    if any(cookie["name"] == "OptanonAlertBoxClosed" for cookie in page.context.cookies()):
+        return
+    try:
+        page.locator("button#onetrust-accept-btn-handler").click(timeout=5000)
+    except:
+        pass
+
+
+def listing_signature(page):
+    return page.evaluate(
+        "selector => Array.from(document.querySelectorAll(selector), li => li.dataset.hotelid).join(',')",
+        LISTING_SELECTOR,
+    )
 
-                reviews = scrape_all_reviews(
-                    hotel_page, parsed_start_date, parsed_end_date
-                )
-                # Get hotel info
-                name_element = hotel_page.locator(
-                    "h1[data-selenium='hotel-header-name']"
-                ).first
-                hotel_name = (
-                    name_element.text_content().strip()
-                    if name_element.count() > 0
-                    else f"Hotel #{i+1}"
-                )
 
-                rating_element = hotel_page.locator(
-                    "span[data-element-name='mosaic-hotel-rating-container']"
-                ).first
-                hotel_rating = (
-                    rating_element.text_content().strip()
-                    if rating_element.count() > 0
-                    else "N/A"
+def wait_for_listing_change(page, before, timeout=LISTING_CHANGE_TIMEOUT_MS, job=None, reason="listing_next"):
+    # Waits until the result cards differ from `before` (a listing_signature)
+    try:
+        with metrics.timed("scraper_wait_seconds", job, reason=reason):
+            page.wait_for_function(
+                """([selector, before]) => {
+                    const ids = Array.from(document.querySelectorAll(selector), li => li.dataset.hotelid);
+                    return ids.length > 0 && ids.join(',') !== before;
+                }""",
+                arg=[LISTING_SELECTOR, before],
+                timeout=timeout,
+            )
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+def load_listing_cards(page, job=None, max_rounds=20):
+    # Scrolls until no more lazily rendered cards show up
+    count = page.locator(LISTING_SELECTOR).count()
+    for _ in range(max_rounds):
+        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        try:
+            with metrics.timed("scraper_wait_seconds", job, reason="listing_scroll"):
+                page.wait_for_function(
+                    "([selector, count]) => document.querySelectorAll(selector).length > count",
+                    arg=[LISTING_SELECTOR, count],
+                    timeout=LISTING_SETTLE_MS,
                 )
+        except PlaywrightTimeoutError:
+            break
+        count = page.locator(LISTING_SELECTOR).count()
+    return count
 
-                print(f"🏨 Hotel: {hotel_name}, Rating: {hotel_rating}")
-
-                # Scrape reviews
-                reviews = scrape_all_reviews(hotel_page)
-
-                # Save to CSV
-                if reviews:
-                    file_exists = os.path.exists(output_file)
-                    with open(output_file, "a", newline="", encoding="utf-8") as f:
-                        writer = csv.DictWriter(
-                            f,
-                            fieldnames=[
-                                "city",
-                                "hotel_name",
-                                "hotel_id",
-                                "rating",
-                                "review",
-                                "review_date",
-                            ],
-                        )
-                        if not file_exists:
-                            writer.writeheader()
-                        writer.writerows(
-                            [
-                                {
-                                    "city": city,
-                                    "hotel_name": hotel_name,
-                                    "hotel_id": hotel_ids[i],
-                                    "rating": hotel_rating,
-                                    "review": review["review"].strip(),
-                                    "review_date": review["review_date"],
-                                }
-                                for review in reviews
-                            ]
-                        )
-                    print(
-                        f"✅ Saved {len(reviews)} reviews for '{hotel_name}' to '{output_file}'"
-                    )
-                else:
-                    print(f"❌ No reviews found for '{hotel_name}'")
 
-            except Exception as e:
-                print(f"❌ Failed to process hotel #{i + 1}: {str(e)}")
-                hotel_page.screenshot(path=f"error_hotel_{i+1}.png")
-            finally:
-                hotel_page.close()
+def extract_listing_cards(page, job=None):
+    # Hotel ids and absolute links of every result card, in one round trip
+    with metrics.timed("scraper_listing_extract_seconds", job):
+        cards = page.locator(LISTING_SELECTOR).evaluate_all("""
+            items => items.map(item => {
+                const link = item.querySelector("a[href*='/hotel/']");
+                return {id: item.dataset.hotelid || null, href: link ? link.href : null};
+            })
+        """)
+    metrics.incr("scraper_listing_cards_total", len(cards), job)
+    return cards
+
+
+def collect_hotel_listings(context, city, star_rating, job=None):
+    page = context.new_page()
+
+    print(f"🌍 Searching hotels in: {city}")
+    throttle(AGODA_BASE_URL, job)
+    with metrics.timed("scraper_goto_seconds", job, page="home"):
+        page.goto(AGODA_BASE_URL, timeout=20000)
+
+    accept_cookie_banner(page)
+
+    # Input city and search - more reliable method
+    search_input = page.locator(
+        "input[placeholder*='destination'], input[placeholder*='property']"
+    )
+    search_input.fill(city)
+    wait(2000, "search_suggest", job)
+    page.keyboard.press("ArrowDown")
+    page.keyboard.press("Enter")
+    wait(2000, "search_submit", job)
+
+    try:
+        search_button = page.locator("button[data-selenium='searchButton']").first
+        if search_button.count() > 0:
+            search_button.click()
+    except:
+        pass
+
+    hotel_page = get_hotel_results_page(context, city)
+
+    if not apply_star_rating_filter(hotel_page, star_rating):
+        print("⚠️ Continuing without star rating filter")
+
+    # (link, hotel_id) in result order; pages can repeat cards (sponsored
+    # slots, appended lists), so dedupe on the hotel id
+    hotels = []
+    seen_ids = set()
+    page_num = 1
+
+    while True:
+        if job:
+            job.check_cancelled()
+
+        load_listing_cards(hotel_page, job)
+        new_hotels = 0
+        for card in extract_listing_cards(hotel_page, job):
+            key = card["id"] or card["href"]
+            if not card["href"] or key in seen_ids:
+                continue
+            seen_ids.add(key)
+            hotels.append((card["href"], card["id"]))
+            new_hotels += 1
+
+        print(
+            f"🔗 Page {page_num}: Found {new_hotels} new hotels. Total: {len(hotels)}"
+        )
+        if job:
+            job.update(listing_pages=page_num, hotels_found=len(hotels))
+            job.emit("listing_page", page=page_num, new_hotels=new_hotels, hotels_found=len(hotels))
+
+        next_button = hotel_page.locator(
+            "button:has-text('Next'), span:has-text('Next')"
+        )
+        if next_button.count() == 0:
+            break
+        before = listing_signature(hotel_page)
+        throttle(hotel_page.url, job)
+        try:
+            next_button.first.click()
+        except Exception as e:
+            print(f"⚠️ Could not click Next on page {page_num}: {e}")
+            break
+        if not wait_for_listing_change(hotel_page, before, job=job):
+            print(f"⚠️ Results did not change after Next on page {page_num}, stopping.")
+            break
+        page_num += 1
+
+    print(f"🏨 Total hotel links: {len(hotels)}")
+    return hotels
+
+
+def scrape_reviews_from_agoda(
+    city: str,
+    star_rating: int,
+    start_date=None,
+    end_date=None,
+    max_hotels=DEFAULT_MAX_HOTELS,
+    concurrency=DEFAULT_CONCURRENCY,
+    extraction_mode=DEFAULT_EXTRACTION_MODE,
+    incremental=False,
+    browser_profile=None,
+    refresh_listings=False,
+    retries=HOTEL_RETRIES,
+    checkpoint=None,
+    job=None,
+    on_rows=None,
+):
+    # on_rows(rows) is called with each hotel's rows right after they are
+    # appended to the CSV (fused scrape + analysis feeds on it). With a
+    # checkpoint (a crawl_scheduler.TaskCheckpoint), hotels an earlier run
+    # finished are skipped and each hotel's outcome is recorded.
+    if extraction_mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unknown extraction mode: {extraction_mode}")
+    profile = get_browser_profile(browser_profile)
+
+    output_file = reviews_csv_path(city)
+    os.makedirs("output", exist_ok=True)
+
+    parsed_start_date = (
+        datetime.strptime(start_date, "%d-%m-%Y") if start_date else None
+    )
+    parsed_end_date = datetime.strptime(end_date, "%d-%m-%Y") if end_date else None
+
+    # Remembers what earlier runs wrote so the CSV never gets duplicate rows
+    review_index = SeenReviewIndex.for_output(output_file)
+    hotel_index = HotelIndex.for_city(city)
+    hotel_options = dict(
+        start_date=parsed_start_date,
+        end_date=parsed_end_date,
+        extraction_mode=extraction_mode,
+        review_index=review_index,
+        incremental=incremental,
+        on_rows=on_rows,
+        checkpoint=checkpoint,
+        retries=retries,
+    )
+    if incremental:
+        print(f"♻️ Incremental crawl: {review_index.count()} reviews already indexed")
+    print(f"🧭 Browser profile: {profile.name} (headless={profile.headless})")
+
+    # Browsers come warm from the shared pool instead of being launched here
+    pool = get_browser_pool()
+    try:
+        hotels = None if refresh_listings else hotel_index.fresh(star_rating)
+        if hotels is not None:
+            age_hours = hotel_index.age_seconds(star_rating) / 3600
+            print(f"📇 Using {len(hotels)} cached hotels for {city} ({star_rating}★, listed {age_hours:.1f}h ago)")
+            if job:
+                job.update(listings_cached=True, hotels_found=len(hotels))
+        else:
+            hotels = pool.run(
+                partial(collect_hotel_listings, city=city, star_rating=star_rating, job=job),
+                profile=profile,
+                job=job,
+            )
+            # An empty result is more likely a blocked page than an empty city
+            if hotels:
+                hotel_index.replace(star_rating, hotels)
+
+        hotels_to_scrape = hotels[:max_hotels] if max_hotels else hotels
+        if checkpoint is not None:
+            remaining = [(link, hotel_id) for link, hotel_id in hotels_to_scrape if not checkpoint.is_done(link)]
+            if len(remaining) < len(hotels_to_scrape):
+                print(f"⏭️ Skipping {len(hotels_to_scrape) - len(remaining)} hotels finished by an earlier run")
+            hotels_to_scrape = remaining
+        if job:
+            job.update(hotels_total=len(hotels_to_scrape), hotels_done=0, hotels_failed=0, reviews_saved=0)
+            job.emit(
+                "hotels_discovered", found=len(hotels), to_scrape=len(hotels_to_scrape),
+                hotels=[{"hotel_id": hotel_id, "link": link} for link, hotel_id in hotels_to_scrape],
+            )
+
+        if concurrency > 1 and len(hotels_to_scrape) > 1:
+            scrape_hotels_concurrently(
+                hotels_to_scrape,
+                city,
+                output_file,
+                concurrency=concurrency,
+                job=job,
+                profile=profile,
+                **hotel_options,
+            )
+        else:
+            for i, (link, hotel_id) in enumerate(hotels_to_scrape):
+                if job:
+                    job.check_cancelled()
+                run_hotel(pool, profile, i, link, hotel_id, city, output_file, job=job, **hotel_options)
 
-        browser.close()
         print(f"\n🎉 Scraping complete. Output saved to: {output_file}")
+    finally:
+        review_index.close()
+        hotel_index.close()
+
+    return output_file
@@ -0,0 +1,262 @@
+import json
+import os
+import threading
+import time
+
+# Per-hotel, per-label summaries of an analysis, kept up to date window by
+# window as the rows are written, so dashboards never re-read the row-level
+# output. For every hotel and label:
+#   count        labelled sentences (output rows)
+#   mean         mean weighted_sentiment (1-5)
+#   mean_scores  mean of each of the five class probabilities
+#   histogram    sentences by most likely star (1-5)
+#   reviews      reviews with at least one sentence with the label
+#   coverage     reviews / all of the hotel's reviews (labelled or not)
+# The state is a few dense NumPy arrays indexed by hotel and label, and a
+# window is folded in with bincounts over its score array. It is written as
+# <output stem>.aggregates.json (GET /aggregates/<city>) during and after
+# the run, and saved with every analysis checkpoint so a resumed run
+# continues from the same totals.
+JSON_WRITE_INTERVAL = 10.0
+STATE_FIELDS = ("count", "weighted_sum", "score_sums", "histogram", "label_reviews")
+
+
+def aggregates_path_for(output_file):
+    # One per city: the CSV and SQLite outputs of a city share it
+    root, _ = os.path.splitext(output_file)
+    return f"{root}.aggregates.json"
+
+
+def state_path_for(output_file, windows):
+    # Two generations: the state of the last checkpoint survives a crash
+    # while the next one is being written
+    return f"{output_file}.aggregates{windows % 2}.npz"
+
+
+def remove_states(output_file):
+    for generation in (0, 1):
+        path = state_path_for(output_file, generation)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class SentimentAggregates:
+    def __init__(self, labels=()):
+        import numpy as np
+
+        self.hotels = []
+        self.labels = list(labels)
+        self._hotel_ids = {}
+        self._label_ids = {label: n for n, label in enumerate(self.labels)}
+        self.input_rows = 0
+        self.hotel_reviews = np.zeros(0, dtype=np.int64)
+        self.count = np.zeros((0, len(self.labels)), dtype=np.int64)
+        self.weighted_sum = np.zeros((0, len(self.labels)), dtype=np.float64)
+        self.score_sums = np.zeros((0, len(self.labels), 5), dtype=np.float64)
+        self.histogram = np.zeros((0, len(self.labels), 5), dtype=np.int64)
+        self.label_reviews = np.zeros((0, len(self.labels)), dtype=np.int64)
+
+    def _hotel_id(self, hotel):
+        hotel_id = self._hotel_ids.get(hotel)
+        if hotel_id is None:
+            hotel_id = self._hotel_ids[hotel] = len(self.hotels)
+            self.hotels.append(hotel)
+        return hotel_id
+
+    def _label_id(self, label):
+        label_id = self._label_ids.get(label)
+        if label_id is None:
+            label_id = self._label_ids[label] = len(self.labels)
+            self.labels.append(label)
+        return label_id
+
+    def _grow(self):
+        # Pads the arrays to the hotels and labels seen so far
+        import numpy as np
+
+        hotels = len(self.hotels) - len(self.hotel_reviews)
+        labels = len(self.labels) - self.count.shape[1]
+        if hotels or labels:
+            self.hotel_reviews = np.pad(self.hotel_reviews, (0, hotels))
+            for field in STATE_FIELDS:
+                array = getattr(self, field)
+                pad = [(0, hotels), (0, labels)] + [(0, 0)] * (array.ndim - 2)
+                setattr(self, field, np.pad(array, pad))
+
+    def add_window(self, review_data, labels, scores, hotel_reviews, next_review):
+        # The window's labelled sentences as write_scored_rows gets them, plus
+        # how many reviews of each hotel the window read
+        import numpy as np
+
+        sentence_hotels = [self._hotel_id(data["Hotel Name"]) for data in review_data]
+        label_ids = [self._label_id(label) for sentence_labels in labels for label in sentence_labels]
+        review_hotels = [(self._hotel_id(hotel), n) for hotel, n in hotel_reviews.items()]
+        self._grow()
+        self.input_rows = next_review
+        if review_hotels:
+            hotel_ids, counts = zip(*review_hotels)
+            np.add.at(self.hotel_reviews, list(hotel_ids), list(counts))
+        if not label_ids:
+            return
+
+        shape = self.count.shape
+        cells = shape[0] * shape[1]
+        per_sentence = np.fromiter((len(sentence_labels) for sentence_labels in labels), dtype=np.int64, count=len(labels))
+        rows = np.repeat(np.arange(len(labels)), per_sentence)
+        cell = np.repeat(np.asarray(sentence_hotels, dtype=np.int64), per_sentence) * shape[1] + np.asarray(label_ids)
+
+        score_rows = np.asarray(scores, dtype=np.float64)[rows]
+        weighted = score_rows @ np.arange(1, 6, dtype=np.float64)
+        self.count += np.bincount(cell, minlength=cells).reshape(shape)
+        self.weighted_sum += np.bincount(cell, weights=weighted, minlength=cells).reshape(shape)
+        for star in range(5):
+            self.score_sums[..., star] += np.bincount(cell, weights=score_rows[:, star], minlength=cells).reshape(shape)
+        self.histogram += np.bincount(
+            cell * 5 + score_rows.argmax(axis=1), minlength=cells * 5
+        ).reshape(self.histogram.shape)
+        # A review counts once per label however many of its sentences match
+        review_ids = np.repeat(np.fromiter((data["review_id"] for data in review_data), dtype=np.int64), per_sentence)
+        review_cells = np.unique(review_ids * cells + cell) % cells
+        self.label_reviews += np.bincount(review_cells, minlength=cells).reshape(shape)
+
+    def merge(self, other):
+        # Adds another run's totals (analysis shards), matching hotels and
+        # labels by name
+        import numpy as np
+
+        hotel_ids = [self._hotel_id(hotel) for hotel in other.hotels]
+        label_ids = [self._label_id(label) for label in other.labels]
+        self._grow()
+        self.input_rows = max(self.input_rows, other.input_rows)
+        np.add.at(self.hotel_reviews, hotel_ids, other.hotel_reviews)
+        index = np.ix_(hotel_ids, label_ids)
+        for field in STATE_FIELDS:
+            getattr(self, field)[index] += getattr(other, field)
+
+    # --- Persistence ---
+    def to_state(self):
+        import numpy as np
+
+        state = {field: getattr(self, field) for field in STATE_FIELDS}
+        state.update(
+            hotels=np.array(self.hotels, dtype=str),
+            labels=np.array(self.labels, dtype=str),
+            hotel_reviews=self.hotel_reviews,
+            input_rows=np.int64(self.input_rows),
+        )
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        aggregates = cls(labels=[str(label) for label in state["labels"]])
+        for hotel in state["hotels"]:
+            aggregates._hotel_id(str(hotel))
+        aggregates.input_rows = int(state["input_rows"])
+        aggregates.hotel_reviews = state["hotel_reviews"].astype("int64")
+        for field in STATE_FIELDS:
+            setattr(aggregates, field, state[field])
+        return aggregates
+
+    def save_state(self, path):
+        import numpy as np
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **self.to_state())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def for_checkpoint(cls, output_file, checkpoint, labels=()):
+        # Totals as of the checkpoint's last window: empty for a fresh run,
+        # None if a resumable checkpoint has no matching saved state
+        import numpy as np
+
+        if not checkpoint.resuming:
+            return cls(labels)
+        path = state_path_for(output_file, checkpoint.windows)
+        try:
+            with np.load(path) as state:
+                aggregates = cls.from_state(dict(state))
+        except (OSError, KeyError, ValueError):
+            return None
+        return aggregates if aggregates.input_rows == checkpoint.input_rows else None
+
+    # --- Output ---
+    def summary(self, complete=True):
+        import numpy as np
+
+        counts = np.maximum(self.count, 1)
+        means = self.weighted_sum / counts
+        mean_scores = self.score_sums / counts[..., None]
+        coverage = self.label_reviews / np.maximum(self.hotel_reviews, 1)[:, None]
+        hotels = []
+        for hotel_id, hotel in enumerate(self.hotels):
+            present = np.flatnonzero(self.count[hotel_id])
+            hotels.append({
+                "hotel": hotel,
+                "reviews": int(self.hotel_reviews[hotel_id]),
+                "labels": {
+                    self.labels[label_id]: {
+                        "count": int(self.count[hotel_id, label_id]),
+                        "mean": round(float(means[hotel_id, label_id]), 4),
+                        "mean_scores": [round(float(v), 4) for v in mean_scores[hotel_id, label_id]],
+                        "histogram": [int(v) for v in self.histogram[hotel_id, label_id]],
+                        "reviews": int(self.label_reviews[hotel_id, label_id]),
+                        "coverage": round(float(coverage[hotel_id, label_id]), 4),
+                    }
+                    for label_id in present
+                },
+            })
+        return {
+            "complete": complete,
+            "updated_at": time.time(),
+            "input_rows": self.input_rows,
+            "reviews": int(self.hotel_reviews.sum()),
+            "sentences": int(self.count.sum()),
+            "labels": self.labels,
+            "hotels": hotels,
+        }
+
+    def write_json(self, path, complete=True):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(complete), f)
+        os.replace(tmp_path, path)
+        return path
+
+
+_read_cache = {}
+_read_cache_lock = threading.Lock()
+
+
+def read_aggregates(path):
+    # Parsed aggregates JSON, re-read only when the file changes; None if
+    # there is none
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _read_cache_lock:
+        cached = _read_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    with _read_cache_lock:
+        _read_cache[path] = (mtime, data)
+    return data
+
+
+def filter_aggregates(data, hotels=(), labels=(), min_count=0):
+    # The hotels and labels asked for (all if none are given)
+    hotels, labels = set(hotels), set(labels)
+    selected = []
+    for hotel in data["hotels"]:
+        if hotels and hotel["hotel"] not in hotels:
+            continue
+        hotel_labels = {
+            label: values for label, values in hotel["labels"].items()
+            if (not labels or label in labels) and values["count"] >= min_count
+        }
+        selected.append({**hotel, "labels": hotel_labels})
+    return {**data, "hotels": selected}
@@ -1,7 +1,22 @@
 import csv
+import os
 import re
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+import time
+from contextlib import closing
+from itertools import islice
+from module.model_service import get_model_service
+from module.rule_engine import get_rule_engine
+from module.sentiment_cache import SentimentCache, CACHE_ENABLED
+from module.pipeline import Pipeline
+from module import metrics
+from module.analysis_checkpoint import AnalysisCheckpoint, partial_path_for
+from module.result_store import ResultStore, get_output_format
+from module.sentiment_aggregates import (
+    SentimentAggregates, JSON_WRITE_INTERVAL, aggregates_path_for, remove_states, state_path_for,
+)
+from module.batching import (
+    plan_batches, padding_stats, WINDOW_SIZE, TOKEN_BUDGET, MAX_BATCH_SENTENCES, MAX_LENGTH,
+)
 
 
 try:
@@ -9,110 +24,93 @@ try:
 except ImportError:
     def tqdm(x, **kwargs): return x
 
-# Keyword-based sentence classification
+# Worker processes for sharded analysis (1 = score in this process)
+ANALYSIS_WORKERS = int(os.environ.get("SENTIMENT_WORKERS", "1"))
+# Yielded by a review source to flush a partial window while it waits
+FLUSH = object()
+OUTPUT_FIELDNAMES = [
+    "Hotel Name", "Rating", "Review", "sentence",
+    "sentiment_score_1", "sentiment_score_2", "sentiment_score_3",
+    "sentiment_score_4", "sentiment_score_5", "weighted_sentiment",
+    "classification_label"
+]
+
+# Keyword-based sentence classification, driven by module/rules/accessibility_labels.json
 def classify_sentence(sentence):
-    sentence = sentence.lower()
-    words = sentence.split()
-    result = set()
-
-    def contains_all(word_list):
-        return all(word in sentence for word in word_list)
-
-    if any(word in words for word in ['stairs', 'steps', 'climbing']):
-        result.add("2a_1")
-    if any(word in words for word in ['ramp', 'incline']):
-        result.add("2b_1")
-    if ('dark' in words or 'poor lighting' in sentence) and ('room' in words or 'lobby' in words):
-        result.add("2d")
-    if 'shower' in words:
-        result.add("2e_1")
-    if 'bathtub' in words and ('safe' in words or 'climb-in shower' in sentence):
-        result.update(["2f_1", "2f_2"])
-    if 'toilet' in words and 'rails' in words:
-        result.add("2f_4")
-    if 'elevators' in words or 'elevator' in words:
-        result.add("2g_1")
-    if 'escalator' in words or 'escalators' in words:
-        result.add("2h_1")
-    if 'transport' in words and 'options' in words:
-        result.add("3a_1")
-    if 'buggy' in words or 'buggies' in words:
-        result.add("3b")
-    if 'shuttle' in words:
-        result.add("3c")
-    if 'conveniences' in words or 'convenience' in words:
-        result.add("3d_1")
-    if 'central' in words and 'location' in words:
-        result.add("3d_2")
-    if 'medical' in words:
-        result.add("3e_1")
-    if 'taxi' in words:
-        result.add("3f")
-    if 'doctor' in words:
-        result.add("3g")
-    if ('quiet' in words or 'noise' in words or 'noisy' in words) and 'room' in words:
-        result.add("4a")
-    if 'atm' in words:
-        result.add("4b")
-    if 'language' in words and 'spoken' in words:
-        result.add("4c_1")
-    if 'flexible' in words and ('check-in' in words or 'check-out' in words):
-        result.add("4d")
-    if 'pillow' in words:
-        result.add("4e")
-    if 'air conditioning' in sentence:
-        result.add("4f")
-    if 'power points' in sentence or 'power outlets' in sentence:
-        result.add("4g")
-    if 'valet parking' in sentence:
-        result.add("4h")
-    if any(phrase in sentence for phrase in ['concierge', 'luggage handling', 'luggage storage']):
-        result.add("4i")
-    if 'parking' in words and 'valet parking' not in sentence:
-        result.add("4j")
-    if 'vegetarian' in words:
-        result.add("5a_1")
-    if 'vegan' in words:
-        result.add("5a_2")
-    if 'halal' in words:
-        result.add("5a_3")
-    if 'low' in words and 'sodium' in words:
-        result.add("5a_4")
-    if 'diabetic' in words:
-        result.add("5a_5")
-    if 'low' in words and 'spice' in words:
-        result.add("5a_6")
-    if ('customize' in words or 'flexible' in words) and 'food' in words:
-        result.add("5a_7")
-    if 'coffee maker' in sentence or 'tea maker' in sentence:
-        result.add("5b")
-    if 'near' in words and any(word in words for word in ['restaurants', 'cafe', 'eateries']):
-        result.add("5c_1")
-    if ('anti-skid' in words or 'non-slip' in words) and 'floor' in words:
-        result.add("6a")
-    if 'spa' in words or 'wellness' in words:
-        result.add("6b_1")
-    if any(word in words for word in ['yoga', 'meditation', 'pilates']):
-        result.add("6c_1")
-    if 'gym' in words:
-        result.add("6d_1")
-    if 'adult friendly' in sentence or ('quiet' in words and ('pool' in words or 'hotel' in words)):
-        result.add("6e")
-    if any(word in words for word in ['elderly', 'senior', 'older']):
-        result.add("7a")
-
-    return list(result)
-
-# Process a batch of reviews
-def process_batch(batch_sentences, batch_review_data, writer, tokenizer, model, device):
-    inputs = tokenizer(batch_sentences, return_tensors="pt", truncation=True, max_length=512, padding=True)
-    inputs = {k: v.to(device) for k, v in inputs.items()}
-    with torch.no_grad():
-        outputs = model(**inputs)
-    scores = torch.softmax(outputs.logits, dim=1).cpu().numpy()
-
-    labels_batch = [classify_sentence(sentence) for sentence in batch_sentences]
+    return get_rule_engine().classify(sentence)
+
+
+def classify_sentences(sentences):
+    return get_rule_engine().classify_batch(sentences)
+
+# Scoring is split in two so a pipeline can tokenize the next window while
+# the model runs on the current one. prepare_scores: cache lookup, then
+# tokenize the distinct misses once and pad each length-bucketed batch.
+def prepare_scores(sentences, tokenizer, cache=None, token_budget=TOKEN_BUDGET, max_batch=MAX_BATCH_SENTENCES,
+                   job=None):
+    known = {}
+    if cache is not None:
+        with metrics.timed("analysis_cache_lookup_seconds", job):
+            known = cache.get_many(sentences)
+    misses = list(dict.fromkeys(s for s in sentences if s not in known))
+    batches = []
+    lengths = []
+    if misses:
+        # Tokenize once without padding to learn the lengths, then pad each
+        # planned batch only up to its own longest sentence
+        with metrics.timed("analysis_tokenize_seconds", job):
+            encoded = tokenizer(misses, truncation=True, max_length=MAX_LENGTH)
+            lengths = [len(ids) for ids in encoded["input_ids"]]
+            for batch in plan_batches(lengths, token_budget, max_batch):
+                features = [{key: encoded[key][i] for key in encoded.keys()} for i in batch]
+                batches.append((batch, tokenizer.pad(features, return_tensors="pt")))
+        metrics.incr("analysis_tokens_total", sum(lengths), job)
+    return {"sentences": sentences, "known": known, "misses": misses, "batches": batches, "lengths": lengths}
+
+
+# finish_scores: forward passes for the misses; returns scores in the order
+# of the prepared sentences
+def finish_scores(prepared, backend, cache=None, stats=None, job=None):
+    import numpy as np
+
+    known = prepared["known"]
+    misses = prepared["misses"]
+    if misses:
+        miss_scores = [None] * len(misses)
+        for batch, inputs in prepared["batches"]:
+            with metrics.timed("analysis_forward_seconds", job, backend=backend.name):
+                rows = backend.predict(inputs)
+            for index, row in zip(batch, rows):
+                miss_scores[index] = row
+        metrics.incr("analysis_forward_sentences_total", len(misses), job, backend=backend.name)
+        if cache is not None:
+            with metrics.timed("analysis_cache_store_seconds", job):
+                cache.put_many(zip(misses, miss_scores))
+        known.update(zip(misses, miss_scores))
+        if stats is not None:
+            batches = [batch for batch, _ in prepared["batches"]]
+            for key, value in padding_stats(batches, prepared["lengths"]).items():
+                stats[key] = stats.get(key, 0) + value
+    return [np.asarray(known[sentence], dtype=np.float32) for sentence in prepared["sentences"]]
+
 
+# Score sentences in length-bucketed, token-budgeted batches; results come
+# back in the order of `sentences`
+def score_sentences(sentences, tokenizer, backend, cache=None, token_budget=TOKEN_BUDGET,
+                    max_batch=MAX_BATCH_SENTENCES, stats=None, job=None):
+    prepared = prepare_scores(sentences, tokenizer, cache, token_budget, max_batch, job=job)
+    return finish_scores(prepared, backend, cache, stats, job=job)
+
+def iter_review_rows(input_file, rows=None):
+    # (review_id, row) for the input reviews; review ids are row numbers
+    with open(input_file, 'r', encoding='utf-8') as infile:
+        reader = csv.DictReader(infile)
+        if rows is not None:
+            reader = islice(reader, *rows)
+        yield from enumerate(reader, start=rows[0] if rows is not None else 0)
+
+# Write the rows of a scored window in input order
+def write_scored_rows(writer, batch_sentences, batch_review_data, labels_batch, scores):
     for sentence, review_data, labels, score in zip(batch_sentences, batch_review_data, labels_batch, scores):
         if labels:
             weighted_sentiment = sum(score[i] * (i + 1) for i in range(5))
@@ -132,47 +130,320 @@ def process_batch(batch_sentences, batch_review_data, writer, tokenizer, model,
                 })
 
 # Main public function to run after scraping
-def run_sentiment_analysis(input_file, output_file, batch_size=16):
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Using device: {device}")
+# batch_size caps the sentences per forward pass; batches are otherwise sized
+# by SENTIMENT_TOKEN_BUDGET. backend is one of inference_backends.BACKENDS.
+# With workers > 1 the reviews are sharded across that many processes.
+# output_format "sqlite" writes the normalized tables of module/result_store.py
+# instead of the flat CSV.
+# source / checkpoint are passed through to _score_reviews (streaming input
+# and resumable output); a custom source always runs in this process.
+# Without them the output is written to <output>.partial, checkpointed every
+# window and renamed when complete. A run that crashed or was cancelled is
+# continued from its last committed window unless resume=False; the result
+# is the same file an uninterrupted run writes.
+def run_sentiment_analysis(input_file, output_file, batch_size=MAX_BATCH_SENTENCES, job=None, backend=None,
+                           workers=None, output_format=None, source=None, checkpoint=None, resume=True):
+    output_format = get_output_format(output_format)
+    if checkpoint is None:
+        # A full rewrite invalidates any checkpoint a fused run left behind
+        AnalysisCheckpoint(output_file).clear()
+    workers = ANALYSIS_WORKERS if workers is None else workers
+    if workers > 1 and source is None:
+        from module.sharded_analysis import run_sharded_analysis
+        return run_sharded_analysis(
+            input_file, output_file, workers, batch_size, job, backend, output_format, resume=resume
+        )
+    if job and source is None:
+        # Lets progress events estimate an ETA
+        from module.sharded_analysis import count_reviews
+        job.update(reviews_total=count_reviews(input_file))
 
-    # Load tokenizer and model
-    tokenizer = AutoTokenizer.from_pretrained("nlptown/bert-base-multilingual-uncased-sentiment")
-    model = AutoModelForSequenceClassification.from_pretrained("nlptown/bert-base-multilingual-uncased-sentiment").to(device)
+    # Tokenizer and model stay resident between runs; only the first one pays
+    # for the imports and weights
+    service = get_model_service()
+    tokenizer, _, device, load_seconds = service.acquire()
+    backend, backend_seconds = service.backend(backend)
+    print(
+        f"Using device: {device}, backend: {backend.name} "
+        f"(model load: {load_seconds:.1f}s, backend build: {backend_seconds:.1f}s)"
+    )
+    if job:
+        job.update(
+            model_load_seconds=round(load_seconds, 2),
+            backend=backend.name,
+            backend_load_seconds=round(backend_seconds, 2),
+        )
+    partial_file = None
+    if source is None and checkpoint is None:
+        partial_file = partial_path_for(output_file)
+        checkpoint = AnalysisCheckpoint.resume(
+            partial_file, input_file, resume, backend=backend.name, output_format=output_format
+        )
+    aggregates_file = aggregates_path_for(output_file)
+    started = time.perf_counter()
+    cache = open_sentiment_cache(service, backend)
+    try:
+        aggregates = _score_reviews(
+            input_file, partial_file or output_file, batch_size, job, tokenizer, backend, cache,
+            output_format=output_format, source=source, checkpoint=checkpoint, aggregates_file=aggregates_file,
+        )
+        if cache is not None:
+            print(
+                f"💾 Sentiment cache: {cache.hits} hits, {cache.misses} misses "
+                f"({cache.hit_rate:.0%} hit rate)"
+            )
+            cache.evict()
+    finally:
+        if cache is not None:
+            cache.close()
+    if partial_file:
+        os.replace(partial_file, output_file)
+        checkpoint.clear()
+        remove_states(partial_file)
+    aggregates.write_json(aggregates_file)
+    print(
+        f"✅ Sentiment analysis done in {time.perf_counter() - started:.1f}s! "
+        f"Output saved to: {output_file}"
+    )
+    return output_file
 
-    with open(input_file, 'r', encoding='utf-8') as infile, open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-        reader = csv.DictReader(infile)
-        writer = csv.DictWriter(outfile, fieldnames=[
-            "Hotel Name", "Rating", "Review", "sentence",
-            "sentiment_score_1", "sentiment_score_2", "sentiment_score_3",
-            "sentiment_score_4", "sentiment_score_5", "weighted_sentiment",
-            "classification_label"
-        ])
-        writer.writeheader()
-
-        batch_sentences = []
-        batch_review_data = []
-
-        for row in tqdm(reader, desc="Processing reviews"):
+
+def open_sentiment_cache(service, backend):
+    # Scores depend only on the sentence and the exact weights, so they are
+    # shared across cities and re-runs. They are keyed by the resolved commit,
+    # so scores from older weights are never served after an upstream update.
+    # Non-reference backends drift slightly and get their own keys.
+    if not CACHE_ENABLED:
+        return None
+    model_key = f"{service.model_name}@{service.model_version}"
+    if backend.name != "torch":
+        model_key += f"#{backend.name}"
+    return SentimentCache(model_key)
+
+
+# Reviews stream through four threads joined by bounded queues:
+#   read      parse the CSV, split and classify sentences, cut windows
+#   tokenize  cache lookup, tokenization and padding (one window ahead)
+#   forward   model forward passes
+#   write     CSV rows, in input order
+# rows=(start, stop) limits scoring to that slice of the input reviews.
+# source replaces the CSV with any iterable of (review_id, row) pairs; it may
+# also yield FLUSH to push out a partial window while it waits for more rows.
+# With a checkpoint, progress is recorded after every window and a resumed run
+# continues where the checkpoint left off.
+# Returns the run's SentimentAggregates, which are also written to
+# aggregates_file every JSON_WRITE_INTERVAL while scoring, if given.
+def _score_reviews(input_file, output_file, batch_size, job, tokenizer, backend, cache, rows=None,
+                   write_header=True, output_format="csv", source=None, checkpoint=None, aggregates_file=None):
+    stats = {}
+    counts = {"scored": 0, "filtered": 0}
+    labels = get_rule_engine().labels
+    aggregates = SentimentAggregates(labels)
+    if checkpoint is not None:
+        resumed = SentimentAggregates.for_checkpoint(output_file, checkpoint, labels)
+        if resumed is not None:
+            aggregates = resumed
+        elif source is None:
+            print(f"⚠️ No aggregates saved with checkpoint '{checkpoint.path}', starting over")
+            checkpoint.clear()
+        else:
+            print(f"⚠️ No aggregates saved with checkpoint '{checkpoint.path}', they only cover new reviews")
+    resuming = checkpoint is not None and checkpoint.resuming
+    if source is None:
+        if resuming:
+            first = rows[0] if rows is not None else 0
+            start = max(checkpoint.input_rows, first)
+            rows = (start, rows[1]) if rows is not None else (start, None)
+            if job:
+                # Progress and ETA count the reviews scored before the restart
+                job.update(reviews_processed=start - first, reviews_resumed=start - first)
+        source = iter_review_rows(input_file, rows)
+
+    def new_window():
+        return {
+            "sentences": [], "review_data": [], "labels": [], "positions": [], "hotel_reviews": {},
+            "classify_seconds": 0.0,
+        }
+
+    def finish_window(window):
+        # Classification is timed per review but recorded once per window
+        metrics.observe("analysis_classify_seconds", window.pop("classify_seconds"), job)
+        return window
+
+    def read_windows():
+        # Windows end on review boundaries, so a checkpoint after a window
+        # never splits a review
+        window = new_window()
+        pending = False
+        for item in tqdm(source, desc="Processing reviews"):
+            if item is FLUSH:
+                if pending:
+                    yield finish_window(window)
+                    window, pending = new_window(), False
+                continue
+            review_id, row = item
+            if job:
+                job.check_cancelled()
+                job.incr("reviews_processed")
             review = row["review"]
             hotel = row["hotel_name"]
             rating = row["rating"]
-            sentences = re.split(r'[.!?]', review)
-            for sentence in sentences:
-                if sentence.strip():
-                    batch_sentences.append(sentence.strip())
-                    batch_review_data.append({
-                        "Hotel Name": hotel,
-                        "Rating": rating,
-                        "Review": review
-                    })
-
-                if len(batch_sentences) >= batch_size:
-                    process_batch(batch_sentences, batch_review_data, writer, tokenizer, model, device)
-                    batch_sentences, batch_review_data = [], []
-
-        # Final leftover batch
-        if batch_sentences:
-            process_batch(batch_sentences, batch_review_data, writer, tokenizer, model, device)
-
-        print(f"✅ Sentiment analysis done! Output saved to: {output_file}")
+            window["hotel_reviews"][hotel] = window["hotel_reviews"].get(hotel, 0) + 1
+            sentences = [s.strip() for s in re.split(r'[.!?]', review) if s.strip()]
+
+            # Classify first: sentences without a label never reach the model,
+            # since they would not produce an output row anyway
+            review_data = {
+                "Hotel Name": hotel,
+                "Rating": rating,
+                "Review": review,
+                "review_id": review_id
+            }
+            classify_started = time.perf_counter()
+            classified = classify_sentences(sentences)
+            window["classify_seconds"] += time.perf_counter() - classify_started
+            for position, (sentence, labels) in enumerate(zip(sentences, classified)):
+                if not labels:
+                    counts["filtered"] += 1
+                    continue
+                window["sentences"].append(sentence)
+                window["review_data"].append(review_data)
+                window["labels"].append(labels)
+                window["positions"].append(position)
+            window["next_review"] = review_id + 1
+            pending = True
+            if job:
+                job.update(sentences_filtered=counts["filtered"])
+
+            if len(window["sentences"]) >= WINDOW_SIZE:
+                yield finish_window(window)
+                window, pending = new_window(), False
+        # Final leftover window (possibly without sentences, to checkpoint
+        # the trailing unlabelled reviews)
+        if pending:
+            yield finish_window(window)
+
+    def tokenize(window):
+        window["prepared"] = prepare_scores(window["sentences"], tokenizer, cache, max_batch=batch_size, job=job)
+        return window
+
+    def forward(window):
+        window["scores"] = finish_scores(window.pop("prepared"), backend, cache, stats, job=job)
+        return window
+
+    if output_format == "sqlite":
+        if resuming:
+            store = ResultStore(output_file, labels)
+            store.delete_from(checkpoint.input_rows)
+        else:
+            store = ResultStore.create(output_file, labels)
+        output = closing(store)
+
+        def write_window(window):
+            with metrics.timed("analysis_write_seconds", job, format="sqlite"):
+                store.add_window(
+                    window["sentences"], window["review_data"], window["labels"], window["scores"], window["positions"]
+                )
+            return None
+    else:
+        if resuming:
+            # Drop whatever was written after the last checkpoint
+            os.truncate(output_file, checkpoint.output_bytes)
+            output = open(output_file, 'a', newline='', encoding='utf-8')
+        else:
+            output = open(output_file, 'w', newline='', encoding='utf-8')
+        writer = csv.DictWriter(output, fieldnames=OUTPUT_FIELDNAMES)
+        if write_header and not resuming:
+            writer.writeheader()
+
+        def write_window(window):
+            with metrics.timed("analysis_write_seconds", job, format="csv"):
+                start = output.tell()
+                write_scored_rows(writer, window["sentences"], window["review_data"], window["labels"], window["scores"])
+                metrics.incr("analysis_output_bytes_total", output.tell() - start, job, format="csv")
+            if checkpoint is not None:
+                output.flush()
+                os.fsync(output.fileno())
+            return output.tell()
+
+    if resuming:
+        print(f"⏯️ Resuming analysis after {checkpoint.input_rows} reviews ({checkpoint.windows} windows)")
+
+    json_written_at = time.monotonic()
+
+    with output:
+        def write(window):
+            nonlocal json_written_at
+            output_bytes = write_window(window)
+            with metrics.timed("analysis_aggregate_seconds", job):
+                aggregates.add_window(
+                    window["review_data"], window["labels"], window["scores"], window["hotel_reviews"],
+                    window["next_review"],
+                )
+            if checkpoint is not None:
+                # The totals go to disk before the checkpoint that refers to them
+                aggregates.save_state(state_path_for(output_file, checkpoint.windows + 1))
+                checkpoint.save(window["next_review"], output_bytes)
+            if aggregates_file and time.monotonic() - json_written_at >= JSON_WRITE_INTERVAL:
+                aggregates.write_json(aggregates_file, complete=False)
+                json_written_at = time.monotonic()
+            metrics.incr("analysis_sentences_scored_total", len(window["sentences"]), job)
+            counts["scored"] += len(window["sentences"])
+            if job:
+                job.update(sentences_scored=counts["scored"])
+                if cache is not None:
+                    job.update(cache_hits=cache.hits, cache_misses=cache.misses)
+                job.emit(
+                    "window_scored", sentences=len(window["sentences"]),
+                    sentences_scored=counts["scored"], next_review=window["next_review"],
+                )
+
+        pipeline = (
+            Pipeline()
+            .add("read", read_windows)
+            .add("tokenize", tokenize)
+            .add("forward", forward)
+            .add("write", write)
+        )
+        stage_stats = pipeline.run()
+
+        sentences_scored = counts["scored"]
+        sentences_filtered = counts["filtered"]
+        padding_waste = (
+            (stats["padded_tokens"] - stats["real_tokens"]) / stats["padded_tokens"]
+            if stats.get("padded_tokens") else 0.0
+        )
+        if job:
+            job.update(
+                sentences_scored=sentences_scored,
+                sentences_filtered=sentences_filtered,
+                forward_passes=stats.get("batches", 0),
+                padding_waste=round(padding_waste, 3),
+            )
+            for name, stage in stage_stats.items():
+                job.update(**{
+                    f"{name}_utilization": stage["utilization"],
+                    f"{name}_queue_avg": stage["queue_avg"],
+                })
+            if cache is not None:
+                job.update(
+                    cache_hits=cache.hits,
+                    cache_misses=cache.misses,
+                    cache_hit_rate=round(cache.hit_rate, 3),
+                )
+        if stats.get("batches"):
+            print(
+                f"📦 {stats['batches']} forward passes, {stats['real_tokens']} tokens, "
+                f"{padding_waste:.0%} padding"
+            )
+        print(f"🧵 Pipeline ({pipeline.wall_seconds:.1f}s): " + ", ".join(
+            f"{name} {stage['utilization']:.0%} busy (queue avg {stage['queue_avg']}, max {stage['queue_max']})"
+            for name, stage in stage_stats.items()
+        ))
+
+        total = sentences_scored + sentences_filtered
+        print(
+            f"🔎 Scored {sentences_scored} labelled sentences, skipped {sentences_filtered} "
+            f"unlabelled ({sentences_filtered / total:.0%} of {total})" if total else "🔎 No sentences found"
+        )
+    return aggregates
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Softmax scores keyed by content: sha1 of the normalized sentence plus the
+# model id and the commit its revision resolved to. Identical sentences
+# ("the room was clean") are scored once across every city and every re-run.
+CACHE_ENABLED = os.environ.get("SENTIMENT_CACHE", "1") != "0"
+CACHE_PATH = os.environ.get("SENTIMENT_CACHE_PATH", os.path.join("output", "sentiment_cache.sqlite"))
+MAX_ENTRIES = int(os.environ.get("SENTIMENT_CACHE_MAX_ENTRIES", "2000000"))
+# Eviction trims to this share of MAX_ENTRIES so it doesn't run on every insert
+EVICT_TO = 0.9
+LOOKUP_CHUNK = 500
+
+
+def normalize_sentence(sentence):
+    # The model is uncased and ignores runs of whitespace, so these variants
+    # score identically
+    return re.sub(r"\s+", " ", sentence).strip().lower()
+
+
+class SentimentCache:
+    def __init__(self, model_key, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.model_key = model_key
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Looked up from the tokenize stage and written from the forward stage
+        # of the analysis pipeline, so the connection is shared behind a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sentiment_scores (
+                key TEXT PRIMARY KEY,
+                s1 REAL, s2 REAL, s3 REAL, s4 REAL, s5 REAL,
+                last_used REAL NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS sentiment_scores_last_used ON sentiment_scores (last_used)"
+        )
+        self._conn.commit()
+
+    def key(self, sentence):
+        return hashlib.sha1(
+            f"{self.model_key}\0{normalize_sentence(sentence)}".encode("utf-8")
+        ).hexdigest()
+
+    def get_many(self, sentences):
+        # Returns {sentence: (s1..s5)} for the sentences already scored
+        with self._lock:
+            return self._get_many(sentences)
+
+    def _get_many(self, sentences):
+        keys = {}
+        for sentence in sentences:
+            keys.setdefault(self.key(sentence), []).append(sentence)
+
+        found = {}
+        key_list = list(keys)
+        for start in range(0, len(key_list), LOOKUP_CHUNK):
+            chunk = key_list[start:start + LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT key, s1, s2, s3, s4, s5 FROM sentiment_scores WHERE key IN ({placeholders})",
+                chunk,
+            ).fetchall()
+            for key, *scores in rows:
+                for sentence in keys[key]:
+                    found[sentence] = tuple(scores)
+            if rows:
+                self._conn.executemany(
+                    "UPDATE sentiment_scores SET last_used = ? WHERE key = ?",
+                    [(time.time(), row[0]) for row in rows],
+                )
+        if found:
+            # Don't leave a write transaction open between batches; other
+            # analysis processes share this file
+            self._conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(set(sentences)) - len(found)
+        return found
+
+    def put_many(self, scored):
+        # scored: iterable of (sentence, five softmax scores)
+        now = time.time()
+        rows = [(self.key(sentence), *map(float, scores), now) for sentence, scores in scored]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sentiment_scores VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sentiment_scores").fetchone()[0]
+
+    def evict(self):
+        # Drops the least recently used entries once the cache is over budget
+        total = self.count()
+        if total <= self.max_entries:
+            return 0
+        remove = total - int(self.max_entries * EVICT_TO)
+        with self._lock:
+            self._conn.execute(
+                """
+                DELETE FROM sentiment_scores WHERE key IN (
+                    SELECT key FROM sentiment_scores ORDER BY last_used LIMIT ?
+                )
+                """,
+                (remove,),
+            )
+            self._conn.commit()
+        print(f"🧹 Evicted {remove} least recently used sentiment cache entries")
+        return remove
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
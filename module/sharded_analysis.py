@@ -0,0 +1,253 @@
+import csv
+import os
+import queue
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+import multiprocessing
+
+from module.jobs import JobCancelled
+from module.analysis_checkpoint import AnalysisCheckpoint, checkpoint_path_for
+from module.sentiment_cache import SentimentCache, CACHE_ENABLED
+from module.result_store import ResultStore
+from module.sentiment_aggregates import SentimentAggregates, aggregates_path_for, remove_states
+from module import metrics
+
+# Sharded analysis: the input reviews are split into N contiguous row ranges,
+# each scored by its own process with its own model copy and a pinned number
+# of intra-op threads (cores / N unless SENTIMENT_WORKER_THREADS is set).
+# Shards are written next to the output and concatenated in shard order, so
+# the merged CSV has the same row order as a single-process run. Each shard
+# checkpoints like a single-process run; shards of a failed or cancelled run
+# are kept, and a rerun over the same input and worker count continues them.
+WORKER_THREADS = int(os.environ.get("SENTIMENT_WORKER_THREADS", "0"))
+PROGRESS_INTERVAL = 0.5
+SUMMED_COUNTERS = (
+    "reviews_processed", "reviews_resumed", "sentences_scored", "sentences_filtered",
+    "forward_passes", "cache_hits", "cache_misses",
+)
+
+# Set in each worker process by _init_worker
+_progress_queue = None
+_cancel_event = None
+
+
+def threads_per_worker(workers):
+    return WORKER_THREADS or max(1, (os.cpu_count() or 1) // workers)
+
+
+def _init_worker(threads, progress_queue, cancel_event):
+    global _progress_queue, _cancel_event
+    # Must be set before torch is imported (the model service imports it lazily)
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+    _progress_queue = progress_queue
+    _cancel_event = cancel_event
+
+
+class _ShardProgress:
+    # Stands in for the Job inside a worker: counters are batched and sent to
+    # the parent at most every PROGRESS_INTERVAL, cancellation comes from the
+    # shared event. Events ride along with the next batch of counters.
+    # Timings collect in `metrics` and go back with the result.
+    def __init__(self, shard):
+        self.shard = shard
+        self.progress = {}
+        self.events = []
+        self.metrics = metrics.Registry()
+        self._sent_at = 0.0
+
+    def update(self, **counters):
+        self.progress.update(counters)
+        self._send()
+
+    def incr(self, key, amount=1):
+        self.progress[key] = self.progress.get(key, 0) + amount
+        self._send()
+
+    def emit(self, event, **data):
+        self.events.append((event, data))
+        self._send()
+
+    def check_cancelled(self):
+        if _cancel_event.is_set():
+            raise JobCancelled(f"Shard {self.shard} was cancelled")
+
+    def _send(self, force=False):
+        now = time.monotonic()
+        if force or now - self._sent_at >= PROGRESS_INTERVAL:
+            _progress_queue.put((self.shard, dict(self.progress), self.events))
+            self.events = []
+            self._sent_at = now
+
+
+def _score_shard(shard, input_file, shard_file, rows, batch_size, backend_name, output_format, resume=True):
+    from module.model_service import get_model_service
+    from module.sentiment_analysis import _score_reviews, open_sentiment_cache
+
+    service = get_model_service()
+    tokenizer, _, _, load_seconds = service.acquire()
+    backend, _ = service.backend(backend_name)
+    progress = _ShardProgress(shard)
+    progress.update(model_load_seconds=round(load_seconds, 2))
+    checkpoint = AnalysisCheckpoint.resume(
+        shard_file, input_file, resume, backend=backend.name, output_format=output_format, rows=list(rows)
+    )
+    cache = open_sentiment_cache(service, backend)
+    try:
+        aggregates = _score_reviews(
+            input_file, shard_file, batch_size, progress, tokenizer, backend, cache,
+            rows=rows, write_header=False, output_format=output_format, checkpoint=checkpoint,
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+        progress._send(force=True)
+    return progress.metrics.snapshot(), aggregates.to_state()
+
+
+def count_reviews(input_file):
+    with open(input_file, 'r', encoding='utf-8') as f:
+        return sum(1 for _ in csv.DictReader(f))
+
+
+def shard_ranges(total, workers):
+    # Contiguous, near-equal row ranges; never more shards than rows
+    workers = max(1, min(workers, total))
+    size, extra = divmod(total, workers)
+    ranges = []
+    start = 0
+    for shard in range(workers):
+        stop = start + size + (1 if shard < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def merge_shards(output_file, shard_files, output_format="csv"):
+    from module.sentiment_analysis import OUTPUT_FIELDNAMES
+
+    tmp_file = output_file + ".tmp"
+    if output_format == "sqlite":
+        # Review ids are input row numbers and label ids come from the rule
+        # table, so shard rows never collide
+        store = ResultStore.create(tmp_file)
+        try:
+            store.merge(shard_files)
+        finally:
+            store.close()
+        os.replace(tmp_file, output_file)
+        return
+
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as out:
+        csv.DictWriter(out, fieldnames=OUTPUT_FIELDNAMES).writeheader()
+        for shard_file in shard_files:
+            with open(shard_file, 'r', newline='', encoding='utf-8') as f:
+                shutil.copyfileobj(f, out)
+    os.replace(tmp_file, output_file)
+
+
+def _aggregate(shard_progress):
+    totals = {}
+    for counters in shard_progress.values():
+        for key in SUMMED_COUNTERS:
+            if key in counters:
+                totals[key] = totals.get(key, 0) + counters[key]
+    lookups = totals.get("cache_hits", 0) + totals.get("cache_misses", 0)
+    if lookups:
+        totals["cache_hit_rate"] = round(totals["cache_hits"] / lookups, 3)
+    return totals
+
+
+def run_sharded_analysis(input_file, output_file, workers, batch_size, job=None, backend=None,
+                         output_format="csv", resume=True):
+    from module.inference_backends import get_backend_name
+
+    started = time.perf_counter()
+    backend = get_backend_name(backend)
+    ranges = shard_ranges(count_reviews(input_file), workers)
+    threads = threads_per_worker(len(ranges))
+    shard_files = [f"{output_file}.shard{n}" for n in range(len(ranges))]
+    print(f"🧩 Sharding {ranges[-1][1]} reviews across {len(ranges)} workers x {threads} threads ({backend})")
+    if job:
+        job.update(workers=len(ranges), threads_per_worker=threads, backend=backend, reviews_total=ranges[-1][1])
+
+    # spawn, not fork: the parent runs Flask and browser threads and may
+    # already hold an initialised torch
+    context = multiprocessing.get_context("spawn")
+    progress_queue = context.Queue()
+    cancel_event = context.Event()
+    shard_progress = {}
+
+    def drain():
+        while True:
+            try:
+                shard, counters, events = progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            shard_progress[shard] = counters
+            if job:
+                for event, data in events:
+                    job.emit(event, shard=shard, **data)
+        if job:
+            job.update(**_aggregate(shard_progress))
+
+    completed = False
+    try:
+        with ProcessPoolExecutor(
+            max_workers=len(ranges), mp_context=context,
+            initializer=_init_worker, initargs=(threads, progress_queue, cancel_event),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _score_shard, shard, input_file, shard_file, rows, batch_size, backend, output_format, resume
+                )
+                for shard, (rows, shard_file) in enumerate(zip(ranges, shard_files))
+            ]
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=1, return_when=FIRST_EXCEPTION)
+                drain()
+                if job and job.cancelled:
+                    cancel_event.set()
+                if any(f.exception() for f in done):
+                    cancel_event.set()
+            # Raises the first worker error (JobCancelled included)
+            aggregates = SentimentAggregates()
+            for future in futures:
+                snapshot, state = future.result()
+                metrics.merge(snapshot, job)
+                aggregates.merge(SentimentAggregates.from_state(state))
+        drain()
+        merge_shards(output_file, shard_files, output_format)
+        aggregates.write_json(aggregates_path_for(output_file))
+        if CACHE_ENABLED:
+            # Workers only add entries; trim once here instead of racing
+            cache = SentimentCache(model_key=None)
+            cache.evict()
+            cache.close()
+        completed = True
+    finally:
+        if completed:
+            for shard_file in shard_files:
+                for path in (shard_file, shard_file + "-wal", shard_file + "-shm", checkpoint_path_for(shard_file)):
+                    if os.path.exists(path):
+                        os.remove(path)
+                remove_states(shard_file)
+        else:
+            print(f"💾 Kept {len(shard_files)} shard checkpoints; rerun the analysis to continue")
+
+    totals = _aggregate(shard_progress)
+    print(
+        f"🔎 Scored {totals.get('sentences_scored', 0)} labelled sentences, "
+        f"skipped {totals.get('sentences_filtered', 0)} unlabelled"
+    )
+    if "cache_hit_rate" in totals:
+        print(f"💾 Sentiment cache: {totals['cache_hit_rate']:.0%} hit rate")
+    print(
+        f"✅ Sentiment analysis done in {time.perf_counter() - started:.1f}s "
+        f"with {len(ranges)} workers! Output saved to: {output_file}"
+    )
+    return output_file